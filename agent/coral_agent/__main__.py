@@ -20,16 +20,110 @@ coral_agent executable module entry point.
 """
 
 from sys import exit
+from json import dumps
+from asyncio import get_event_loop, sleep
 from logging import getLogger as get_logger
 
+from . import __version__
+from .spool import Spool
+from .sampler import Sampler
+from .transport import Transport
+from .palette import parse_palette
+from .args import parse_args, InvalidArgument
+from .coral import CORAL_PALETTE, CORAL_WIDGETS
+
 
 log = get_logger(__name__)
 
 
+async def sample_forever(args, sampler, transport):
+    """
+    Sample at a fixed rate, without drifting, and submit the samples.
+    """
+    loop = get_event_loop()
+    interval = 1.0 / args.rate
+    deadline = loop.time()
+
+    while True:
+        data = sampler.sample()
+        log.debug('Sampled in {:.3f} ms'.format(sampler.overhead * 1000))
+
+        if transport is None:
+            print(dumps(data), flush=True)
+        else:
+            transport.submit(data, title=args.title)
+
+        deadline += interval
+        delay = deadline - loop.time()
+        if delay < 0:
+            deadline = loop.time()
+            delay = 0
+        await sleep(delay)
+
+
 def main():
     """
     Application main function.
     """
+    try:
+        args = parse_args()
+    except InvalidArgument as e:
+        log.error(e)
+        exit(-1)
+
+    log.info('Starting Coral Agent {}'.format(__version__))
+
+    sampler = Sampler(
+        temp_coolant=args.temp_coolant,
+        temp_gpu=args.temp_gpu,
+        temp_cpu=args.temp_cpu,
+        pump=args.pump,
+        pump_max=args.pump_max,
+        interfaces=args.interfaces,
+        link_speed=args.link_speed,
+        disk_os=args.disk_os,
+        disk_apps=args.disk_apps,
+    )
+
+    transport = None
+    spool = None
+
+    if not args.dry_run:
+        if args.spool is not None:
+            spool = Spool(args.spool, slots=args.spool_size)
+
+        log.info('Pushing to dashboard at {}'.format(args.dashboard))
+        transport = Transport(
+            args.dashboard,
+            {
+                'title': args.title,
+                'palette': parse_palette(CORAL_PALETTE),
+                'widgets': CORAL_WIDGETS,
+            },
+            inflight=args.inflight,
+            size=args.queue,
+            policy=args.policy,
+            spool=spool,
+            source=args.source,
+            delta=args.delta,
+        )
+
+    loop = get_event_loop()
+
+    try:
+        if transport is not None:
+            loop.run_until_complete(transport.start())
+        loop.run_until_complete(sample_forever(args, sampler, transport))
+
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if transport is not None:
+            loop.run_until_complete(transport.close())
+        if spool is not None:
+            spool.close()
+        sampler.close()
+
     exit(0)
 
 
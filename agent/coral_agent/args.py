@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+"""
+Argument management module.
+"""
+
+import logging
+
+from . import __version__
+
+
+log = logging.getLogger(__name__)
+
+
+class InvalidArgument(Exception):
+    """
+    Custom exception to raise when a command line argument or combination of
+    arguments are invalid.
+    """
+
+
+def build_parser(description):
+    """
+    Build an argument parser with the arguments shared by the command line
+    tools of the agent: the version, the verbosity and the dashboard URL.
+
+    :param str description: Description of the tool.
+
+    :return: The argument parser.
+    :rtype: :py:class:`argparse.ArgumentParser`
+    """
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        description=description
+    )
+    parser.add_argument(
+        '--version',
+        action='version',
+        version='{} v{}'.format(
+            parser.description,
+            __version__,
+        )
+    )
+
+    parser.add_argument(
+        '-v', '--verbose',
+        dest='verbosity',
+        help='Increase verbosity level',
+        default=0,
+        action='count'
+    )
+
+    parser.add_argument(
+        '--dashboard',
+        help='URL of the dashboard',
+        default='http://localhost:5000',
+    )
+
+    return parser
+
+
+def check_positive(args, *options):
+    """
+    Check that numeric arguments are greater than 0.
+
+    :param args: An arguments namespace.
+    :type args: :py:class:`argparse.Namespace`
+    :param options: Destination names of the arguments to check.
+
+    :raise InvalidArgument: If any of the arguments isn't greater than 0.
+    """
+    for option in options:
+        value = getattr(args, option)
+        if value <= 0:
+            raise InvalidArgument(
+                'Invalid --{} {}, must be greater than 0'.format(
+                    option.replace('_', '-'), value,
+                )
+            )
+
+
+def setup_logging(verbosity):
+    """
+    Configure logging for the given verbosity level.
+
+    :param int verbosity: Number of times the verbose flag was given.
+    """
+    verbosity_levels = {
+        0: logging.ERROR,
+        1: logging.WARNING,
+        2: logging.INFO,
+        3: logging.DEBUG,
+    }
+
+    level = verbosity_levels.get(verbosity, logging.DEBUG)
+    logging.basicConfig(
+        format='  {asctime} | {levelname:8} | {message}',
+        style='{',
+        level=level,
+    )
+
+    log.debug('Verbosity at level {}'.format(verbosity))
+
+
+def validate_args(args):
+    """
+    Validate that arguments are valid.
+
+    :param args: An arguments namespace.
+    :type args: :py:class:`argparse.Namespace`
+
+    :return: The validated namespace.
+    :rtype: :py:class:`argparse.Namespace`
+    """
+
+    # Check sampling rate, transport and spool
+    check_positive(args, 'rate', 'inflight', 'queue', 'spool_size')
+
+    # Check the totals of the samples
+    check_positive(args, 'pump_max', 'link_speed')
+
+    # Configure logging
+    setup_logging(args.verbosity)
+
+    return args
+
+
+def parse_args(argv=None):
+    """
+    Argument parsing routine.
+
+    :param argv: A list of argument strings.
+    :type argv: list
+
+    :return: A parsed and verified arguments namespace.
+    :rtype: :py:class:`argparse.Namespace`
+    """
+    parser = build_parser('Coral Agent')
+    parser.add_argument(
+        '--source',
+        help='Identifier of this agent, to share the dashboard with others',
+        default=None,
+    )
+    parser.add_argument(
+        '--title',
+        help='Title of the dashboard',
+        default='Coral Dashboard - {version}',
+    )
+    parser.add_argument(
+        '--inflight',
+        help=(
+            'Maximum number of requests in flight to the dashboard. With more '
+            'than one samples may reach the dashboard out of order'
+        ),
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        '--queue',
+        help='Maximum number of samples waiting to be sent',
+        type=int,
+        default=100,
+    )
+    parser.add_argument(
+        '--policy',
+        help='What to do with new samples when the queue is full',
+        choices=['drop-oldest', 'coalesce'],
+        default='drop-oldest',
+    )
+    parser.add_argument(
+        '--spool',
+        help='Spool file for the samples while the dashboard is unreachable',
+    )
+    parser.add_argument(
+        '--spool-size',
+        help='Maximum number of samples in the spool',
+        type=int,
+        default=8192,
+    )
+    parser.add_argument(
+        '--delta',
+        help='Push only the values that changed since the previous push',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--dry-run',
+        help='Print the samples instead of sending them to the dashboard',
+        action='store_true',
+    )
+
+    parser.add_argument(
+        '--rate',
+        help='Samples per second',
+        type=float,
+        default=1.0,
+    )
+
+    parser.add_argument(
+        '--temp-coolant',
+        help='Path to the hwmon attribute of the coolant temperature',
+    )
+    parser.add_argument(
+        '--temp-gpu',
+        help='Path to the hwmon attribute of the GPU temperature',
+    )
+    parser.add_argument(
+        '--temp-cpu',
+        help='Path to the hwmon attribute of the CPU temperature',
+    )
+    parser.add_argument(
+        '--pump',
+        help='Path to the hwmon attribute of the pump or fan speed',
+    )
+    parser.add_argument(
+        '--pump-max',
+        help='Maximum speed of the pump or fan in RPM',
+        type=int,
+        default=1400,
+    )
+    parser.add_argument(
+        '--interface',
+        dest='interfaces',
+        help='Network interface to measure, all but loopback by default',
+        action='append',
+    )
+    parser.add_argument(
+        '--link-speed',
+        help='Network link speed in Mbps',
+        type=int,
+        default=1000,
+    )
+    parser.add_argument(
+        '--disk-os',
+        help='Mount point of the operating system disk',
+        default='/',
+    )
+    parser.add_argument(
+        '--disk-apps',
+        help='Mount point of the applications disk',
+    )
+
+    args = parser.parse_args(argv)
+    args = validate_args(args)
+    return args
+
+
+__all__ = [
+    'InvalidArgument',
+    'build_parser',
+    'check_positive',
+    'setup_logging',
+    'parse_args',
+]
@@ -200,12 +200,12 @@ CORAL_WIDGETS = [
             'widget': 'bar',
             'identifier': 'disk_os',
             'title': 'C:// "Windows"',
-            'unit': 'GB',
+            'unit': 'MB',
         }, {
             'widget': 'bar',
             'identifier': 'disk_apps',
             'title': 'D:// "Storage"',
-            'unit': 'GB',
+            'unit': 'MB',
         },
     ]
 ]
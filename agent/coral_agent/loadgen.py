@@ -0,0 +1,475 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Synthetic load generator of agents pushing to the dashboard.
+
+Simulates a number of agents, each one with its own source in the dashboard,
+pushing random samples of a widgets layout at a fixed rate, and reports the
+achieved throughput, the error rate, the latency percentiles of the pushes
+and the frame rate of the dashboard during the run::
+
+    coral_loadgen --agents 16 --rate 10 --duration 30
+"""
+
+import logging
+from sys import exit
+from math import ceil
+from json import loads
+from random import randint, uniform
+from collections import OrderedDict
+from asyncio import (
+    TimeoutError, ensure_future, gather, get_event_loop, sleep, wait_for,
+)
+
+from aiohttp import ClientSession, ClientError, TCPConnector
+
+from .palette import parse_palette
+from .coral import CORAL_PALETTE, CORAL_WIDGETS
+from .args import (
+    InvalidArgument, build_parser, check_positive, setup_logging,
+)
+
+
+log = logging.getLogger(__name__)
+
+
+FRAMES_METRIC = 'coral_render_frames_total'
+
+
+def load_config(path=None):
+    """
+    Load the payload of the ``/api/config`` request used by the agents.
+
+    :param str path: Path to a JSON file with the ``widgets``, and optionally
+     the ``title`` and ``palette``, of the layout. The palette can be a list
+     of entries or a palette table as parsed by
+     :func:`coral_agent.palette.parse_palette`. The Coral layout if None.
+
+    :return: The payload of the config request.
+    :rtype: dict
+    """
+    if path is None:
+        return {
+            'title': 'Coral Load Generator',
+            'palette': parse_palette(CORAL_PALETTE),
+            'widgets': CORAL_WIDGETS,
+        }
+
+    with open(path, encoding='utf-8') as fd:
+        config = loads(fd.read())
+
+    if not isinstance(config, dict) or 'widgets' not in config:
+        raise InvalidArgument(
+            'Invalid config file {}, must have the widgets'.format(path)
+        )
+
+    palette = config.get('palette', [])
+    if isinstance(palette, str):
+        palette = parse_palette(palette)
+
+    return {
+        'title': config.get('title', 'Coral Load Generator'),
+        'palette': palette,
+        'widgets': config['widgets'],
+    }
+
+
+def find_widgets(widgets):
+    """
+    Find the descriptors of the widgets of a layout, in order.
+
+    :param list widgets: Widgets layout as expected by the config endpoint.
+
+    :return: The descriptors of the widgets.
+    :rtype: list
+    """
+    found = []
+    for descriptor in widgets:
+        if isinstance(descriptor, list):
+            found.extend(find_widgets(descriptor))
+        elif isinstance(descriptor, dict):
+            found.append(descriptor)
+    return found
+
+
+def build_data(descriptors):
+    """
+    Build the data of a push with random values for the given widgets.
+
+    :param list descriptors: Descriptors of the widgets.
+
+    :return: The data of a push.
+    :rtype: dict
+    """
+    data = {}
+    for descriptor in descriptors:
+        if descriptor['widget'] == 'graph':
+            data[descriptor['identifier']] = {
+                'overview': uniform(0.0, descriptor.get('maxvalue', 100.0)),
+                'value': None,
+                'total': None,
+            }
+            continue
+
+        total = 4096
+        data[descriptor['identifier']] = {
+            'overview': None,
+            'value': randint(0, total),
+            'total': total,
+        }
+    return data
+
+
+def percentile(values, rank):
+    """
+    Nearest rank percentile of a sorted list of values.
+
+    :param list values: Sorted values.
+    :param float rank: Rank of the percentile, between 0 and 100.
+
+    :return: The percentile, or None if there are no values.
+    """
+    if not values:
+        return None
+    index = max(int(ceil(rank / 100.0 * len(values))) - 1, 0)
+    return values[index]
+
+
+class LoadGenerator:
+    """
+    Load generator of agents pushing to the dashboard.
+
+    All the agents share a pool of keep-alive connections. Each agent
+    configures its own source and then pushes at a fixed rate, without
+    waiting for the previous push to complete, so a slow dashboard doesn't
+    lower the offered load and its latency is measured as seen by the agents.
+
+    :param str url: Base URL of the dashboard.
+    :param dict config: Payload of the ``/api/config`` request.
+    :param int agents: Number of agents to simulate.
+    :param float rate: Pushes per second of each agent.
+    :param float duration: Duration of the run in seconds.
+    :param int connections: Maximum number of connections to the dashboard.
+    :param float timeout: Timeout in seconds of each request.
+    :param str prefix: Prefix of the sources of the agents.
+    """
+
+    def __init__(
+        self, url, config,
+        agents=1, rate=1.0, duration=10.0,
+        connections=8, timeout=5.0, prefix='loadgen',
+    ):
+        assert agents > 0 and rate > 0 and duration > 0 and connections > 0
+
+        self._url = url.rstrip('/')
+        self._config = config
+        self._agents = agents
+        self._rate = rate
+        self._duration = duration
+        self._connections = connections
+        self._timeout = timeout
+        self._prefix = prefix
+
+        self._descriptors = find_widgets(config['widgets'])
+        self._session = None
+
+        # Statistics
+        self.latencies = []
+        self.errors = OrderedDict()
+        self.sent = 0
+
+    async def _post(self, endpoint, payload):
+        """
+        Post a request to the dashboard.
+
+        :return: The latency of the request in seconds.
+        :rtype: float
+
+        :raise ClientError: If the request failed or was rejected.
+        """
+        loop = get_event_loop()
+        url = '{}/api/{}'.format(self._url, endpoint)
+
+        async def post():
+            async with self._session.post(url, json=payload) as response:
+                await response.read()
+                response.raise_for_status()
+
+        start = loop.time()
+        await wait_for(post(), timeout=self._timeout)
+        return loop.time() - start
+
+    async def _push(self, source):
+        """
+        Push a random sample of an agent, recording its latency or error.
+        """
+        self.sent += 1
+        try:
+            latency = await self._post('push', {
+                'source': source,
+                'data': build_data(self._descriptors),
+            })
+        except (ClientError, TimeoutError) as e:
+            error = type(e).__name__
+            self.errors[error] = self.errors.get(error, 0) + 1
+            return
+        self.latencies.append(latency)
+
+    async def _agent(self, index):
+        """
+        Push at a fixed rate, without drifting, until the end of the run.
+        """
+        loop = get_event_loop()
+        source = '{}-{}'.format(self._prefix, index)
+        interval = 1.0 / self._rate
+
+        await self._post('config', dict(self._config, source=source))
+
+        # Spread the pushes of the agents along the interval
+        await sleep(interval * index / self._agents)
+
+        pending = set()
+        deadline = loop.time()
+        end = deadline + self._duration
+
+        while deadline < end:
+            task = ensure_future(self._push(source))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+            deadline += interval
+            await sleep(max(deadline - loop.time(), 0))
+
+        await gather(*pending)
+
+    async def _frames(self):
+        """
+        Scrape the number of frames drawn by the dashboard from its metrics.
+
+        :return: The number of frames, or None if unavailable.
+        :rtype: float
+        """
+        url = '{}/api/metrics'.format(self._url)
+        try:
+            async with self._session.get(url) as response:
+                response.raise_for_status()
+                text = await response.text()
+        except ClientError as e:
+            log.warning('Unable to get metrics from {}: {}'.format(url, e))
+            return None
+
+        for line in text.splitlines():
+            if line.startswith(FRAMES_METRIC + ' '):
+                return float(line.split()[-1])
+        return None
+
+    async def run(self):
+        """
+        Run the load and collect its statistics.
+
+        :return: Report of the run, as returned by :meth:`report`.
+        :rtype: OrderedDict
+        """
+        loop = get_event_loop()
+
+        self._session = ClientSession(
+            connector=TCPConnector(limit=self._connections),
+            headers={'User-Agent': 'coral_loadgen'},
+        )
+        try:
+            frames = await self._frames()
+            start = loop.time()
+
+            await gather(*[
+                self._agent(index) for index in range(self._agents)
+            ])
+
+            elapsed = loop.time() - start
+            if frames is not None:
+                end = await self._frames()
+                frames = None if end is None else end - frames
+        finally:
+            await self._session.close()
+            self._session = None
+
+        return self.report(elapsed, frames)
+
+    def report(self, elapsed, frames=None):
+        """
+        Summarize the statistics of the run.
+
+        :param float elapsed: Duration of the run in seconds.
+        :param float frames: Number of frames drawn by the dashboard during
+         the run, or None if unknown.
+
+        :return: Report of the run. Latencies are in milliseconds.
+        :rtype: OrderedDict
+        """
+        latencies = sorted(self.latencies)
+        failed = sum(self.errors.values())
+
+        report = OrderedDict([
+            ('agents', self._agents),
+            ('offered_rate', self._agents * self._rate),
+            ('elapsed', elapsed),
+            ('sent', self.sent),
+            ('throughput', len(latencies) / elapsed),
+            ('error_rate', failed / self.sent if self.sent else 0.0),
+            ('errors', self.errors),
+        ])
+        for rank in [50, 95, 99]:
+            value = percentile(latencies, rank)
+            report['p{}'.format(rank)] = \
+                None if value is None else value * 1e3
+        report['max'] = latencies[-1] * 1e3 if latencies else None
+        report['fps'] = None if frames is None else frames / elapsed
+
+        return report
+
+
+def print_report(report):
+    """
+    Print a report of a run in a human readable format.
+    """
+    def fmt(value, unit):
+        if value is None:
+            return 'n/a'
+        return '{:.2f} {}'.format(value, unit)
+
+    print('Agents          {}'.format(report['agents']))
+    print('Elapsed         {}'.format(fmt(report['elapsed'], 's')))
+    print('Sent            {}'.format(report['sent']))
+    print('Offered         {}'.format(fmt(report['offered_rate'], 'push/s')))
+    print('Throughput      {}'.format(fmt(report['throughput'], 'push/s')))
+    print('Error rate      {}'.format(fmt(report['error_rate'] * 100, '%')))
+    for error, count in report['errors'].items():
+        print('  {:14}{}'.format(error, count))
+    for key in ['p50', 'p95', 'p99', 'max']:
+        print('Latency {:8}{}'.format(key, fmt(report[key], 'ms')))
+    print('Dashboard FPS   {}'.format(fmt(report['fps'], 'fps')))
+
+
+def parse_args(argv=None):
+    """
+    Argument parsing routine.
+
+    :param argv: A list of argument strings.
+    :type argv: list
+
+    :return: A parsed and verified arguments namespace.
+    :rtype: :py:class:`argparse.Namespace`
+    """
+    parser = build_parser('Coral Load Generator')
+    parser.add_argument(
+        '--config',
+        help='JSON file with the widgets layout, the Coral layout by default',
+    )
+    parser.add_argument(
+        '--agents',
+        help='Number of agents to simulate',
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        '--rate',
+        help='Pushes per second of each agent',
+        type=float,
+        default=1.0,
+    )
+    parser.add_argument(
+        '--duration',
+        help='Duration of the run in seconds',
+        type=float,
+        default=10.0,
+    )
+    parser.add_argument(
+        '--connections',
+        help='Maximum number of connections to the dashboard',
+        type=int,
+        default=8,
+    )
+    parser.add_argument(
+        '--timeout',
+        help='Timeout of each request in seconds',
+        type=float,
+        default=5.0,
+    )
+    parser.add_argument(
+        '--prefix',
+        help='Prefix of the sources of the agents',
+        default='loadgen',
+    )
+
+    args = parser.parse_args(argv)
+
+    check_positive(
+        args, 'agents', 'rate', 'duration', 'connections', 'timeout',
+    )
+    setup_logging(args.verbosity)
+
+    return args
+
+
+def main():
+    """
+    Load generator main function.
+    """
+    try:
+        args = parse_args()
+        config = load_config(args.config)
+    except (InvalidArgument, OSError, ValueError) as e:
+        log.error(e)
+        exit(-1)
+
+    generator = LoadGenerator(
+        args.dashboard, config,
+        agents=args.agents,
+        rate=args.rate,
+        duration=args.duration,
+        connections=args.connections,
+        timeout=args.timeout,
+        prefix=args.prefix,
+    )
+
+    log.info('Running {} agents at {} pushes per second for {} s'.format(
+        args.agents, args.rate, args.duration,
+    ))
+
+    try:
+        report = get_event_loop().run_until_complete(generator.run())
+    except (ClientError, TimeoutError) as e:
+        log.error('Unable to configure the dashboard at {}: {}'.format(
+            args.dashboard, str(e) or type(e).__name__,
+        ))
+        exit(-1)
+    except KeyboardInterrupt:
+        exit(-1)
+
+    print_report(report)
+    exit(0)
+
+
+if __name__ == '__main__':
+    main()
+
+
+__all__ = [
+    'LoadGenerator',
+    'load_config',
+    'main',
+]
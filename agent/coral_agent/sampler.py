@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+"""
+System sampler producing the data for the Coral widgets.
+
+Every source is read through a file descriptor opened once and re-read from
+the beginning with ``pread``, so sampling doesn't open, allocate file
+objects or decode text on each cycle.
+"""
+
+from glob import glob
+from pathlib import Path
+from functools import partial
+from time import monotonic, perf_counter
+from collections import OrderedDict
+from os import open as os_open, close, pread, statvfs, O_RDONLY
+from logging import getLogger as get_logger
+
+
+log = get_logger(__name__)
+
+
+class Reader:
+    """
+    Reader of a /proc or sysfs file that keeps the file descriptor open.
+
+    :param str path: Path to the file.
+    :param int size: Maximum number of bytes to read.
+    """
+
+    def __init__(self, path, size=4096):
+        self.path = path
+        self._size = size
+        self._fd = os_open(str(path), O_RDONLY)
+
+    def read(self):
+        """
+        Read the file again from the beginning.
+
+        :return: Content of the file.
+        :rtype: bytes
+        """
+        return pread(self._fd, self._size, 0)
+
+    def read_int(self):
+        """
+        Read the file as a single integer, as for most sysfs attributes.
+
+        :rtype: int
+        """
+        return int(pread(self._fd, self._size, 0))
+
+    def close(self):
+        if self._fd is not None:
+            close(self._fd)
+            self._fd = None
+
+
+class Probe:
+    """
+    Base class of the probes that sample the value of a widget.
+
+    :param str identifier: Identifier of the widget.
+    """
+
+    def __init__(self, identifier):
+        self.identifier = identifier
+        self._readers = []
+
+    def _reader(self, path, size=4096):
+        reader = Reader(path, size=size)
+        self._readers.append(reader)
+        return reader
+
+    def sample(self, now):
+        """
+        Sample the value of the widget.
+
+        :param float now: Monotonic time of the sample.
+
+        :return: The widget value as a dictionary with the ``overview``,
+         ``value`` and ``total`` keys, or None if no value is available yet.
+        :rtype: dict
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        for reader in self._readers:
+            reader.close()
+
+
+class CPULoad(Probe):
+    """
+    CPU load percentage, from the aggregated line of /proc/stat.
+    """
+
+    def __init__(self, identifier, path):
+        super().__init__(identifier)
+        # The aggregated cpu line is the first one
+        self._stat = self._reader(path, size=256)
+        self._last = None
+
+    def sample(self, now):
+        # cpu user nice system idle iowait irq softirq steal ...
+        fields = self._stat.read().split(None, 9)
+        idle = int(fields[4]) + int(fields[5])
+        total = sum(map(int, fields[1:9]))
+
+        last = self._last
+        self._last = (idle, total)
+        if last is None or total == last[1]:
+            return None
+
+        busy = 1.0 - (idle - last[0]) / (total - last[1])
+        return {'overview': busy * 100.0, 'value': None, 'total': None}
+
+
+class Memory(Probe):
+    """
+    Used memory in MB, from /proc/meminfo.
+    """
+
+    def __init__(self, identifier, path):
+        super().__init__(identifier)
+        # MemTotal, MemFree and MemAvailable are the first lines
+        self._meminfo = self._reader(path, size=256)
+
+    def sample(self, now):
+        fields = self._meminfo.read().split(None, 9)
+        total = int(fields[1])
+        available = int(fields[7])
+
+        return {
+            'overview': None,
+            'value': (total - available) // 1024,
+            'total': total // 1024,
+        }
+
+
+class Network(Probe):
+    """
+    Network throughput in Mbps (received plus transmitted), from
+    /proc/net/dev.
+
+    :param interfaces: Names of the interfaces to sum. If not given, all
+     interfaces except loopback are used.
+    :param int speed: Link speed in Mbps, used as total.
+    """
+
+    def __init__(self, identifier, path, interfaces=None, speed=1000):
+        super().__init__(identifier)
+        self._dev = self._reader(path, size=16384)
+        self._interfaces = None if interfaces is None else {
+            interface.encode('utf-8') for interface in interfaces
+        }
+        self._speed = speed
+        self._last = None
+
+    def sample(self, now):
+        total = 0
+
+        # Skip the two header lines
+        for line in self._dev.read().splitlines()[2:]:
+            name, _, counters = line.partition(b':')
+            name = name.strip()
+
+            if self._interfaces is None:
+                if name == b'lo':
+                    continue
+            elif name not in self._interfaces:
+                continue
+
+            fields = counters.split()
+            total += int(fields[0]) + int(fields[8])
+
+        last = self._last
+        self._last = (now, total)
+        if last is None or now == last[0]:
+            return None
+
+        mbps = (total - last[1]) * 8 / (now - last[0]) / 1e6
+        return {
+            'overview': None,
+            'value': min(int(round(mbps)), self._speed),
+            'total': self._speed,
+        }
+
+
+class Temperature(Probe):
+    """
+    Temperature in Celsius, from a hwmon ``temp*_input`` attribute.
+    """
+
+    def __init__(self, identifier, path):
+        super().__init__(identifier)
+        self._input = self._reader(path, size=32)
+
+    def sample(self, now):
+        return {
+            'overview': self._input.read_int() / 1000.0,
+            'value': None,
+            'total': None,
+        }
+
+
+class Percentage(Probe):
+    """
+    Percentage from a sysfs attribute, like the ``gpu_busy_percent`` of
+    amdgpu devices.
+    """
+
+    def __init__(self, identifier, path):
+        super().__init__(identifier)
+        self._input = self._reader(path, size=32)
+
+    def sample(self, now):
+        return {
+            'overview': float(self._input.read_int()),
+            'value': None,
+            'total': None,
+        }
+
+
+class Fan(Probe):
+    """
+    Fan or pump speed in RPM, from a hwmon ``fan*_input`` attribute.
+
+    :param int maximum: Maximum speed in RPM, used as total.
+    """
+
+    def __init__(self, identifier, path, maximum=1400):
+        super().__init__(identifier)
+        self._input = self._reader(path, size=32)
+        self._maximum = maximum
+
+    def sample(self, now):
+        return {
+            'overview': None,
+            'value': min(self._input.read_int(), self._maximum),
+            'total': self._maximum,
+        }
+
+
+class Disk(Probe):
+    """
+    Used disk space in MB of the filesystem mounted at the given path.
+    """
+
+    def __init__(self, identifier, path):
+        super().__init__(identifier)
+        self._path = str(path)
+
+    def sample(self, now):
+        stat = statvfs(self._path)
+        total = stat.f_blocks * stat.f_frsize
+        free = stat.f_bfree * stat.f_frsize
+
+        return {
+            'overview': None,
+            'value': (total - free) // 10**6,
+            'total': total // 10**6,
+        }
+
+
+def find_hwmon(names, attribute, root='/sys/class/hwmon'):
+    """
+    Find an attribute of the first hwmon device with one of the given names.
+
+    :param list names: Names of the hwmon devices (as in their ``name``
+     attribute), in order of preference.
+    :param str attribute: Attribute glob, for example ``temp1_input`` or
+     ``fan*_input``.
+    :param str root: Root of the hwmon class.
+
+    :return: Path to the attribute, or None if not found.
+    :rtype: str
+    """
+    devices = {}
+    for name in glob('{}/hwmon*/name'.format(root)):
+        name = Path(name)
+        devices.setdefault(name.read_text().strip(), name.parent)
+
+    for name in names:
+        device = devices.get(name)
+        if device is None:
+            continue
+        found = sorted(glob(str(device / attribute)))
+        if found:
+            return found[0]
+
+    return None
+
+
+CPU_HWMON = ['coretemp', 'k10temp', 'zenpower', 'cpu_thermal']
+GPU_HWMON = ['amdgpu', 'nouveau', 'radeon']
+GPU_BUSY = '/sys/class/drm/card*/device/gpu_busy_percent'
+
+
+class Sampler:
+    """
+    Sampler of the Coral widgets.
+
+    Sensors that are not available in the system are skipped, and their
+    widgets are not included in the samples.
+
+    :param str temp_coolant: Path to the hwmon attribute of the coolant
+     temperature sensor.
+    :param str temp_gpu: Path to the hwmon attribute of the GPU temperature.
+     Autodetected if not given.
+    :param str temp_cpu: Path to the hwmon attribute of the CPU temperature.
+     Autodetected if not given.
+    :param str pump: Path to the hwmon attribute of the pump or fan speed.
+     Autodetected if not given.
+    :param int pump_max: Maximum speed of the pump or fan in RPM.
+    :param list interfaces: Network interfaces to measure. All but loopback
+     if not given.
+    :param int link_speed: Network link speed in Mbps.
+    :param str disk_os: Mount point of the operating system disk.
+    :param str disk_apps: Mount point of the applications disk.
+    """
+
+    def __init__(
+        self,
+        temp_coolant=None, temp_gpu=None, temp_cpu=None,
+        pump=None, pump_max=1400,
+        interfaces=None, link_speed=1000,
+        disk_os='/', disk_apps=None,
+    ):
+        temp_gpu = temp_gpu or find_hwmon(GPU_HWMON, 'temp1_input')
+        temp_cpu = temp_cpu or find_hwmon(CPU_HWMON, 'temp1_input')
+        pump = pump or find_hwmon(
+            CPU_HWMON + GPU_HWMON + ['nct6775', 'it87'], 'fan*_input',
+        )
+        gpu_busy = sorted(glob(GPU_BUSY))
+
+        sources = [
+            ('temp_coolant', temp_coolant, Temperature),
+            ('temp_gpu', temp_gpu, Temperature),
+            ('temp_cpu', temp_cpu, Temperature),
+            ('pump', pump, partial(Fan, maximum=pump_max)),
+            ('load_gpu', gpu_busy[0] if gpu_busy else None, Percentage),
+            ('load_cpu', '/proc/stat', CPULoad),
+            ('memory', '/proc/meminfo', Memory),
+            ('network', '/proc/net/dev', partial(
+                Network, interfaces=interfaces, speed=link_speed,
+            )),
+            ('disk_os', disk_os, Disk),
+            ('disk_apps', disk_apps, Disk),
+        ]
+
+        self.probes = []
+        for identifier, path, probe in sources:
+            if path is None:
+                log.info('No source for {}, skipping'.format(identifier))
+                continue
+            try:
+                self.probes.append(probe(identifier, path))
+            except OSError as e:
+                log.warning('Unable to sample {}: {}'.format(identifier, e))
+
+        # Duration in seconds of the last sample
+        self.overhead = 0.0
+
+    def sample(self):
+        """
+        Sample all the widgets.
+
+        :return: An ordered dictionary mapping the identifier of the widgets
+         to their values, as expected by the dashboard push endpoint.
+        :rtype: OrderedDict
+        """
+        start = perf_counter()
+        now = monotonic()
+
+        data = OrderedDict()
+        for probe in self.probes:
+            try:
+                value = probe.sample(now)
+            except (OSError, ValueError, IndexError) as e:
+                log.warning('Unable to sample {}: {}'.format(
+                    probe.identifier, e,
+                ))
+                continue
+
+            # A zero total has no completion, as a maximum speed of 0
+            if value is not None and value['total'] != 0:
+                data[probe.identifier] = value
+
+        self.overhead = perf_counter() - start
+        return data
+
+    def close(self):
+        """
+        Close all the readers.
+        """
+        for probe in self.probes:
+            probe.close()
+
+
+__all__ = [
+    'Sampler',
+]
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+"""
+Offline spool of samples in a memory mapped ring file.
+"""
+
+from mmap import mmap
+from pathlib import Path
+from struct import Struct
+from json import dumps, loads
+from logging import getLogger as get_logger
+
+
+log = get_logger(__name__)
+
+
+class Spool:
+    """
+    Fixed size ring of samples stored in a memory mapped file.
+
+    The file has a header followed by ``slots`` slots of ``slot_size`` bytes.
+    Each slot holds a sample encoded as compact JSON, prefixed by its length.
+    When the ring is full the oldest samples are overwritten, so disk usage
+    is bounded. The header keeps the position of the oldest and newest
+    samples, so the spool survives restarts of the agent.
+
+    The header and the slots aren't written atomically, so a crash can leave
+    torn slots. Slots that can't be decoded are discarded when read.
+
+    :param str path: Path to the spool file.
+    :param int slots: Maximum number of samples in the spool.
+    :param int slot_size: Maximum size in bytes of a sample, including the
+     length prefix.
+    """
+
+    MAGIC = b'CRLS'
+    VERSION = 1
+
+    # Magic, version, slot size, number of slots, head and tail. Head is the
+    # absolute number of the oldest sample, tail the absolute number of the
+    # next sample to write.
+    HEADER = Struct('<4sHxxIIQQ')
+    LENGTH = Struct('<I')
+
+    def __init__(self, path, slots=8192, slot_size=1024):
+        assert slots > 0 and slot_size > self.LENGTH.size
+
+        self.path = Path(path)
+        self._slots = slots
+        self._slot_size = slot_size
+        self._size = self.HEADER.size + slots * slot_size
+
+        exists = self.path.is_file()
+        self._file = self.path.open('r+b' if exists else 'w+b')
+        if self._file.seek(0, 2) != self._size:
+            self._file.truncate(self._size)
+        self._map = mmap(self._file.fileno(), self._size)
+
+        self._head = 0
+        self._tail = 0
+
+        if exists:
+            magic, version, slot_size, slots, head, tail = \
+                self.HEADER.unpack_from(self._map)
+            if (magic, version, slot_size, slots) == (
+                self.MAGIC, self.VERSION, self._slot_size, self._slots
+            ) and head <= tail <= head + self._slots:
+                self._head = head
+                self._tail = tail
+                log.info('Spool at {} has {} samples'.format(
+                    self.path, len(self),
+                ))
+            else:
+                log.warning(
+                    'Spool at {} has a different format, discarding '
+                    'it'.format(self.path)
+                )
+
+        self._write_header()
+
+    def __len__(self):
+        return self._tail - self._head
+
+    def _write_header(self):
+        self.HEADER.pack_into(
+            self._map, 0,
+            self.MAGIC, self.VERSION, self._slot_size, self._slots,
+            self._head, self._tail,
+        )
+
+    def _offset(self, number):
+        return self.HEADER.size + (number % self._slots) * self._slot_size
+
+    def append(self, sample):
+        """
+        Append a sample, overwriting the oldest one if the spool is full.
+
+        :param dict sample: Sample to append. Must be JSON serializable.
+
+        :return: True if the sample was spooled, False if it is too large.
+        :rtype: bool
+        """
+        encoded = dumps(sample, separators=(',', ':')).encode('utf-8')
+        if len(encoded) > self._slot_size - self.LENGTH.size:
+            log.warning('Sample of {} bytes is too large to spool'.format(
+                len(encoded),
+            ))
+            return False
+
+        offset = self._offset(self._tail)
+        self.LENGTH.pack_into(self._map, offset, len(encoded))
+        start = offset + self.LENGTH.size
+        self._map[start:start + len(encoded)] = encoded
+
+        self._tail += 1
+        if len(self) > self._slots:
+            self._head = self._tail - self._slots
+        self._write_header()
+        return True
+
+    def _read(self, number):
+        """
+        Read the sample of a slot.
+
+        :param int number: Absolute number of the sample.
+
+        :return: The sample, or None if the slot can't be decoded.
+        :rtype: dict
+        """
+        offset = self._offset(number)
+        length, = self.LENGTH.unpack_from(self._map, offset)
+        start = offset + self.LENGTH.size
+
+        try:
+            if length > self._slot_size - self.LENGTH.size:
+                raise ValueError('Invalid length {}'.format(length))
+            sample = loads(self._map[start:start + length].decode('utf-8'))
+            if not isinstance(sample, dict):
+                raise ValueError('Invalid sample {!r}'.format(sample))
+
+        except ValueError as e:
+            log.warning(
+                'Discarding corrupt sample {} of spool at {}: {}'.format(
+                    number, self.path, e,
+                )
+            )
+            return None
+
+        return sample
+
+    def peek(self, count):
+        """
+        Read the oldest samples without removing them.
+
+        Corrupt samples at the head of the spool are removed. A batch stops
+        before a corrupt sample, so consuming the samples returned never
+        skips one.
+
+        :param int count: Maximum number of samples to read.
+
+        :return: List of samples, oldest first.
+        :rtype: list
+        """
+        samples = []
+        number = self._head
+
+        while number < self._tail and len(samples) < count:
+            sample = self._read(number)
+            number += 1
+
+            if sample is not None:
+                samples.append(sample)
+                continue
+
+            if samples:
+                break
+
+            self._head = number
+            self._write_header()
+
+        return samples
+
+    def consume(self, count):
+        """
+        Remove the oldest samples.
+
+        :param int count: Number of samples to remove.
+        """
+        self._head = min(self._head + count, self._tail)
+        self._write_header()
+
+    def flush(self):
+        """
+        Flush the spool to disk.
+        """
+        self._map.flush()
+
+    def close(self):
+        """
+        Flush and close the spool.
+        """
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._file.close()
+            self._map = None
+
+
+__all__ = [
+    'Spool',
+]
@@ -0,0 +1,522 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+"""
+Asynchronous transport of the samples to the dashboard.
+"""
+
+from time import time
+from random import uniform
+from collections import deque
+from logging import getLogger as get_logger
+from asyncio import (
+    CancelledError, Event, Lock, TimeoutError, ensure_future, gather, sleep,
+    wait_for,
+)
+
+from aiohttp import ClientSession, ClientError, TCPConnector
+
+
+log = get_logger(__name__)
+
+
+class TransportError(Exception):
+    """
+    Raised when the dashboard can't be reached or fails to process a
+    request, and the request can be retried.
+    """
+
+
+class DashboardError(TransportError):
+    """
+    Raised when the dashboard fails to process a request. Retrying the
+    request may fail the same way, so it's only retried a few times.
+    """
+
+
+class Transport:
+    """
+    Transport of samples to the dashboard.
+
+    Samples are submitted without blocking to a bounded queue, and sent by a
+    fixed number of workers using a pool of keep-alive connections. Failed
+    requests are retried with exponential backoff and jitter. A sample the
+    dashboard fails to process is dropped after some retries, so it doesn't
+    block the queue forever.
+
+    The dashboard is configured on the first push, and again each time it
+    reports it doesn't know the pushed widgets, as it happens after it
+    restarts.
+
+    If a spool is given, when the dashboard is unreachable the samples are
+    written to the spool instead of being retried, and once the dashboard is
+    reachable again the spooled samples are replayed in order, in batches,
+    before going back to normal operation.
+
+    In delta mode only the values that changed since the previous push are
+    sent, and the dashboard advances the graphs missing from the push with
+    their last value. Every ``DELTA_KEYFRAME`` pushes all the values are sent,
+    so a push processed out of order can't leave a stale value for long.
+
+    :param str url: Base URL of the dashboard.
+    :param dict config: Payload of the ``/api/config`` request.
+    :param int inflight: Maximum number of requests in flight. With more
+     than one, consecutive samples are sent concurrently and may reach the
+     dashboard out of order, and so be appended to the graphs out of order.
+    :param int size: Maximum number of samples waiting to be sent.
+    :param str policy: What to do with a new sample when the queue is full.
+     ``drop-oldest`` drops the oldest sample in the queue, ``coalesce``
+     merges it into the newest sample in the queue, keeping the latest value
+     of each widget.
+    :param float timeout: Timeout in seconds of each request.
+    :param float backoff: Initial delay in seconds of the retries.
+    :param float backoff_max: Maximum delay in seconds of the retries.
+    :param int retries: Maximum number of retries of a sample, or of a batch
+     of spooled samples, the dashboard failed to process.
+    :param spool: Spool to write the samples to while the dashboard is
+     unreachable.
+    :type spool: :class:`coral_agent.spool.Spool`
+    :param int replay_batch: Maximum number of samples replayed per request.
+    :param str source: Identifier of the agent in the dashboard, or None for
+     the default source.
+    :param bool delta: Push only the values that changed since the previous
+     push.
+    """
+
+    POLICIES = ('drop-oldest', 'coalesce')
+    DELTA_KEYFRAME = 30
+
+    def __init__(
+        self, url, config,
+        inflight=1, size=100, policy='drop-oldest',
+        timeout=5.0, backoff=0.5, backoff_max=30.0, retries=5,
+        spool=None, replay_batch=100, source=None, delta=False,
+    ):
+        assert policy in self.POLICIES
+        assert inflight > 0 and size > 0
+
+        self._url = url.rstrip('/')
+        self._config = config
+        self._inflight = inflight
+        self._size = size
+        self._policy = policy
+        self._timeout = timeout
+        self._backoff = backoff
+        self._backoff_max = backoff_max
+        self._retries = retries
+        self._source = source
+
+        # Last values known by the dashboard, for the delta pushes
+        self._delta = delta
+        self._values = {}
+        self._deltas = 0
+
+        self._queue = deque()
+        self._ready = Event()
+        self._config_lock = Lock()
+        self._configured = False
+        self._tree = frozenset()
+
+        self._spool = spool
+        self._replay_batch = replay_batch
+        self._replayer = None
+
+        self._session = None
+        self._workers = []
+
+        # Statistics
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    async def start(self):
+        """
+        Open the connection pool and start the workers.
+        """
+        self._session = ClientSession(
+            connector=TCPConnector(limit=self._inflight),
+            headers={'User-Agent': 'coral_agent'},
+        )
+        self._workers = [
+            ensure_future(self._worker()) for _ in range(self._inflight)
+        ]
+
+        # Replay the samples spooled by a previous run
+        if self._spool is not None and len(self._spool):
+            self._replayer = ensure_future(self._replay())
+
+    async def close(self):
+        """
+        Stop the workers and close the connection pool.
+
+        Samples waiting to be sent are spooled, if there is a spool.
+        """
+        tasks = self._workers
+        if self._replayer is not None:
+            tasks = tasks + [self._replayer]
+
+        for task in tasks:
+            task.cancel()
+        await gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._replayer = None
+
+        if self._spool is not None:
+            self._spool_queue()
+            self._spool.flush()
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def submit(self, data, title=None, timestamp=None):
+        """
+        Submit a sample to be pushed to the dashboard. Never blocks.
+
+        :param dict data: Data of the sample, as expected by the push
+         endpoint.
+        :param str title: Title of the dashboard.
+        :param float timestamp: Time of the sample, in seconds since the
+         epoch. Now if not given.
+        """
+        sample = {
+            'timestamp': time() if timestamp is None else timestamp,
+            'title': title,
+            'data': data,
+        }
+
+        # Keep the order of the samples while there are samples spooled
+        if self._replayer is not None:
+            self._spool.append(sample)
+            return
+
+        if len(self._queue) >= self._size:
+            if self._policy == 'coalesce':
+                newest = self._queue[-1]
+                newest['data'].update(data)
+                newest['timestamp'] = sample['timestamp']
+                newest['title'] = title
+                self.coalesced += 1
+                return
+
+            self._queue.popleft()
+            self.dropped += 1
+
+        self._queue.append(sample)
+        self._ready.set()
+
+    async def _next(self):
+        """
+        Wait for the next sample in the queue.
+        """
+        while not self._queue:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._queue.popleft()
+
+    async def _worker(self):
+        """
+        Send samples until cancelled.
+        """
+        attempt = 0
+
+        # Last sample the dashboard failed to process, and its retries
+        failed = None
+        retries = 0
+
+        while True:
+            sample = await self._next()
+
+            try:
+                await self._push(sample)
+                self.sent += 1
+                attempt = 0
+
+            except TransportError as e:
+                self.failures += 1
+
+                # The dashboard is reachable but fails to process the sample
+                if isinstance(e, DashboardError):
+                    retries = retries + 1 if sample is failed else 0
+                    failed = sample
+                    if retries >= self._retries:
+                        log.error(
+                            '{}. Dropping sample after {} retries'.format(
+                                e, retries,
+                            )
+                        )
+                        failed = None
+                        self.dropped += 1
+                        continue
+
+                # Spool the sample and the queue until the dashboard is back
+                elif self._spool is not None:
+                    log.warning('{}. Spooling samples ...'.format(e))
+                    self._spool.append(sample)
+                    self._spool_queue()
+                    if self._replayer is None:
+                        self._replayer = ensure_future(self._replay())
+                    continue
+
+                # Put the sample back, unless newer samples filled the queue
+                if len(self._queue) < self._size:
+                    self._queue.appendleft(sample)
+                    self._ready.set()
+                else:
+                    self.dropped += 1
+
+                delay = self._delay(attempt)
+                attempt += 1
+                log.warning('{}. Retrying in {:.2f} seconds ...'.format(
+                    e, delay,
+                ))
+                await sleep(delay)
+
+    def _spool_queue(self):
+        """
+        Move all the samples waiting to be sent to the spool.
+        """
+        while self._queue:
+            self._spool.append(self._queue.popleft())
+
+    async def _replay(self):
+        """
+        Replay the spooled samples in batches until the spool is empty.
+        """
+        attempt = 0
+        retries = 0
+        replayed = 0
+
+        try:
+            while len(self._spool):
+                samples = self._spool.peek(self._replay_batch)
+
+                # Only corrupt samples were left
+                if not samples:
+                    continue
+
+                try:
+                    await self._send(
+                        'push/batch',
+                        {
+                            'title': samples[-1]['title'],
+                            'frames': [
+                                {
+                                    'timestamp': sample['timestamp'],
+                                    'data': sample['data'],
+                                } for sample in samples
+                            ],
+                        },
+                        set().union(*(sample['data'] for sample in samples)),
+                    )
+
+                except DashboardError as e:
+                    self.failures += 1
+
+                    # Drop a batch the dashboard keeps failing to process
+                    if retries >= self._retries:
+                        log.error(
+                            '{}. Dropping {} spooled samples after {} '
+                            'retries'.format(e, len(samples), retries)
+                        )
+                        self._spool.consume(len(samples))
+                        self.dropped += len(samples)
+                        retries = 0
+                        continue
+
+                    retries += 1
+                    delay = self._delay(attempt)
+                    attempt += 1
+                    log.warning(
+                        '{}. Retrying replay in {:.2f} seconds ...'.format(
+                            e, delay,
+                        )
+                    )
+                    await sleep(delay)
+                    continue
+
+                except TransportError as e:
+                    self.failures += 1
+                    delay = self._delay(attempt)
+                    attempt += 1
+                    log.warning(
+                        '{}. Retrying replay in {:.2f} seconds ...'.format(
+                            e, delay,
+                        )
+                    )
+                    await sleep(delay)
+                    continue
+
+                self._spool.consume(len(samples))
+                self._values = {}
+                self.sent += len(samples)
+                replayed += len(samples)
+                attempt = 0
+                retries = 0
+
+            self._spool.flush()
+            log.info('Replayed {} spooled samples'.format(replayed))
+
+        except CancelledError:
+            raise
+
+        except Exception:
+            log.exception('Unable to replay the spooled samples')
+
+        finally:
+            # Go back to pushing live samples even if the replay fails
+            self._replayer = None
+
+    def _delay(self, attempt):
+        """
+        Exponential backoff delay with jitter for the given attempt.
+        """
+        delay = min(self._backoff * (2 ** attempt), self._backoff_max)
+        return uniform(delay / 2, delay)
+
+    async def _request(self, endpoint, payload):
+        """
+        Post a request to the dashboard.
+
+        :param str endpoint: Name of the endpoint.
+        :param dict payload: Payload of the request.
+
+        :return: The response of the dashboard, or None if the request was
+         rejected and shouldn't be retried.
+        :rtype: dict
+        """
+        url = '{}/api/{}'.format(self._url, endpoint)
+
+        if self._source is not None:
+            payload = dict(payload, source=self._source)
+
+        async def post():
+            async with self._session.post(url, json=payload) as response:
+                if response.status >= 500:
+                    raise DashboardError(
+                        'Dashboard failed to process {} request: {}'.format(
+                            endpoint, await response.text(),
+                        )
+                    )
+                if response.status >= 400:
+                    log.error('Dashboard rejected {} request: {}'.format(
+                        endpoint, await response.text(),
+                    ))
+                    return None
+                return await response.json()
+
+        try:
+            return await wait_for(post(), timeout=self._timeout)
+        except (ClientError, TimeoutError, ValueError) as e:
+            raise TransportError(
+                'Unable to send {} request to {}: {}'.format(
+                    endpoint, url, str(e) or type(e).__name__,
+                )
+            )
+
+    async def _configure(self):
+        """
+        Configure the dashboard, once for all the workers.
+        """
+        async with self._config_lock:
+            if self._configured:
+                return
+            response = await self._request('config', self._config)
+            if response is None:
+                return
+
+            self._configured = True
+            self._values = {}
+            self._deltas = 0
+            self._tree = frozenset(response.get('tree', ()))
+            log.info('Dashboard configured with tree {}'.format(
+                sorted(self._tree),
+            ))
+
+    async def _push(self, sample):
+        """
+        Push a sample to the dashboard.
+        """
+        data = sample['data']
+        payload = {
+            'title': sample['title'],
+            'timestamp': sample['timestamp'],
+            'data': data,
+        }
+
+        if not self._delta:
+            await self._send('push', payload, data)
+            return
+
+        values = self._values
+        changed = {
+            key: value for key, value in data.items()
+            if values.get(key) != value
+        }
+
+        if self._deltas < self.DELTA_KEYFRAME and len(changed) < len(data):
+            # The push needs at least one value to advance the graphs
+            if not changed:
+                key = next(iter(data))
+                changed[key] = data[key]
+
+            self._deltas += 1
+            await self._send(
+                'push', dict(payload, data=changed, delta=True), changed,
+                full=payload,
+            )
+        else:
+            changed = data
+            self._deltas = 0
+            await self._send('push', payload, data)
+
+        self._values.update(changed)
+
+    async def _send(self, endpoint, payload, keys, full=None):
+        """
+        Send a push request to the dashboard, configuring it first if needed.
+
+        :param str endpoint: Name of the push endpoint.
+        :param dict payload: Payload of the request.
+        :param keys: Identifiers of the widgets pushed.
+        :param dict full: Payload to send instead of a delta payload after
+         configuring the dashboard again.
+        """
+        if not self._configured:
+            await self._configure()
+
+        response = await self._request(endpoint, payload)
+        if response is None:
+            return
+
+        # The dashboard doesn't know the pushed widgets, probably because it
+        # restarted. Configure it again and push the sample again.
+        expected = self._tree.intersection(keys)
+        if not expected.issubset(response.get('pushed', ())):
+            log.info('Dashboard lost its configuration, reconfiguring ...')
+            self._configured = False
+            await self._configure()
+            await self._request(endpoint, payload if full is None else full)
+
+
+__all__ = [
+    'DashboardError',
+    'Transport',
+    'TransportError',
+]
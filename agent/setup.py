@@ -178,6 +178,7 @@ setup(
     entry_points={
         'console_scripts': [
             'coral_agent = coral_agent.__main__:main',
+            'coral_loadgen = coral_agent.loadgen:main',
         ]
     },
 )
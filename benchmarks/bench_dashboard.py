@@ -0,0 +1,332 @@
+"""
+Benchmark suite of the dashboard ingestion, validation and rendering.
+
+Drives the dashboard in process, with the UI drawn to an in-memory screen,
+and saves the results as JSON so they can be compared between versions::
+
+    python3 bench_dashboard.py --output before.json
+    python3 bench_dashboard.py --output after.json --compare before.json
+"""
+
+from time import time, perf_counter
+from random import uniform
+from timeit import repeat
+from platform import python_version
+from collections import OrderedDict
+from warnings import simplefilter
+from asyncio import new_event_loop, set_event_loop, gather
+
+from ujson import dumps, loads
+from aiohttp.test_utils import TestServer, TestClient
+
+from coral_agent.palette import parse_palette
+from coral_agent.coral import CORAL_PALETTE, CORAL_WIDGETS
+from coral_dashboard import __version__
+from coral_dashboard.query import aggregator
+from coral_dashboard.schema import validate_schema
+from coral_dashboard.dashboard import Dashboard
+from coral_dashboard.ui.manager import UIManager
+from coral_dashboard.ui.screen import HeadlessScreen
+
+from payloads import build_data, build_push
+
+
+SIZES = [(80, 24), (120, 48), (240, 64)]
+GRAPHS = [4, 16, 64]
+
+
+def measure(function, number):
+    """
+    Measure the best time per call of a function, in microseconds.
+    """
+    best = min(repeat(function, number=number, repeat=5))
+    return best / number * 1e6
+
+
+def percentiles(latencies):
+    """
+    Percentiles of a list of latencies in seconds, in milliseconds.
+    """
+    return OrderedDict(
+        (name, aggregator(name)(latencies) * 1e3)
+        for name in ['p50', 'p95', 'p99']
+    )
+
+
+def build_graphs(count, columns=4, widget='graph'):
+    """
+    Build a widgets layout with the given number of graphs.
+    """
+    graphs = [
+        {
+            'widget': widget,
+            'identifier': 'graph_{}'.format(index),
+            'title': 'Graph {}'.format(index),
+            'unit': '%',
+        } for index in range(count)
+    ]
+    return [
+        graphs[index:index + columns]
+        for index in range(0, count, columns)
+    ]
+
+
+def bench_validate():
+    document = build_push()
+    return OrderedDict([
+        ('push_us', measure(lambda: validate_schema('push', document), 20000)),
+    ])
+
+
+def bench_build():
+    ui = UIManager()
+    return OrderedDict([
+        ('coral_widgets_us', measure(
+            lambda: UIManager().build(CORAL_WIDGETS, None), 200,
+        )),
+        ('coral_widgets_unchanged_us', measure(
+            lambda: ui.build(CORAL_WIDGETS, None), 2000,
+        )),
+    ])
+
+
+def bench_widgets():
+    ui = UIManager()
+    ui.build(CORAL_WIDGETS, None)
+    graph = ui.widgets['default', 'temp_cpu']
+    bar = ui.widgets['default', 'memory']
+
+    return OrderedDict([
+        ('graph_push_us', measure(lambda: graph.push(overview=50.0), 20000)),
+        ('bar_push_us', measure(
+            lambda: bar.push(value=2048, total=4096), 20000,
+        )),
+        ('ui_push_us', measure(lambda: ui.push(build_data(), None), 2000)),
+    ])
+
+
+def render(ui, size, update, frames=50):
+    """
+    Best render time of a frame in milliseconds, updating the UI before each
+    frame.
+
+    The last canvas is kept alive between frames, as the screen does, so the
+    widgets that weren't updated reuse their cached canvases.
+    """
+    samples = []
+    canvas = ui.topmost.render(size, focus=True)
+    for _ in range(frames):
+        update()
+        start = perf_counter()
+        canvas = ui.topmost.render(size, focus=True)
+        samples.append(perf_counter() - start)
+    del canvas
+    return min(samples) * 1e3
+
+
+def bench_render():
+    """
+    Frame render time, with all the widgets or only one updated before each
+    frame.
+    """
+    results = OrderedDict()
+
+    def constant(count):
+        return lambda: {
+            'graph_{}'.format(index): {
+                'overview': 50.0, 'value': None, 'total': None,
+            } for index in range(count)
+        }
+
+    def random(count):
+        return lambda: {
+            'graph_{}'.format(index): {
+                'overview': uniform(0.0, 100.0), 'value': None,
+                'total': None,
+            } for index in range(count)
+        }
+
+    # Name, widgets, data and terminal sizes of each layout
+    layouts = [('coral', CORAL_WIDGETS, build_data, SIZES)] + [
+        (
+            'graphs_{}'.format(count), build_graphs(count), constant(count),
+            SIZES,
+        ) for count in GRAPHS
+    ] + [
+        (
+            'sparklines_16', build_graphs(16, widget='sparkline'),
+            constant(16), SIZES,
+        ),
+        (
+            'bars_50', build_graphs(50, columns=5, widget='bar'),
+            random(50), SIZES[-1:],
+        ),
+    ]
+
+    for name, widgets, data, sizes in layouts:
+        ui = UIManager()
+        ui.build(widgets, None)
+
+        first = next(iter(ui.widgets.values()))
+
+        for cols, rows in sizes:
+            results['{}_{}x{}_ms'.format(name, cols, rows)] = render(
+                ui, (cols, rows), lambda: ui.push(data(), None),
+            )
+            results['{}_{}x{}_one_ms'.format(name, cols, rows)] = render(
+                ui, (cols, rows),
+                lambda: first.push(overview=uniform(0.0, 100.0)),
+            )
+
+    return results
+
+
+def bench_api(pushes=2000, concurrency=8):
+    """
+    Push throughput and latency through the web application.
+    """
+    async def scenario():
+        screen = HeadlessScreen()
+        dashboard = Dashboard(0, screen=screen)
+        client = TestClient(TestServer(dashboard.webapp))
+        await client.start_server()
+
+        response = await client.post('/api/config', json={
+            'palette': parse_palette(CORAL_PALETTE),
+            'widgets': CORAL_WIDGETS,
+        })
+        assert response.status == 200
+
+        body = dumps(build_push())
+        headers = {'Content-Type': 'application/json'}
+        latencies = []
+
+        async def push(count):
+            for _ in range(count):
+                start = perf_counter()
+                response = await client.post(
+                    '/api/push', data=body, headers=headers,
+                )
+                await response.read()
+                assert response.status == 200
+                latencies.append(perf_counter() - start)
+
+        results = OrderedDict()
+        try:
+            start = perf_counter()
+            await push(pushes)
+            elapsed = perf_counter() - start
+            results['sequential_pushes_per_s'] = pushes / elapsed
+            for name, value in percentiles(latencies).items():
+                results['sequential_{}_ms'.format(name)] = value
+
+            latencies.clear()
+            start = perf_counter()
+            await gather(*[
+                push(pushes // concurrency) for _ in range(concurrency)
+            ])
+            elapsed = perf_counter() - start
+            results['concurrent_pushes_per_s'] = len(latencies) / elapsed
+            for name, value in percentiles(latencies).items():
+                results['concurrent_{}_ms'.format(name)] = value
+
+            results['frames'] = screen.frames
+
+        finally:
+            dashboard.heartbeat.cancel()
+            dashboard.render.cancel()
+            await client.close()
+
+        return results
+
+    loop = new_event_loop()
+    set_event_loop(loop)
+    try:
+        return loop.run_until_complete(scenario())
+    finally:
+        set_event_loop(None)
+        loop.close()
+
+
+BENCHMARKS = OrderedDict([
+    ('validate', bench_validate),
+    ('build', bench_build),
+    ('widgets', bench_widgets),
+    ('render', bench_render),
+    ('api', bench_api),
+])
+
+
+def compare(results, previous):
+    """
+    Print the ratio of each result against a previous run.
+    """
+    print('\nComparison against version {} ({}):'.format(
+        previous['version'], previous['python'],
+    ))
+    for group, values in results['results'].items():
+        for name, value in values.items():
+            before = previous['results'].get(group, {}).get(name)
+            if not before:
+                continue
+            print('  {:40} {:12.3f} {:12.3f} {:8.2f} x'.format(
+                '{}.{}'.format(group, name), before, value, value / before,
+            ))
+
+
+def main():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--output',
+        help='File to save the results to as JSON',
+        default='benchmark.json',
+    )
+    parser.add_argument(
+        '--compare',
+        help='File with the results of a previous run to compare with',
+        default=None,
+    )
+    parser.add_argument(
+        'benchmarks',
+        help='Benchmarks to run, all by default',
+        nargs='*',
+    )
+    args = parser.parse_args()
+
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error('Unknown benchmark {}, choose from {}'.format(
+                name, ', '.join(BENCHMARKS),
+            ))
+
+    # Cerberus warns about the deprecated rules names
+    simplefilter('ignore', DeprecationWarning)
+
+    results = OrderedDict([
+        ('version', __version__),
+        ('python', python_version()),
+        ('timestamp', time()),
+        ('results', OrderedDict()),
+    ])
+
+    for name in args.benchmarks or BENCHMARKS:
+        values = BENCHMARKS[name]()
+        results['results'][name] = values
+
+        print('{}:'.format(name))
+        for key, value in values.items():
+            print('  {:40} {:12.3f}'.format(key, value))
+
+    with open(args.output, 'w') as fd:
+        fd.write(dumps(results, indent=4))
+    print('\nResults saved to {}'.format(args.output))
+
+    if args.compare is not None:
+        with open(args.compare) as fd:
+            compare(results, loads(fd.read()))
+
+
+if __name__ == '__main__':
+    main()
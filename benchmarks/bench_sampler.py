@@ -0,0 +1,34 @@
+"""
+Benchmark of the agent sampler overhead on this machine.
+"""
+
+from statistics import mean, median
+
+from coral_agent.sampler import Sampler
+
+
+def main():
+    sampler = Sampler()
+    print('Probes: {}'.format(', '.join(
+        probe.identifier for probe in sampler.probes
+    )))
+
+    overheads = []
+    for _ in range(2000):
+        sampler.sample()
+        overheads.append(sampler.overhead * 1e6)
+    sampler.close()
+
+    overheads.sort()
+    print('Sample mean:   {:10.2f} us'.format(mean(overheads)))
+    print('Sample median: {:10.2f} us'.format(median(overheads)))
+    print('Sample p99:    {:10.2f} us'.format(
+        overheads[int(len(overheads) * 0.99)]
+    ))
+    print('CPU share at 10 Hz: {:.4f}%'.format(
+        mean(overheads) * 10 / 1e6 * 100
+    ))
+
+
+if __name__ == '__main__':
+    main()
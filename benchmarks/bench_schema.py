@@ -0,0 +1,57 @@
+"""
+Micro-benchmark of the push schema validation.
+
+Compares the compiled validators against the previous implementation, that
+created a new Cerberus validator for each request.
+"""
+
+from timeit import repeat
+from warnings import simplefilter
+
+from coral_dashboard.schema import SCHEMAS, ProtocolValidator, validate_schema
+
+from payloads import build_push
+
+
+def validate_cerberus(schema_id, data):
+    """
+    Previous implementation of the validation function.
+    """
+    validator = ProtocolValidator(SCHEMAS[schema_id])
+    validated = validator.validated(data)
+    return validated, validator.errors
+
+
+def measure(function, document, number):
+    """
+    Measure the best time per call of a validation function, in microseconds.
+    """
+    best = min(repeat(
+        lambda: function('push', document),
+        number=number,
+        repeat=5,
+    ))
+    return best / number * 1e6
+
+
+def main():
+    # Cerberus warns about the deprecated rules names each time a validator
+    # is created
+    simplefilter('ignore', DeprecationWarning)
+
+    document = build_push()
+    assert validate_schema('push', document) == \
+        validate_cerberus('push', document)
+
+    cerberus = measure(validate_cerberus, document, 200)
+    compiled = measure(validate_schema, document, 20000)
+
+    print('Cerberus validator per request: {:10.2f} us'.format(cerberus))
+    print('Compiled validator:             {:10.2f} us'.format(compiled))
+    print('Speedup:                        {:10.1f} x'.format(
+        cerberus / compiled
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Benchmark of the wire formats accepted by the push endpoint.
+
+Compares the size on the wire and the decode cost of a push for the
+standard Coral widgets layout, encoded as JSON and as MessagePack.
+"""
+
+from timeit import repeat
+
+from msgpack import packb
+
+from coral_dashboard.dashboard import dumps, loads, unpack
+
+from payloads import build_push
+
+
+def measure(function, number=20000):
+    """
+    Measure the best time per call of a function, in microseconds.
+    """
+    best = min(repeat(function, number=number, repeat=5))
+    return best / number * 1e6
+
+
+def main():
+    document = build_push()
+
+    json = dumps(document).encode('utf-8')
+    msgpack = packb(document, use_bin_type=True)
+
+    assert unpack(msgpack) == document
+    assert loads(json.decode('utf-8')).keys() == document.keys()
+
+    # The JSON path decodes the body to text before parsing it
+    json_decode = measure(lambda: loads(json.decode('utf-8')))
+    msgpack_decode = measure(lambda: unpack(msgpack))
+
+    print('Format          Bytes   Decode (us)')
+    print('JSON         {:8d}   {:11.2f}'.format(len(json), json_decode))
+    print('MessagePack  {:8d}   {:11.2f}'.format(
+        len(msgpack), msgpack_decode,
+    ))
+
+
+if __name__ == '__main__':
+    main()
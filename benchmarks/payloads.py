@@ -0,0 +1,41 @@
+"""
+Payloads used by the benchmarks.
+"""
+
+from random import randint, uniform
+
+
+def build_data():
+    """
+    Build the data of a push for the standard Coral widgets layout.
+    """
+    data = {
+        identifier: {
+            'overview': uniform(24.0, 90.0),
+            'value': None,
+            'total': None,
+        } for identifier in [
+            'temp_coolant', 'temp_gpu', 'temp_cpu', 'load_gpu', 'load_cpu',
+        ]
+    }
+    data.update({
+        identifier: {
+            'overview': None,
+            'value': randint(0, total),
+            'total': total,
+        } for identifier, total in [
+            ('memory', 4096), ('network', 1000), ('pump', 1400),
+            ('disk_os', 256), ('disk_apps', 4096),
+        ]
+    })
+    return data
+
+
+def build_push():
+    """
+    Build a push document for the standard Coral widgets layout.
+    """
+    return {
+        'title': 'Coral Dashboard - {version}',
+        'data': build_data(),
+    }
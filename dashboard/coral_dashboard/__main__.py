@@ -26,7 +26,9 @@ from logging import getLogger as get_logger
 from setproctitle import setproctitle
 
 from . import __version__
+from .store import Store
 from .dashboard import Dashboard
+from .ui.screen import HeadlessScreen
 from .args import parse_args, InvalidArgument
 
 
@@ -55,7 +57,29 @@ def main():
     log.info('Logs at {}'.format(args.logs))
     log.info('Listening on http://0.0.0.0:{}/'.format(args.port))
 
-    dashboard = Dashboard(args.port, logs=args.logs)
+    store = None
+    if args.store is not None:
+        log.info('Storing samples at {}'.format(args.store))
+        store = Store(args.store, retention=args.store_retention * 86400)
+        store.start()
+
+    screen = None
+    render = True
+    if args.headless:
+        if args.screen_size is None:
+            log.info('Running headless without drawing the UI')
+            screen = HeadlessScreen()
+            render = False
+        else:
+            log.info('Running headless drawing to a {}x{} screen'.format(
+                *args.screen_size
+            ))
+            screen = HeadlessScreen(args.screen_size)
+
+    dashboard = Dashboard(
+        args.port, logs=args.logs, fps=args.fps, store=store,
+        screen=screen, render=render,
+    )
     dashboard.run()
     exit(0)
 
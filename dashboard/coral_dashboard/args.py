@@ -25,6 +25,7 @@ from pathlib import Path
 from colorlog import ColoredFormatter
 
 from . import __version__
+from .logs import setup_logging
 
 
 log = logging.getLogger(__name__)
@@ -58,6 +59,50 @@ def validate_args(args):
         )
     args.logs = logs.resolve()
 
+    # Check frame rate
+    if args.fps <= 0:
+        raise InvalidArgument(
+            'Invalid frame rate {}, must be greater than 0'.format(args.fps)
+        )
+
+    # Check store
+    if args.store is not None:
+        store = Path(args.store)
+        try:
+            store.mkdir(parents=True, exist_ok=True)
+        except (FileExistsError, PermissionError, Exception) as e:
+            raise InvalidArgument(
+                'Invalid location for the store: {}'.format(str(e))
+            )
+        args.store = store.resolve()
+
+    if args.store_retention <= 0:
+        raise InvalidArgument(
+            'Invalid store retention {}, must be greater than 0'.format(
+                args.store_retention,
+            )
+        )
+
+    # Parse screen size of the headless mode
+    if args.screen_size == 'none':
+        args.screen_size = None
+    else:
+        try:
+            cols, rows = (int(part) for part in args.screen_size.split('x'))
+        except ValueError:
+            raise InvalidArgument(
+                'Invalid screen size {}, must be COLSxROWS or none'.format(
+                    args.screen_size,
+                )
+            )
+        if cols <= 0 or rows <= 0:
+            raise InvalidArgument(
+                'Invalid screen size {}, must be greater than 0'.format(
+                    args.screen_size,
+                )
+            )
+        args.screen_size = (cols, rows)
+
     # Configure logging
     logfrmt = (
         '  {thin_white}{asctime}{reset} | '
@@ -77,8 +122,9 @@ def validate_args(args):
     stream = logging.FileHandler(str(args.logs))
     stream.setFormatter(formatter)
 
+    # Writes to the log file are done in a background thread
     level = verbosity_levels.get(args.verbosity, logging.DEBUG)
-    logging.basicConfig(handlers=[stream], level=level)
+    setup_logging(stream, level)
 
     log.debug('Verbosity at level {}'.format(args.verbosity))
 
@@ -129,6 +175,37 @@ def parse_args(argv=None):
         default=5000,
     )
 
+    parser.add_argument(
+        '--fps',
+        help='Maximum frames per second to render the UI',
+        type=int,
+        default=20,
+    )
+
+    parser.add_argument(
+        '--headless',
+        help='Run without a terminal, drawing the UI to an in-memory screen',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--screen-size',
+        help='Size of the in-memory screen as COLSxROWS, or none to not '
+             'draw the UI at all',
+        default='80x48',
+    )
+
+    parser.add_argument(
+        '--store',
+        help='Directory to store the pushed samples in',
+        default=None,
+    )
+    parser.add_argument(
+        '--store-retention',
+        help='Days to keep the stored samples for',
+        type=float,
+        default=7.0,
+    )
+
     args = parser.parse_args(argv)
     args = validate_args(args)
     return args
@@ -19,28 +19,44 @@
 Coral dashboard RESTful API manager.
 """
 
+import logging
+from math import isfinite
+from time import time, perf_counter
 from functools import wraps
-from datetime import datetime
-from asyncio import get_event_loop, sleep
+from re import compile as compile_regex
+from datetime import datetime, timedelta
+from asyncio import get_event_loop, TimeoutError
 from logging import getLogger as get_logger
 
 from ujson import (
     dumps as udumps,
     loads as uloads,
 )
-from aiohttp import web
+from aiohttp import web, WSMsgType
 from pprintpp import pformat
+from msgpack import unpackb, UnpackException
 from urwid import MainLoop, AsyncioEventLoop
 from aiohttp_remotes import XForwardedRelaxed
 from aiohttp_cors import setup as CorsConfig, ResourceOptions
 
+from . import __version__
+from .ui.graph import Graph
 from .ui.manager import UIManager
-from .schema import validate_schema
+from .query import aggregator, downsample
+from .schema import validate_schema, SCHEMA_SOURCE, SCHEMA_PUSH
+from .logs import LazyFormat, BoundedQueueHandler
+from .metrics import Registry, Counter, Callback, Histogram
+from .render import RenderScheduler
+from .heartbeat import Heartbeat
 
 
 log = get_logger(__name__)
 
 
+REGEX_SOURCE = compile_regex(SCHEMA_SOURCE['regex'])
+REGEX_IDENTIFIER = compile_regex(SCHEMA_PUSH['data']['keyschema']['regex'])
+
+
 def dumps(obj):
     """
     JSON dumps helper using ujson.
@@ -65,6 +81,22 @@ def loads(json):
     return uloads(json, precise_float=True)
 
 
+def unpack(data):
+    """
+    MessagePack loads helper.
+
+    :param bytes data: MessagePack encoded bytes.
+
+    :return: Python object loaded from MessagePack.
+    :rtype: dict
+    """
+    return unpackb(data, raw=False)
+
+
+MEDIA_TYPES_JSON = ('application/json', )
+MEDIA_TYPES_MSGPACK = ('application/msgpack', 'application/x-msgpack')
+
+
 def schema(schema_id):
     """
     Decorator to assign a schema name to an endpoint handler.
@@ -75,6 +107,15 @@ def schema(schema_id):
     return decorator
 
 
+def raw(handler):
+    """
+    Decorator to mark an endpoint handler as not using JSON requests and
+    responses.
+    """
+    handler.__raw__ = True
+    return handler
+
+
 class Dashboard:
     """
     Main Dashboard application.
@@ -83,15 +124,46 @@ class Dashboard:
     terminal UI application in a single AsyncIO loop.
 
     :param int port: A TCP port to serve from.
+    :param str logs: Path to the log file to serve, if any.
+    :param int fps: Maximum frames per second to render the UI.
+    :param store: Store to write the pushed samples to, if any.
+    :type store: :class:`coral_dashboard.store.Store`
+    :param screen: Screen to draw the UI to. If not given, the terminal.
+    :type screen: :py:class:`urwid.BaseScreen`
+    :param bool render: Whether to draw the UI at all. If not, the state of
+     the UI is still updated, but the UI is never rendered.
     """
 
     DEFAULT_HEARTBEAT_MAX = 10
-
-    def __init__(self, port, logs=None):
+    DEFAULT_FPS = 20
+
+    # Number of stored samples new graphs are filled with, enough for the
+    # minutes zoom level of a graph pushed every second
+    DEFAULT_REHYDRATE = Graph.MAX_ENTRIES * 60
+
+    # Acknowledge after this number of frames or after this number of
+    # seconds without receiving frames, whatever happens first
+    STREAM_ACK_FRAMES = 16
+    STREAM_ACK_DELAY = 0.1
+    # Seconds between WebSocket pings
+    STREAM_HEARTBEAT = 5.0
+
+    # Default time range in seconds of the history requests, maximum number
+    # of points of downsampled requests and number of samples written to the
+    # response at once
+    HISTORY_RANGE = 3600.0
+    HISTORY_POINTS_MAX = 100000
+    HISTORY_CHUNK = 4096
+
+    def __init__(
+        self, port, logs=None, fps=DEFAULT_FPS, store=None,
+        screen=None, render=True,
+    ):
 
         # Build Web App
         self.port = port
         self.logs = logs
+        self.store = store
         self.webapp = web.Application(middlewares=[
             # Just in case someone wants to use it behind a reverse proxy
             # Not sure why someone will want to do that though
@@ -107,7 +179,22 @@ class Dashboard:
         self.webapp.router.add_get('/api/logs', self.api_logs)
         self.webapp.router.add_post('/api/config', self.api_config)
         self.webapp.router.add_post('/api/push', self.api_push)
+        self.webapp.router.add_post('/api/push/batch', self.api_push_batch)
         self.webapp.router.add_post('/api/message', self.api_message)
+        self.webapp.router.add_get('/api/stream', self.api_stream)
+        self.webapp.router.add_get('/api/metrics', self.api_metrics)
+        self.webapp.router.add_get('/api/history', self.api_history)
+
+        # Handlers for the frames streamed by the agents
+        self._stream_handlers = {
+            handler.__schema_id__: handler
+            for handler in [
+                self.api_config,
+                self.api_push,
+                self.api_push_batch,
+                self.api_message,
+            ]
+        }
 
         # Enable CORS in case someone wants to build a web agent
         self.cors = CorsConfig(
@@ -122,55 +209,242 @@ class Dashboard:
         for route in self.webapp.router.routes():
             self.cors.add(route)
 
-        # Create task for the push hearbeat
-        event_loop = get_event_loop()
+        # Event loop shared by the web application, the UI and the timers
+        event_loop = self.loop = get_event_loop()
 
-        self.timestamp = None
-        self.heartbeat = event_loop.create_task(self._check_last_timestamp())
+        # Whether the lost sources warning is shown
+        self._warning = False
+        self.heartbeat = Heartbeat(
+            self.DEFAULT_HEARTBEAT_MAX,
+            self._source_alive,
+            self._source_lost,
+            loop=event_loop,
+        )
 
         # Build Terminal UI App
         self.ui = UIManager()
+        self._palette = None
+        self.rendering = render
         self.tuiapp = MainLoop(
             self.ui.topmost,
+            screen=screen,
             pop_ups=True,
             palette=self.ui.palette,
             event_loop=AsyncioEventLoop(loop=event_loop),
+            unhandled_input=self._unhandled_input,
         )
+        self.render = RenderScheduler(self._draw, fps, loop=event_loop)
+
+        self._build_metrics()
+
+    def _build_metrics(self):
+        """
+        Create the instrumentation metrics of the dashboard.
+        """
+        self.metrics = Registry()
+
+        self._requests = self.metrics.register(Counter(
+            'coral_requests_total',
+            'Number of requests handled.',
+            ('endpoint', 'status'),
+        ))
+        self._requests_duration = self.metrics.register(Histogram(
+            'coral_request_duration_seconds',
+            'Duration of the requests.',
+            ('endpoint', ),
+        ))
+
+        stages = self.metrics.register(Histogram(
+            'coral_request_stage_duration_seconds',
+            'Duration of each stage of the requests processing.',
+            ('stage', ),
+        ))
+        self._stage_parse = stages.labels('parse')
+        self._stage_schema = stages.labels('schema')
+        self._stage_handler = stages.labels('handler')
+
+        self._stream_frames = self.metrics.register(Counter(
+            'coral_stream_frames_total',
+            'Number of frames received from streams.',
+        ))
+
+        self._frames = self.metrics.register(Counter(
+            'coral_render_frames_total',
+            'Number of frames drawn.',
+        ))
+        self._render_duration = self.metrics.register(Histogram(
+            'coral_render_duration_seconds',
+            'Duration of the drawing of frames.',
+        ))
+        self._loop_lag = self.metrics.register(Histogram(
+            'coral_event_loop_lag_seconds',
+            'Delay of the event loop performing scheduled frames.',
+        ))
+
+        self.metrics.register(Callback(
+            'coral_sources',
+            'Number of sources known by the dashboard.',
+            'gauge',
+            lambda: len(self.ui.sources),
+        ))
+        self.metrics.register(Callback(
+            'coral_sources_lost',
+            'Number of sources that stopped pushing.',
+            'gauge',
+            lambda: len(self.heartbeat.lost),
+        ))
+        if self.store is not None:
+            self.metrics.register(Callback(
+                'coral_store_samples_total',
+                'Number of samples written to the store.',
+                'counter',
+                lambda: self.store.written,
+            ))
+            self.metrics.register(Callback(
+                'coral_store_pushes_dropped_total',
+                'Number of pushes not stored because the queue was full.',
+                'counter',
+                lambda: self.store.dropped,
+            ))
+            self.metrics.register(Callback(
+                'coral_store_samples_late_total',
+                'Number of samples not stored because they were older than '
+                'the newest stored sample.',
+                'counter',
+                lambda: self.store.late,
+            ))
+            self.metrics.register(Callback(
+                'coral_store_samples_invalid_total',
+                'Number of samples not stored because they didn\'t have a '
+                'finite value.',
+                'counter',
+                lambda: self.store.invalid,
+            ))
+        self.metrics.register(Callback(
+            'coral_push_unknown_fields_total',
+            'Number of pushed values dropped for unknown widgets.',
+            'counter',
+            lambda: self.ui.unknown,
+        ))
+        self.metrics.register(Callback(
+            'coral_log_records_dropped_total',
+            'Number of log records dropped because the queue was full.',
+            'counter',
+            lambda: sum(
+                handler.dropped for handler in logging.getLogger().handlers
+                if isinstance(handler, BoundedQueueHandler)
+            ),
+        ))
+
+    def _draw(self):
+        """
+        Draw the terminal UI, instrumented.
+        """
+        # Only the damaged widgets are rendered again, the others reuse their
+        # cached canvases, and only the screen rows that changed are sent to
+        # the terminal
+        self.ui.damaged.clear()
+
+        if not self.rendering:
+            return
+
+        start = perf_counter()
+        self.tuiapp.draw_screen()
+        self._render_duration.observe(perf_counter() - start)
+        self._frames.inc()
+        self._loop_lag.observe(self.render.lag)
+
+    def _unhandled_input(self, key):
+        """
+        Handle the keys pressed in the terminal UI.
+
+        - ``z`` switches the graphs to the next zoom level.
+        """
+        if key in ('z', 'Z'):
+            log.info('Graphs zoom level changed to {}'.format(
+                self.ui.cycle_zoom(),
+            ))
+            self.render.schedule()
 
     def run(self):
         """
         Blocking method that starts the event loop.
         """
 
-        self.tuiapp.start()
-        self.webapp.on_shutdown.append(lambda app: self.tuiapp.stop())
-        self.webapp.on_shutdown.append(lambda app: self.heartbeat.cancel())
+        if self.rendering:
+            self.tuiapp.start()
+        self.webapp.on_shutdown.append(self._shutdown)
 
-        # This is aiohttp blocking call that starts the loop. By default, it
-        # will use the asyncio default loop. It would be nice that we could
-        # specify the loop. For this application it is OK, but definitely in
-        # the future we should identify how to share a loop explicitly.
+        # This is aiohttp blocking call that starts the loop. The loop must be
+        # the one the terminal UI and the timers were set up in, as aiohttp
+        # creates a new one otherwise.
         web.run_app(
             self.webapp,
             port=self.port,
             print=None,
+            loop=self.loop,
         )
 
-    async def _check_last_timestamp(self):
+    def _source_alive(self, source):
         """
-        FIXME: Document.
+        Mark a source that started or resumed pushing as alive.
         """
-        while True:
-            if self.timestamp is not None:
-                now = datetime.now()
-                elapsed = now - self.timestamp
-
-                if elapsed.seconds >= self.DEFAULT_HEARTBEAT_MAX:
-                    self.ui.topmost.show(
-                        'WARNING! Lost contact with agent {} '
-                        'seconds ago!'.format(elapsed.seconds)
-                    )
-            await sleep(1)
+        self.ui.set_status(source, 'OK')
+        self._warn_lost()
+        self.render.schedule()
+
+    def _source_lost(self, source):
+        """
+        Mark a source that stopped pushing as lost.
+        """
+        self.ui.set_status(source, 'LOST since {}'.format(
+            self._last_contact(source),
+        ))
+        self._warn_lost()
+        self.render.schedule()
+
+    def _last_contact(self, source):
+        """
+        Wall clock time of the last push of a source.
+        """
+        elapsed = timedelta(seconds=self.heartbeat.elapsed(source))
+        return (datetime.now() - elapsed).strftime('%H:%M:%S')
+
+    def _warn_lost(self):
+        """
+        Show a warning with the lost sources, or hide it if there are none.
+        """
+        lost = list(self.heartbeat.lost)
+
+        if not lost:
+            if self._warning:
+                self._warning = False
+                self.ui.topmost.hide()
+            return
+
+        if lost == [UIManager.DEFAULT_SOURCE]:
+            text = 'WARNING! Lost contact with agent since {}!'.format(
+                self._last_contact(lost[0]),
+            )
+        else:
+            text = 'WARNING! Lost contact with agents {}!'.format(
+                ', '.join(sorted(lost)),
+            )
+
+        self._warning = True
+        self.ui.topmost.show('Heartbeat', text)
+
+    async def _shutdown(self, app):
+        """
+        Stop the terminal UI and the timers, and write the pending samples to
+        the store.
+        """
+        if self.rendering:
+            self.tuiapp.stop()
+        self.heartbeat.cancel()
+        self.render.cancel()
+        if self.store is not None:
+            self.store.close()
 
     async def _middleware_exceptions(self, app, handler):
         """
@@ -189,24 +463,21 @@ class Dashboard:
         @wraps(handler)
         async def wrapper(request):
 
-            # Log connection
-            metadata = {
-                'remote': request.remote,
-                'agent': request.headers['User-Agent'],
-                'content_type': request.content_type,
-            }
+            # Log connection, formatted only if the record is emitted
+            log.info(
+                'Connection from %s using %s with user agent %s',
+                request.remote,
+                request.content_type,
+                request.headers.get('User-Agent'),
+            )
 
-            message = (
-                'Connection from {remote} using {content_type} '
-                'with user agent {agent}'
-            ).format(**metadata)
-            log.info(message)
+            start = perf_counter()
 
             try:
-                return await handler(request)
+                response = await handler(request)
 
             except web.HTTPException as e:
-                return web.json_response(
+                response = web.json_response(
                     {
                         'error': e.reason
                     },
@@ -221,7 +492,18 @@ class Dashboard:
                     pformat(response)
                 ))
 
-                return web.json_response(response, status=500)
+                response = web.json_response(response, status=500)
+
+            # Record request metrics
+            resource = request.match_info.route.resource
+            endpoint = 'unknown' if resource is None else resource.canonical
+
+            self._requests.labels(endpoint, response.status).inc()
+            self._requests_duration.labels(endpoint).observe(
+                perf_counter() - start
+            )
+
+            return response
 
         return wrapper
 
@@ -229,8 +511,9 @@ class Dashboard:
         """
         Middleware that handlers media type request and respones.
 
-        It checks for media type in the request, tries to parse the JSON and
-        converts dict responses to standard JSON responses.
+        It checks for media type in the request, tries to parse the JSON or
+        MessagePack payload and converts dict responses to standard JSON
+        responses.
 
         :param app: Main web application object.
         :param handler: Function to be executed to dispatch the request.
@@ -238,32 +521,51 @@ class Dashboard:
         :return: A handler replacement function.
         """
 
+        if getattr(handler, '__raw__', False):
+            return handler
+
         @wraps(handler)
         async def wrapper(request):
 
-            # Check media type
-            if request.content_type != 'application/json':
+            start = perf_counter()
+
+            # Parse JSON request
+            if request.content_type in MEDIA_TYPES_JSON:
+                body = await request.text()
+                try:
+                    payload = loads(body)
+                except ValueError:
+                    log.error('Invalid JSON payload:\n{}'.format(body))
+                    raise web.HTTPBadRequest(
+                        text='Invalid JSON payload'
+                    )
+
+            # Parse MessagePack request, straight from the bytes
+            elif request.content_type in MEDIA_TYPES_MSGPACK:
+                body = await request.read()
+                try:
+                    payload = unpack(body)
+                except (ValueError, UnpackException):
+                    log.error('Invalid MessagePack payload:\n{}'.format(body))
+                    raise web.HTTPBadRequest(
+                        text='Invalid MessagePack payload'
+                    )
+
+            else:
                 raise web.HTTPUnsupportedMediaType(
                     text=(
                         'Invalid Content-Type "{}". '
-                        'Only "application/json" is supported.'
+                        'Only "application/json" and "application/msgpack" '
+                        'are supported.'
                     ).format(request.content_type)
                 )
 
-            # Parse JSON request
-            body = await request.text()
-            try:
-                payload = loads(body)
-            except ValueError:
-                log.error('Invalid JSON payload:\n{}'.format(body))
-                raise web.HTTPBadRequest(
-                    text='Invalid JSON payload'
-                )
+            self._stage_parse.observe(perf_counter() - start)
 
             # Log request and responses
-            log.info('Request:\n{}'.format(pformat(payload)))
+            log.info('Request:\n%s', LazyFormat(pformat, payload))
             response = await handler(request, payload)
-            log.info('Response:\n{}'.format(pformat(response)))
+            log.info('Response:\n%s', LazyFormat(pformat, response))
 
             # Convert dictionaries to JSON responses
             if isinstance(response, dict):
@@ -290,17 +592,33 @@ class Dashboard:
         @wraps(handler)
         async def wrapper(request, payload):
 
+            # JSON and MessagePack payloads may not be objects
+            if not isinstance(payload, dict):
+                raise web.HTTPBadRequest(
+                    text='Invalid {} request, expected an object'.format(
+                        schema_id,
+                    )
+                )
+
             # Validate payload
+            start = perf_counter()
             validated, errors = validate_schema(schema_id, payload)
+            self._stage_schema.observe(perf_counter() - start)
+
             if errors:
                 raise web.HTTPBadRequest(
                     text='Invalid {} request:\n{}'.format(schema_id, errors)
                 )
 
-            return await handler(request, validated)
+            start = perf_counter()
+            response = await handler(request, validated)
+            self._stage_handler.observe(perf_counter() - start)
+
+            return response
 
         return wrapper
 
+    @raw
     async def api_logs(self, request):
         """
         Endpoint to get dashboard logs.
@@ -309,15 +627,36 @@ class Dashboard:
             raise web.HTTPNotFound(text='No logs configured')
         return web.FileResponse(self.logs)
 
-    # FIXME: Let's disable schema validation for now
-    # @schema('config')
+    @schema('config')
     async def api_config(self, request, validated):
         """
         Endpoint to configure UI.
         """
-        tree = self.ui.build(validated['widgets'], validated['title'])
-        self.tuiapp.screen.register_palette(validated['palette'])
-        self.tuiapp.draw_screen()
+        source = validated['source']
+        tree = self.ui.build(validated['widgets'], validated['title'], source)
+
+        # Show the status of a source that pushed before being configured
+        if self.heartbeat.elapsed(source) is not None:
+            if source in self.heartbeat.lost:
+                self._source_lost(source)
+            else:
+                self._source_alive(source)
+
+        # Fill the history of the new graphs with the stored samples
+        if self.store is not None:
+            for identifier, widget in self.ui.sources[source].tree.items():
+                if isinstance(widget, Graph) and not widget.count:
+                    widget.rehydrate(self.store.tail(
+                        source, identifier, self.DEFAULT_REHYDRATE,
+                    ))
+
+        # Registering a palette parses all its entries, skip it if unchanged
+        palette = validated['palette']
+        if palette != self._palette:
+            self.tuiapp.screen.register_palette(palette)
+            self._palette = palette
+
+        self.render.schedule()
         return tree
 
     @schema('push')
@@ -325,18 +664,81 @@ class Dashboard:
         """
         Endpoint to push data to the dashboard.
         """
-        self.timestamp = datetime.now()
+        source = validated['source']
+        self.heartbeat.beat(source)
 
         # Push data to UI
-        pushed = self.ui.push(validated['data'], validated['title'])
-        self.tuiapp.draw_screen()
+        data = validated['data']
+        delta = validated['delta']
+        timestamp = self._timestamp(validated['timestamp'])
+        try:
+            pushed = self.ui.push(
+                data, validated['title'], source, delta, timestamp,
+            )
+        except RuntimeError as e:
+            raise web.HTTPBadRequest(text=str(e))
+        if self.ui.damaged:
+            self.render.schedule()
+
+        if self.store is not None:
+            # Store the full sample, with the last values of the fields
+            # missing from a delta push
+            if delta:
+                values = self.ui.values
+                data = {key: values[(source, key)] for key in pushed}
+            self.store.append(source, timestamp, data, pushed)
+
+        return {
+            'pushed': pushed,
+        }
+
+    @schema('push_batch')
+    async def api_push_batch(self, request, validated):
+        """
+        Endpoint to push several timestamped frames of data to the dashboard.
+        """
+        source = validated['source']
+        self.heartbeat.beat(source)
+
+        # Push all frames to UI and draw once
+        frames = validated['frames']
+        for frame in frames:
+            frame['timestamp'] = self._timestamp(frame['timestamp'])
+        try:
+            pushed = self.ui.push_batch(frames, validated['title'], source)
+        except RuntimeError as e:
+            raise web.HTTPBadRequest(text=str(e))
+        if self.ui.damaged:
+            self.render.schedule()
+
+        if self.store is not None:
+            self.store.append_batch(source, frames, pushed)
 
         return {
             'pushed': pushed,
+            'frames': len(frames),
         }
 
-    # FIXME: Let's disable schema validation for now
-    # @schema('message')
+    def _timestamp(self, timestamp):
+        """
+        Timestamp of a sample, by the clock of the agent if it sent one.
+
+        Live and replayed samples of a source must share a clock, as the
+        history and the store drop samples older than the newest one. The
+        agent's timestamps are clamped to the dashboard's clock, so a clock
+        ahead can't drop the samples that follow.
+
+        :param float timestamp: Timestamp sent by the agent, or None.
+
+        :return: Timestamp of the sample in seconds since the epoch.
+        :rtype: float
+        """
+        now = time()
+        if timestamp is None or not isfinite(timestamp) or timestamp > now:
+            return now
+        return timestamp
+
+    @schema('message')
     async def api_message(self, request, validated):
         """
         Endpoint to a message in UI.
@@ -344,17 +746,291 @@ class Dashboard:
         message = validated.pop('message')
         title = validated.pop('title')
 
+        # The message replaces the lost sources warning, if any
+        self._warning = False
+
         if message:
             self.ui.topmost.show(title, message, **validated)
         else:
             self.ui.topmost.hide()
 
-        self.tuiapp.draw_screen()
+        self.render.schedule()
 
         return {
             'message': message,
         }
 
+    @raw
+    async def api_metrics(self, request):
+        """
+        Endpoint to get the dashboard metrics in the Prometheus text format.
+        """
+        return web.Response(
+            body=self.metrics.render().encode('utf-8'),
+            headers={
+                'Content-Type': 'text/plain; version=0.0.4; charset=utf-8',
+            },
+        )
+
+    @raw
+    async def api_history(self, request):
+        """
+        Endpoint to get the stored samples of the widgets of a source.
+
+        Query parameters:
+
+        - ``source``: Identifier of the source, ``default`` if not given.
+        - ``identifier``: Identifier of a widget, can be given several times.
+          All the widgets of the source if not given.
+        - ``start`` and ``end``: Time range in seconds since the epoch. The
+          last hour if not given.
+        - ``points``: Downsample to this number of points, aggregating the
+          samples of each period of time.
+        - ``aggregate``: Aggregation of the samples when downsampling,
+          ``min``, ``max``, ``avg`` (default) or a percentile like ``p95``.
+        - ``format``: ``json`` (default) or ``csv``.
+
+        The response is streamed as it is read from the store. The store is
+        read in the default executor, so the event loop never blocks on disk
+        reads. Non finite values are returned as ``null`` in JSON.
+        """
+        if self.store is None:
+            raise web.HTTPNotFound(text='No store configured')
+
+        loop = get_event_loop()
+        query = self._history_query(request.query)
+        identifiers = query['identifiers'] or await loop.run_in_executor(
+            None, self.store.identifiers, query['source'],
+        )
+        csv = query['format'] == 'csv'
+
+        response = web.StreamResponse(headers={
+            'Content-Type': (
+                'text/csv; charset=utf-8' if csv else
+                'application/json; charset=utf-8'
+            ),
+        })
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+
+        if csv:
+            await response.write(b'identifier,timestamp,value\n')
+        else:
+            header = '{{"source":{},"start":{!r},"end":{!r},"series":{{'
+            header = header.format(
+                dumps(query['source']), query['start'], query['end'],
+            )
+            await response.write(header.encode('utf-8'))
+
+        for index, identifier in enumerate(identifiers):
+            chunks = self.store.read(
+                query['source'], identifier, query['start'], query['end'],
+            )
+            if query['points'] is not None:
+                chunks = downsample(
+                    chunks, query['start'], query['end'],
+                    query['points'], query['aggregate'],
+                )
+
+            if not csv:
+                await response.write('{}{}:['.format(
+                    ',' if index else '', dumps(identifier),
+                ).encode('utf-8'))
+
+            separator = ''
+            chunks = iter(chunks)
+            while True:
+                chunk = await loop.run_in_executor(None, next, chunks, None)
+                if chunk is None:
+                    break
+
+                step = self.HISTORY_CHUNK * 2
+
+                for offset in range(0, len(chunk), step):
+                    piece = chunk[offset:offset + step]
+                    pairs = zip(piece[0::2], piece[1::2])
+
+                    if csv:
+                        text = ''.join(
+                            '{},{!r},{!r}\n'.format(identifier, *pair)
+                            for pair in pairs
+                        )
+                    else:
+                        text = separator + ','.join(
+                            '[{!r},{}]'.format(
+                                timestamp,
+                                repr(value) if isfinite(value) else 'null',
+                            ) for timestamp, value in pairs
+                        )
+                        separator = ','
+
+                    await response.write(text.encode('utf-8'))
+
+            if not csv:
+                await response.write(b']')
+
+        if not csv:
+            await response.write(b'}}')
+
+        await response.write_eof()
+        return response
+
+    def _history_query(self, query):
+        """
+        Parse and validate the query parameters of a history request.
+        """
+        source = query.get('source', UIManager.DEFAULT_SOURCE)
+        if REGEX_SOURCE.fullmatch(source) is None:
+            raise web.HTTPBadRequest(text='Invalid source {}'.format(source))
+
+        identifiers = query.getall('identifier', [])
+        for identifier in identifiers:
+            if REGEX_IDENTIFIER.fullmatch(identifier) is None:
+                raise web.HTTPBadRequest(
+                    text='Invalid identifier {}'.format(identifier)
+                )
+
+        try:
+            end = float(query.get('end', time()))
+            start = float(query.get('start', end - self.HISTORY_RANGE))
+            points = query.get('points')
+            if points is not None:
+                points = int(points)
+        except ValueError as e:
+            raise web.HTTPBadRequest(text='Invalid history query: {}'.format(
+                str(e),
+            ))
+
+        if not isfinite(start) or not isfinite(end) or not start < end:
+            raise web.HTTPBadRequest(
+                text='Invalid time range, start must be before end'
+            )
+
+        if points is not None and not 0 < points <= self.HISTORY_POINTS_MAX:
+            raise web.HTTPBadRequest(
+                text='Invalid number of points, must be between 1 and '
+                     '{}'.format(self.HISTORY_POINTS_MAX)
+            )
+
+        try:
+            aggregate = aggregator(query.get('aggregate', 'avg'))
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+
+        format = query.get('format', 'json')
+        if format not in ('json', 'csv'):
+            raise web.HTTPBadRequest(
+                text='Invalid format {}, must be json or csv'.format(format)
+            )
+
+        return {
+            'source': source,
+            'identifiers': identifiers,
+            'start': start,
+            'end': end,
+            'points': points,
+            'aggregate': aggregate,
+            'format': format,
+        }
+
+    @raw
+    async def api_stream(self, request):
+        """
+        Endpoint to stream frames to the dashboard using a WebSocket.
+
+        Each frame is a JSON object (or a MessagePack map, sent as a binary
+        message) with a ``type`` (``config``, ``push``, ``push_batch`` or
+        ``message``) and the same fields of the request to the equivalent
+        endpoint. Frames are processed in order, one at a time, and
+        acknowledged in batches with the sequence number of the last frame
+        processed.
+        """
+        ws = web.WebSocketResponse(heartbeat=self.STREAM_HEARTBEAT)
+        await ws.prepare(request)
+
+        await ws.send_str(dumps({
+            'type': 'hello',
+            'version': __version__,
+        }))
+
+        seq = 0
+        acked = 0
+
+        while True:
+
+            # Wait for frames, flushing the acknowledgement if they stop
+            try:
+                message = await ws.receive(
+                    timeout=self.STREAM_ACK_DELAY if acked < seq else None
+                )
+            except TimeoutError:
+                await ws.send_str(dumps({'type': 'ack', 'seq': seq}))
+                acked = seq
+                continue
+
+            if message.type == WSMsgType.TEXT:
+                decode = loads
+            elif message.type == WSMsgType.BINARY:
+                decode = unpack
+            else:
+                break
+
+            # Next frame is only read once this one has been processed, so
+            # slow processing applies backpressure to the agent's socket
+            seq += 1
+            self._stream_frames.inc()
+            error = await self._stream_dispatch(message.data, decode)
+            if error is not None:
+                await ws.send_str(dumps({
+                    'type': 'error',
+                    'seq': seq,
+                    'error': error,
+                }))
+
+            if seq - acked >= self.STREAM_ACK_FRAMES:
+                await ws.send_str(dumps({'type': 'ack', 'seq': seq}))
+                acked = seq
+
+        if acked < seq and not ws.closed:
+            await ws.send_str(dumps({'type': 'ack', 'seq': seq}))
+
+        return ws
+
+    async def _stream_dispatch(self, data, decode):
+        """
+        Validate and process a frame received from a stream.
+
+        :param data: The encoded frame.
+        :param decode: Function to decode the frame.
+
+        :return: An error message if the frame is invalid, None otherwise.
+        :rtype: str
+        """
+        try:
+            frame = decode(data)
+        except (ValueError, UnpackException):
+            return 'Invalid frame encoding'
+
+        if not isinstance(frame, dict):
+            return 'Invalid frame, expected an object'
+
+        frame_type = frame.pop('type', None)
+        handler = self._stream_handlers.get(frame_type)
+        if handler is None:
+            return 'Invalid frame type {}'.format(frame_type)
+
+        try:
+            validated, errors = validate_schema(frame_type, frame)
+            if errors:
+                return 'Invalid {} frame:\n{}'.format(frame_type, errors)
+
+            await handler(None, validated)
+        except Exception as e:
+            log.exception('Unexpected exception processing {} frame'.format(
+                frame_type,
+            ))
+            return ' '.join(str(arg) for arg in e.args)
+
 
 __all__ = [
     'Dashboard',
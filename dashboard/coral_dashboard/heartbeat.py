@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""
+Heartbeat of the sources pushing to the dashboard.
+"""
+
+from asyncio import get_event_loop
+from collections import OrderedDict
+from logging import getLogger as get_logger
+
+
+log = get_logger(__name__)
+
+
+class Heartbeat:
+    """
+    Deadline based watchdog of the sources pushing to the dashboard.
+
+    Each source has a single timer armed at its deadline in the event loop.
+    Beats only record the time of the beat, and when the timer fires it is
+    re-armed at the new deadline if the source beat in the meantime. So a
+    source that beats costs one timer per timeout period, no matter how often
+    it pushes, and lost sources and an idle dashboard cost no wakeups at all.
+
+    :param float timeout: Seconds without beats after which a source is lost.
+    :param alive: Function called with the name of a source when it beats for
+     the first time or after being lost.
+    :param lost: Function called with the name of a source when it is lost.
+    :param loop: AsyncIO event loop to arm the timers in. If not given, the
+     default event loop is used.
+    """
+
+    def __init__(self, timeout, alive, lost, loop=None):
+        assert timeout > 0
+
+        self._timeout = timeout
+        self._alive = alive
+        self._lost = lost
+        self._loop = loop or get_event_loop()
+
+        # Event loop time of the last beat and timer of each source
+        self._seen = {}
+        self._timers = {}
+
+        # Sources lost, in the order they were lost
+        self.lost = OrderedDict()
+
+    def beat(self, source):
+        """
+        Record a beat of a source.
+
+        :param str source: Name of the source.
+        """
+        now = self._loop.time()
+        self._seen[source] = now
+
+        if source in self._timers:
+            return
+
+        self._timers[source] = self._loop.call_at(
+            now + self._timeout, self._expire, source,
+        )
+
+        self.lost.pop(source, None)
+        self._alive(source)
+
+    def elapsed(self, source):
+        """
+        Seconds since the last beat of a source.
+
+        :param str source: Name of the source.
+
+        :return: The seconds since the last beat, or None if the source never
+         beat.
+        :rtype: float
+        """
+        seen = self._seen.get(source)
+        if seen is None:
+            return None
+        return self._loop.time() - seen
+
+    def cancel(self):
+        """
+        Cancel all the timers.
+        """
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+    def _expire(self, source):
+        """
+        Check the deadline of a source. Called by the event loop.
+        """
+        deadline = self._seen[source] + self._timeout
+
+        if deadline > self._loop.time():
+            self._timers[source] = self._loop.call_at(
+                deadline, self._expire, source,
+            )
+            return
+
+        del self._timers[source]
+        self.lost[source] = True
+        self._lost(source)
+
+
+__all__ = [
+    'Heartbeat',
+]
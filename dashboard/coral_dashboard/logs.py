@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+"""
+Logging subsystem.
+
+Log records are put in a bounded queue and written by a background thread,
+so the event loop driving the web application and the terminal UI never
+blocks on disk writes. Records are dropped, and accounted for, when the queue
+is full.
+"""
+
+import logging
+from queue import Queue, Full
+from atexit import register as atexit
+from logging.handlers import QueueHandler, QueueListener
+
+
+log = logging.getLogger(__name__)
+
+
+class LazyFormat:
+    """
+    Defer a costly formatting function until the log record is handled, so
+    it is never called if the level of the record is disabled.
+
+    Use it as an argument of a logging call::
+
+        log.info('Request:\\n%s', LazyFormat(pformat, payload))
+
+    :param function: Formatting function.
+    :param args: Arguments to call the formatting function with.
+    """
+
+    __slots__ = ('_function', '_args')
+
+    def __init__(self, function, *args):
+        self._function = function
+        self._args = args
+
+    def __str__(self):
+        return self._function(*self._args)
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Logging handler that enqueues records in a bounded queue without
+    blocking.
+
+    Records with only immutable arguments are not formatted when enqueued,
+    formatting is done by the handler of the
+    :py:class:`logging.handlers.QueueListener` in its own thread. Records with
+    other arguments, like containers or :class:`LazyFormat` holding live
+    objects, are formatted when enqueued, as they could be mutated before the
+    listener thread formats them. When the queue is full records are dropped
+    and, once there is room again, a warning with the number of dropped
+    records is enqueued.
+
+    :param int size: Maximum number of records in the queue.
+    """
+
+    # Arguments safe to format in the listener thread
+    IMMUTABLE = (str, bytes, int, float, type(None))
+
+    def __init__(self, size):
+        super().__init__(Queue(size))
+        self.dropped = 0
+        self._unreported = 0
+
+    def prepare(self, record):
+        args = record.args
+        if args and not (
+            isinstance(args, tuple) and
+            all(isinstance(arg, self.IMMUTABLE) for arg in args)
+        ):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self._unreported:
+            try:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    'name': log.name,
+                    'levelno': logging.WARNING,
+                    'levelname': logging.getLevelName(logging.WARNING),
+                    'msg': 'Dropped %d log records, logging queue full',
+                    'args': (self._unreported, ),
+                }))
+                self._unreported = 0
+            except Full:
+                pass
+
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+            self._unreported += 1
+
+
+def setup_logging(handler, level, size=10000):
+    """
+    Configure the root logger to emit records to the given handler from a
+    background thread.
+
+    :param handler: Logging handler that will emit the records.
+    :type handler: :py:class:`logging.Handler`
+    :param int level: Logging level of the root logger.
+    :param int size: Maximum number of records waiting to be emitted.
+
+    :return: The handler installed in the root logger.
+    :rtype: :class:`BoundedQueueHandler`
+    """
+    queue_handler = BoundedQueueHandler(size)
+
+    listener = QueueListener(queue_handler.queue, handler)
+    listener.start()
+    atexit(listener.stop)
+
+    logging.basicConfig(handlers=[queue_handler], level=level)
+    return queue_handler
+
+
+__all__ = [
+    'LazyFormat',
+    'BoundedQueueHandler',
+    'setup_logging',
+]
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+"""
+Instrumentation metrics exposed in the Prometheus text format.
+
+Metrics are cheap to record: histograms buckets are preallocated and
+labeled children are created once per labels values and reused.
+"""
+
+from bisect import bisect_left
+from collections import OrderedDict
+from logging import getLogger as get_logger
+
+
+log = get_logger(__name__)
+
+
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+
+
+def _format_labels(labelnames, labelvalues, extra=''):
+    """
+    Format the labels of a sample.
+    """
+    labels = [
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"'),
+        ) for name, value in zip(labelnames, labelvalues)
+    ]
+    if extra:
+        labels.append(extra)
+    if not labels:
+        return ''
+    return '{{{}}}'.format(','.join(labels))
+
+
+class Metric:
+    """
+    Base class for metrics.
+
+    :param str name: Name of the metric.
+    :param str help: Description of the metric.
+    :param tuple labelnames: Names of the labels of the metric, if any.
+    """
+
+    TYPE = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = OrderedDict()
+
+    def labels(self, *labelvalues):
+        """
+        Get the child metric for the given labels values.
+
+        Children are created on first use and then reused, so callers in hot
+        paths should keep a reference to the child.
+        """
+        assert len(labelvalues) == len(self.labelnames)
+
+        child = self._children.get(labelvalues)
+        if child is None:
+            child = self._children[labelvalues] = self._child()
+        return child
+
+    def _child(self):
+        raise NotImplementedError()
+
+    def _samples(self, child, labelvalues):
+        raise NotImplementedError()
+
+    def render(self):
+        """
+        Render the metric in the Prometheus text format.
+
+        :return: Lines of the metric.
+        :rtype: list
+        """
+        lines = [
+            '# HELP {} {}'.format(self.name, self.help),
+            '# TYPE {} {}'.format(self.name, self.TYPE),
+        ]
+        for labelvalues, child in self._children.items():
+            lines.extend(self._samples(child, labelvalues))
+        return lines
+
+
+class _Value:
+    """
+    A single value child of a counter or gauge.
+    """
+
+    __slots__ = ('value', )
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1.0):
+        self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing counter.
+    """
+
+    TYPE = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def inc(self, amount=1.0):
+        """
+        Increment the counter without labels.
+        """
+        self._default.value += amount
+
+    def _child(self):
+        return _Value()
+
+    def _samples(self, child, labelvalues):
+        yield '{}{} {}'.format(
+            self.name,
+            _format_labels(self.labelnames, labelvalues),
+            child.value,
+        )
+
+
+class Gauge(Counter):
+    """
+    Value that can go up and down.
+    """
+
+    TYPE = 'gauge'
+
+    def set(self, value):
+        """
+        Set the value of the gauge without labels.
+        """
+        self._default.value = value
+
+
+class Callback(Metric):
+    """
+    Metric which value is read from a function when rendered.
+
+    :param str type: Prometheus type of the metric.
+    :param function: Function returning the current value.
+    """
+
+    def __init__(self, name, help, type, function):
+        super().__init__(name, help)
+        self.TYPE = type
+        self._function = function
+
+    def render(self):
+        lines = super().render()
+        lines.append('{} {}'.format(self.name, float(self._function())))
+        return lines
+
+
+class _Buckets:
+    """
+    Preallocated histogram child.
+    """
+
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(Metric):
+    """
+    Histogram of observed values, in seconds for durations.
+
+    :param tuple buckets: Sorted upper bounds of the buckets. A ``+Inf``
+     bucket is always added.
+    """
+
+    TYPE = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help, labelnames)
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def observe(self, value):
+        """
+        Observe a value without labels.
+        """
+        self._default.observe(value)
+
+    def _child(self):
+        return _Buckets(self.buckets)
+
+    def _samples(self, child, labelvalues):
+        cumulative = 0
+        bounds = self.buckets + ('+Inf', )
+
+        for bound, count in zip(bounds, child.counts):
+            cumulative += count
+            yield '{}_bucket{} {}'.format(
+                self.name,
+                _format_labels(
+                    self.labelnames, labelvalues, 'le="{}"'.format(bound),
+                ),
+                cumulative,
+            )
+
+        labels = _format_labels(self.labelnames, labelvalues)
+        yield '{}_sum{} {}'.format(self.name, labels, child.sum)
+        yield '{}_count{} {}'.format(self.name, labels, cumulative)
+
+
+class Registry:
+    """
+    Collection of metrics.
+    """
+
+    def __init__(self):
+        self._metrics = OrderedDict()
+
+    def register(self, metric):
+        """
+        Register a metric.
+
+        :param Metric metric: Metric to register.
+
+        :return: The same metric.
+        :rtype: Metric
+        """
+        assert metric.name not in self._metrics
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text format.
+
+        :rtype: str
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        lines.append('')
+        return '\n'.join(lines)
+
+
+__all__ = [
+    'Counter',
+    'Gauge',
+    'Callback',
+    'Histogram',
+    'Registry',
+]
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""
+Queries of the samples of the persistent store.
+
+Samples are read one segment at a time as arrays of interleaved timestamps
+and values. Downsampling slices the timestamps and values out of each array,
+finds the boundaries of the periods with a binary search and aggregates the
+values of each period with the builtin functions, which run over the whole
+slice at once instead of sample by sample. Periods only keep running
+aggregates of their values, except for the percentiles that need them all.
+"""
+
+from math import ceil
+from re import compile as compile_regex
+from array import array
+from bisect import bisect_left
+from logging import getLogger as get_logger
+
+
+log = get_logger(__name__)
+
+
+PERCENTILE = compile_regex(r'^p([0-9]{1,2}(\.[0-9]+)?|100)$')
+
+
+class _Running:
+    """
+    Running sum, count, minimum and maximum of the values of a period, so
+    the values don't need to be kept.
+    """
+
+    __slots__ = ('total', 'count', 'low', 'high')
+
+    def __init__(self):
+        self.total = 0.0
+        self.count = 0
+        self.low = float('inf')
+        self.high = float('-inf')
+
+    def add(self, values):
+        self.total += sum(values)
+        self.count += len(values)
+        self.low = min(self.low, min(values))
+        self.high = max(self.high, max(values))
+
+
+class _Values:
+    """
+    All the values of a period, as needed by the percentiles.
+    """
+
+    __slots__ = ('values', )
+
+    def __init__(self):
+        self.values = array('d')
+
+    def add(self, values):
+        self.values.extend(values)
+
+
+class Aggregate:
+    """
+    Aggregation of the values of the periods of a downsampling.
+
+    The values of a period are added in slices as they are read, into the
+    state of the period, and aggregated once the period is complete. Calling
+    an aggregate aggregates a non-empty sequence of values at once.
+
+    :param state: Class of the state of a period.
+    :param function result: Function computing the aggregated value of a
+     period from its state.
+    """
+
+    def __init__(self, state, result):
+        self.period = state
+        self.result = result
+
+    def __call__(self, values):
+        period = self.period()
+        period.add(values)
+        return self.result(period)
+
+
+def _percentile(percentile):
+    """
+    Aggregate of a percentile, using the nearest rank method.
+    """
+    def result(period):
+        values = period.values
+        rank = max(ceil(percentile / 100.0 * len(values)), 1)
+        return sorted(values)[rank - 1]
+    return Aggregate(_Values, result)
+
+
+AGGREGATES = {
+    'min': Aggregate(_Running, lambda period: period.low),
+    'max': Aggregate(_Running, lambda period: period.high),
+    'avg': Aggregate(_Running, lambda period: period.total / period.count),
+}
+
+
+def aggregator(name):
+    """
+    Get an aggregation function by name.
+
+    :param str name: ``min``, ``max``, ``avg`` or a percentile as ``p`` and a
+     number between 0 and 100, for example ``p95``.
+
+    :return: The aggregate, also callable on a non-empty sequence of values.
+    :rtype: :class:`Aggregate`
+    """
+    if name in AGGREGATES:
+        return AGGREGATES[name]
+
+    match = PERCENTILE.match(name)
+    if match is None:
+        raise ValueError('Unknown aggregation {}'.format(name))
+    return _percentile(float(match.group(1)))
+
+
+def downsample(chunks, start, end, points, aggregate):
+    """
+    Aggregate the samples in periods of the same duration.
+
+    :param chunks: Iterable of arrays with the timestamps and values of the
+     samples interleaved, in timestamp order.
+    :param float start: Start of the first period.
+    :param float end: End of the last period.
+    :param int points: Number of periods.
+    :param aggregate: Aggregation of the values of each period.
+    :type aggregate: :class:`Aggregate`
+
+    :return: Generator of arrays with the start of the periods and their
+     aggregated values interleaved. Periods without samples are skipped.
+    """
+    assert end > start and points > 0
+
+    width = (end - start) / points
+
+    # State of the period that continues in the next chunk
+    period = None
+    pending = None
+
+    for chunk in chunks:
+        timestamps = chunk[0::2]
+        values = chunk[1::2]
+        result = array('d')
+
+        first = 0
+        while first < len(timestamps):
+            current = int((timestamps[first] - start) // width)
+            current = min(current, points - 1)
+
+            # Always advance, in case of rounding errors at the boundary
+            boundary = start + (current + 1) * width
+            last = max(bisect_left(timestamps, boundary, first), first + 1)
+
+            if period != current:
+                if period is not None:
+                    result.append(start + period * width)
+                    result.append(aggregate.result(pending))
+                pending = aggregate.period()
+
+            period = current
+            pending.add(values[first:last])
+            first = last
+
+        if result:
+            yield result
+
+    if period is not None:
+        yield array('d', [start + period * width, aggregate.result(pending)])
+
+
+__all__ = [
+    'Aggregate',
+    'aggregator',
+    'downsample',
+]
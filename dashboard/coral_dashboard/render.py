@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+"""
+Terminal UI rendering scheduler.
+"""
+
+from asyncio import get_event_loop
+from logging import getLogger as get_logger
+
+
+log = get_logger(__name__)
+
+
+class RenderScheduler:
+    """
+    Frame rate limited rendering of the terminal UI.
+
+    Instead of drawing the screen each time the UI is updated, updates mark
+    the UI as dirty and a draw is scheduled in the event loop at most once per
+    frame. All the updates that land within a frame are coalesced into a
+    single draw.
+
+    :param draw: Function that draws the screen.
+    :param int fps: Maximum number of frames per second.
+    :param loop: AsyncIO event loop to schedule the draws in. If not given,
+     the default event loop is used.
+    """
+
+    def __init__(self, draw, fps, loop=None):
+        assert fps > 0
+
+        self._draw = draw
+        self._interval = 1.0 / fps
+        self._loop = loop or get_event_loop()
+
+        self._handle = None
+        self._when = None
+        self._last = None
+
+        # Delay between the time a draw was scheduled for and the time the
+        # event loop actually performed it, for the last draw
+        self.lag = 0.0
+
+    @property
+    def pending(self):
+        """
+        Whether a draw is scheduled and not yet performed.
+        """
+        return self._handle is not None
+
+    def schedule(self):
+        """
+        Mark the UI as dirty and schedule a draw for the next frame.
+
+        This method is cheap and can be called on every update. If a draw is
+        already scheduled this is a no-op.
+        """
+        if self._handle is not None:
+            return
+
+        when = self._loop.time()
+        if self._last is not None:
+            when = max(when, self._last + self._interval)
+
+        self._when = when
+        self._handle = self._loop.call_at(when, self._render)
+
+    def cancel(self):
+        """
+        Cancel the scheduled draw, if any.
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _render(self):
+        """
+        Draw the screen. Called by the event loop.
+        """
+        self._handle = None
+        self._last = self._loop.time()
+        self.lag = max(self._last - self._when, 0.0)
+        self._draw()
+
+
+__all__ = [
+    'RenderScheduler',
+]
@@ -17,9 +17,21 @@
 
 """
 Daemon communication protocol.
+
+Schemas are written in `Cerberus <http://docs.python-cerberus.org/>`_ syntax
+and compiled once at import time into plain Python callables that validate
+and normalize a document without walking the rules interpretively. Only
+documents rejected by the compiled validator are handed to Cerberus, so the
+errors reported are exactly the ones Cerberus would report.
+
+Besides the Cerberus rules, fields accept a ``finite`` rule rejecting not a
+number and infinite floats, that JSON can't encode but MessagePack can.
 """
 
+from math import isfinite
+from re import compile as compile_regex
 from logging import getLogger as get_logger
+from collections.abc import Mapping, Sequence, Sized
 
 from cerberus import Validator
 
@@ -27,7 +39,19 @@ from cerberus import Validator
 log = get_logger(__name__)
 
 
+# Identifier of the agent pushing the data, all widgets belong to a source
+SCHEMA_SOURCE = {
+    'type': 'string',
+    'required': False,
+    'nullable': False,
+    'empty': False,
+    'regex': '^[A-Za-z0-9][A-Za-z0-9_.-]*$',
+    'default': 'default',
+}
+
+
 SCHEMA_PUSH = {
+    'source': SCHEMA_SOURCE,
     'title': {
         'type': 'string',
         'empty': True,
@@ -35,6 +59,21 @@ SCHEMA_PUSH = {
         'nullable': True,
         'default': None,
     },
+    # Time of the sample in seconds since the epoch, by the agent's clock
+    'timestamp': {
+        'type': 'number',
+        'finite': True,
+        'required': False,
+        'nullable': True,
+        'default': None,
+    },
+    # Data only has the values that changed since the previous push
+    'delta': {
+        'type': 'boolean',
+        'required': False,
+        'nullable': False,
+        'default': False,
+    },
     'data': {
         'required': True,
         'type': 'dict',
@@ -52,6 +91,7 @@ SCHEMA_PUSH = {
                 'overview': {
                     'required': True,
                     'type': 'float',
+                    'finite': True,
                     'nullable': True,
                 },
                 'value': {
@@ -70,11 +110,399 @@ SCHEMA_PUSH = {
 }
 
 
+SCHEMA_PUSH_BATCH = {
+    'source': SCHEMA_SOURCE,
+    'title': SCHEMA_PUSH['title'],
+    'frames': {
+        'required': True,
+        'type': 'list',
+        'nullable': False,
+        'empty': False,
+        'schema': {
+            'type': 'dict',
+            'nullable': False,
+            'schema': {
+                'timestamp': {
+                    'required': True,
+                    'type': 'number',
+                    'finite': True,
+                    'nullable': False,
+                },
+                'data': SCHEMA_PUSH['data'],
+            },
+        },
+    },
+}
+
+
+SCHEMA_CONFIG = {
+    'source': SCHEMA_SOURCE,
+    'title': {
+        'type': 'string',
+        'empty': True,
+        'required': False,
+        'nullable': True,
+        'default': None,
+    },
+    'palette': {
+        'required': True,
+        'type': 'list',
+        'nullable': False,
+        'schema': {
+            'type': 'list',
+            'nullable': False,
+            'empty': False,
+            'schema': {
+                'type': 'string',
+                'nullable': False,
+            },
+        },
+    },
+    # Widgets descriptors are heterogeneous (strings, nulls, dictionaries and
+    # lists of dictionaries), the UIManager is responsible of checking them
+    'widgets': {
+        'required': True,
+        'type': 'list',
+        'nullable': False,
+        'empty': False,
+    },
+}
+
+
+SCHEMA_MESSAGE = {
+    'message': {
+        'required': True,
+        'type': 'string',
+        'empty': True,
+        'nullable': False,
+    },
+    'title': {
+        'type': 'string',
+        'empty': True,
+        'required': False,
+        'nullable': False,
+        'default': '',
+    },
+    'width': {
+        'type': 'float',
+        'finite': True,
+        'required': False,
+        'nullable': True,
+        'default': None,
+    },
+    'height': {
+        'type': 'float',
+        'finite': True,
+        'required': False,
+        'nullable': True,
+        'default': None,
+    },
+    'type': {
+        'type': 'string',
+        'required': False,
+        'nullable': False,
+        'allowed': ['WARNING'],
+        'default': 'WARNING',
+    },
+}
+
+
 SCHEMAS = {
     'push': SCHEMA_PUSH,
+    'push_batch': SCHEMA_PUSH_BATCH,
+    'config': SCHEMA_CONFIG,
+    'message': SCHEMA_MESSAGE,
 }
 
 
+class ProtocolValidator(Validator):
+    """
+    Cerberus validator implementing the custom rules of the protocol.
+    """
+
+    def _validate_finite(self, finite, field, value):
+        """
+        Reject not a number and infinite floats.
+
+        The rule's arguments are validated against this schema:
+        {'type': 'boolean'}
+        """
+        if finite and isinstance(value, float) and not isfinite(value):
+            self._error(field, 'must be a finite number')
+
+
+class Rejected(Exception):
+    """
+    Raised by a compiled validator when the document doesn't comply with the
+    schema.
+    """
+
+
+# Mirror of Cerberus ``types_mapping``: accepted types and excluded types
+TYPES = {
+    'boolean': ((bool, ), ()),
+    'dict': ((Mapping, ), ()),
+    'float': ((float, int), ()),
+    'integer': ((int, ), ()),
+    'list': ((Sequence, ), (str, )),
+    'number': ((int, float), (bool, )),
+    'string': ((str, ), ()),
+}
+
+
+# Rules consumed by the mapping that holds the field and not by the field
+MAPPING_RULES = ('required', 'default')
+
+
+def _compile_type(rule):
+    """
+    Compile a ``type`` rule into a predicate.
+    """
+    if rule not in TYPES:
+        raise ValueError('Unsupported type {}'.format(rule))
+
+    accepted, excluded = TYPES[rule]
+
+    if excluded:
+        def check(value):
+            return (
+                isinstance(value, accepted) and
+                not isinstance(value, excluded)
+            )
+        return check
+
+    def check(value):
+        return isinstance(value, accepted)
+    return check
+
+
+def _compile_field(rules):
+    """
+    Compile the rules of a field into a callable that receives the value of
+    the field and returns it normalized, or raises :class:`Rejected`.
+
+    :param dict rules: Cerberus rules for the field.
+
+    :return: A validator callable.
+    :rtype: function
+    """
+    unsupported = set(rules) - {
+        'type', 'finite', 'nullable', 'empty', 'regex', 'allowed', 'schema',
+        'keyschema', 'keysrules', 'valueschema', 'valuesrules',
+    } - set(MAPPING_RULES)
+    if unsupported:
+        raise ValueError('Unsupported rules {}'.format(sorted(unsupported)))
+
+    nullable = rules.get('nullable', False)
+    empty = rules.get('empty')
+    finite = rules.get('finite', False)
+    type_check = _compile_type(rules['type']) if 'type' in rules else None
+
+    regex = rules.get('regex')
+    if regex is not None:
+        if not regex.endswith('$'):
+            regex += '$'
+        regex = compile_regex(regex).match
+
+    allowed = rules.get('allowed')
+    if allowed is not None:
+        allowed = tuple(allowed)
+
+    keys = rules.get('keysrules', rules.get('keyschema'))
+    if keys is not None:
+        keys = _compile_field(keys)
+
+    values = rules.get('valuesrules', rules.get('valueschema'))
+    if values is not None:
+        values = _compile_field(values)
+
+    schema = rules.get('schema')
+    if schema is not None:
+        if rules.get('type') == 'dict':
+            schema = _compile_mapping(schema)
+        elif rules.get('type') == 'list':
+            schema = _compile_sequence(schema)
+        else:
+            raise ValueError('Rule schema requires type dict or list')
+
+    def validate(value):
+        if value is None:
+            if nullable:
+                return value
+            raise Rejected()
+
+        if type_check is not None and not type_check(value):
+            raise Rejected()
+
+        if finite and isinstance(value, float) and not isfinite(value):
+            raise Rejected()
+
+        # As Cerberus, the regex is skipped for empty values only when the
+        # empty rule is explicitly set
+        blank = empty is not None and isinstance(value, Sized) and \
+            not len(value)
+        if blank and not empty:
+            raise Rejected()
+
+        if regex is not None and not blank and isinstance(value, str) and \
+                not regex(value):
+            raise Rejected()
+
+        if allowed is not None and value not in allowed:
+            raise Rejected()
+
+        if keys is not None or values is not None:
+            normalized = None
+            for key, item in value.items():
+                if keys is not None:
+                    keys(key)
+                if values is not None:
+                    result = values(item)
+                    if result is not item:
+                        if normalized is None:
+                            normalized = dict(value)
+                        normalized[key] = result
+            if normalized is not None:
+                value = normalized
+
+        if schema is not None:
+            value = schema(value)
+
+        return value
+
+    return validate
+
+
+def _compile_sequence(rules):
+    """
+    Compile the rules for the items of a sequence into a callable that
+    receives a sequence and returns it normalized, or raises
+    :class:`Rejected`.
+
+    :param dict rules: Cerberus rules for every item of the sequence.
+
+    :return: A validator callable.
+    :rtype: function
+    """
+    items = _compile_field(rules)
+
+    def validate(sequence):
+        normalized = None
+
+        for index, item in enumerate(sequence):
+            result = items(item)
+            if result is not item:
+                if normalized is None:
+                    normalized = list(sequence)
+                normalized[index] = result
+
+        return sequence if normalized is None else normalized
+
+    return validate
+
+
+def _compile_mapping(schema):
+    """
+    Compile a mapping schema (field name to rules) into a callable that
+    receives a mapping and returns it normalized, or raises
+    :class:`Rejected`.
+
+    The returned mapping is the same object when no normalization was
+    required.
+
+    :param dict schema: Cerberus schema.
+
+    :return: A validator callable.
+    :rtype: function
+    """
+    fields = {
+        name: _compile_field(rules)
+        for name, rules in schema.items()
+    }
+    required = frozenset(
+        name for name, rules in schema.items()
+        if rules.get('required', False) and 'default' not in rules
+    )
+    defaults = tuple(
+        (name, rules['default'], rules.get('nullable', False))
+        for name, rules in schema.items()
+        if 'default' in rules
+    )
+
+    def validate(document):
+        if not isinstance(document, Mapping):
+            raise Rejected()
+
+        if not required.issubset(document):
+            raise Rejected()
+
+        normalized = None
+
+        # Cerberus applies defaults to missing fields and to null fields that
+        # are not nullable
+        for name, default, nullable in defaults:
+            if name not in document or (
+                document[name] is None and not nullable
+            ):
+                if normalized is None:
+                    normalized = dict(document)
+                normalized[name] = default
+
+        source = document if normalized is None else normalized
+
+        for name, value in source.items():
+            field = fields.get(name)
+            if field is None:
+                raise Rejected()
+
+            result = field(value)
+            if result is not value:
+                if normalized is None:
+                    normalized = dict(document)
+                normalized[name] = result
+
+        return document if normalized is None else normalized
+
+    return validate
+
+
+def compile_schema(schema):
+    """
+    Compile a Cerberus schema into a validator callable.
+
+    The compiled validator accepts exactly the documents Cerberus accepts and
+    normalizes them the same way (currently, it applies default values).
+    Only a subset of the Cerberus rules is supported, a :py:exc:`ValueError`
+    is raised for any other rule.
+
+    :param dict schema: Cerberus schema.
+
+    :return: A callable that receives a document and returns a new normalized
+     document, or raises :class:`Rejected`.
+    :rtype: function
+    """
+    mapping = _compile_mapping(schema)
+
+    def validate(document):
+        validated = mapping(document)
+        if validated is document:
+            validated = dict(document)
+        return validated
+
+    return validate
+
+
+COMPILED = {
+    schema_id: compile_schema(schema)
+    for schema_id, schema in SCHEMAS.items()
+}
+
+
+# Cerberus validators are only used to report the errors of rejected
+# documents. Creating them is expensive, so they are created lazily once.
+VALIDATORS = {}
+
+
 def validate_schema(schema_id, data):
     """
     Generic schema validation function.
@@ -86,11 +514,34 @@ def validate_schema(schema_id, data):
      validation errors found, if any.
     :rtype: tuple
     """
-    validator = Validator(SCHEMAS[schema_id])
-    validated = validator.validated(data)
+    try:
+        return COMPILED[schema_id](data), {}
+    except Rejected:
+        pass
+
+    validator = VALIDATORS.get(schema_id)
+    if validator is None:
+        validator = VALIDATORS[schema_id] = ProtocolValidator(
+            SCHEMAS[schema_id]
+        )
+
+    # Cerberus normalization breaks on some malformed documents, like a
+    # mapping with a field named type where a list is expected, so their
+    # errors are reported without normalizing them
+    try:
+        validated = validator.validated(data)
+    except Exception:
+        log.warning('Unable to normalize document for {} schema'.format(
+            schema_id,
+        ))
+        validator.validate(data, normalize=False)
+        return None, validator.errors or {schema_id: ['invalid document']}
+
     return validated, validator.errors
 
 
 __all__ = [
+    'ProtocolValidator',
+    'compile_schema',
     'validate_schema',
 ]
@@ -0,0 +1,533 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""
+Persistent store of the samples pushed to the dashboard.
+
+Each series, a widget of a source, is stored in its own directory as a
+sequence of segment files of fixed size binary records of a timestamp and a
+value, both doubles. Samples are appended by a background thread, so the
+event loop never blocks on disk writes, and read using memory maps.
+
+Samples of a series are kept in timestamp order, so reads can binary search
+the segments. Samples older than the newest sample stored for their series
+are dropped.
+"""
+
+from os import fstat
+from array import array
+from math import isfinite
+from pathlib import Path
+from struct import Struct
+from threading import Thread
+from operator import itemgetter
+from queue import Queue, Full, Empty
+from mmap import mmap, ACCESS_READ
+from collections import OrderedDict
+from logging import getLogger as get_logger
+
+
+log = get_logger(__name__)
+
+
+# Record of a sample: timestamp in seconds since the epoch and value
+RECORD = Struct('<dd')
+SUFFIX = '.seg'
+
+
+def _search(records, count, timestamp):
+    """
+    Index of the first record of a segment with a timestamp greater or equal
+    than the given one, in a flat view of the records of the segment.
+    """
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if records[middle * 2] < timestamp:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def read_segment(path, start=None, end=None, last=None):
+    """
+    Read the samples of a segment.
+
+    :param path: Path to the segment file.
+    :type path: :py:class:`pathlib.Path`
+    :param float start: Minimum timestamp of the samples, inclusive.
+    :param float end: Maximum timestamp of the samples, exclusive.
+    :param int last: Read only this number of samples from the end of the
+     range.
+
+    :return: Array with the timestamps and values of the samples
+     interleaved, or an empty array if the segment doesn't exist.
+    :rtype: :py:class:`array.array`
+    """
+    samples = array('d')
+
+    try:
+        fd = open(str(path), 'rb')
+    except FileNotFoundError:
+        return samples
+
+    with fd:
+        # Ignore a record being written
+        size = fstat(fd.fileno()).st_size
+        size -= size % RECORD.size
+        if not size:
+            return samples
+
+        with mmap(fd.fileno(), size, access=ACCESS_READ) as mapped:
+            records = memoryview(mapped).cast('d')
+            try:
+                count = size // RECORD.size
+                first = 0 if start is None else _search(
+                    records, count, start,
+                )
+                stop = count if end is None else _search(records, count, end)
+                if last is not None:
+                    first = max(first, stop - last)
+
+                samples.frombytes(
+                    records[first * 2:stop * 2].tobytes()
+                )
+            finally:
+                records.release()
+
+    return samples
+
+
+def read_bounds(path):
+    """
+    Timestamps of the first and last samples of a segment.
+
+    :return: Tuple with the first and last timestamps, or None if the segment
+     is empty or doesn't exist.
+    :rtype: tuple
+    """
+    try:
+        fd = open(str(path), 'rb')
+    except FileNotFoundError:
+        return None
+
+    with fd:
+        size = fstat(fd.fileno()).st_size
+        size -= size % RECORD.size
+        if not size:
+            return None
+
+        first = RECORD.unpack(fd.read(RECORD.size))[0]
+        fd.seek(size - RECORD.size)
+        last = RECORD.unpack(fd.read(RECORD.size))[0]
+
+    return first, last
+
+
+class _Series:
+    """
+    Writer of the segments of a series. Only used by the writer thread.
+
+    :param path: Directory of the series.
+    :type path: :py:class:`pathlib.Path`
+    :param int segment_size: Maximum number of samples per segment.
+    :param float retention: Seconds to keep the samples for.
+    """
+
+    def __init__(self, path, segment_size, retention):
+        self.path = path
+        self.segment_size = segment_size
+        self.retention = retention
+
+        self.fd = None
+        self.count = 0
+        self.sequence = 0
+        self.last = float('-inf')
+
+        # Records waiting to be written
+        self.pending = []
+
+        path.mkdir(parents=True, exist_ok=True)
+        segments = sorted(path.glob('*' + SUFFIX))
+        if not segments:
+            return
+
+        # Continue the last segment, dropping a record torn by a crash
+        current = segments[-1]
+        self.sequence = int(current.stem)
+        self.fd = open(str(current), 'r+b')
+
+        size = fstat(self.fd.fileno()).st_size
+        size -= size % RECORD.size
+        self.fd.truncate(size)
+        self.fd.seek(size)
+        self.count = size // RECORD.size
+
+        bounds = read_bounds(current)
+        if bounds is not None:
+            self.last = bounds[1]
+
+    def add(self, timestamp, value):
+        """
+        Add a sample to be written.
+
+        :return: False if the sample was dropped because it is older than the
+         newest sample of the series.
+        :rtype: bool
+        """
+        if timestamp < self.last:
+            return False
+
+        self.last = timestamp
+        self.pending.append(RECORD.pack(timestamp, value))
+        return True
+
+    def write(self):
+        """
+        Write the pending records, rotating segments when full.
+        """
+        pending = self.pending
+        self.pending = []
+
+        while pending:
+            if self.fd is None or self.count >= self.segment_size:
+                self._rotate()
+
+            room = self.segment_size - self.count
+            chunk, pending = pending[:room], pending[room:]
+            self.fd.write(b''.join(chunk))
+            self.count += len(chunk)
+
+        self.fd.flush()
+
+    def close(self):
+        if self.fd is not None:
+            self.fd.close()
+            self.fd = None
+
+    def _rotate(self):
+        """
+        Start a new segment and remove the expired ones.
+        """
+        self.close()
+
+        self.sequence += 1
+        self.fd = open(
+            str(self.path / '{:010d}{}'.format(self.sequence, SUFFIX)), 'wb',
+        )
+        self.count = 0
+
+        if self.last == float('-inf'):
+            return
+
+        expiry = self.last - self.retention
+        for segment in sorted(self.path.glob('*' + SUFFIX)):
+            bounds = read_bounds(segment)
+            if bounds is None or bounds[1] >= expiry:
+                break
+            log.info('Removing expired segment {}'.format(segment))
+            segment.unlink()
+
+
+class Store:
+    """
+    Append-only persistent store of the samples pushed to the dashboard.
+
+    Samples are enqueued without blocking in a bounded queue and written by a
+    background thread, which writes all the samples waiting in the queue at
+    once. Samples are dropped, and accounted for, when the queue is full.
+
+    :param str path: Directory of the store.
+    :param int segment_size: Maximum number of samples per segment.
+    :param float retention: Seconds to keep the samples for. Expired segments
+     are removed when a new segment is started.
+    :param int size: Maximum number of pushes waiting to be written.
+    """
+
+    def __init__(
+        self, path, segment_size=65536, retention=7 * 24 * 3600.0,
+        size=10000,
+    ):
+        assert segment_size > 0 and retention > 0
+
+        self.path = Path(path)
+        self._segment_size = segment_size
+        self._retention = retention
+
+        self._queue = Queue(size)
+        self._thread = None
+
+        # Series writers by (source, identifier), only used by the thread
+        self._series = OrderedDict()
+
+        # Statistics
+        self.written = 0
+        self.dropped = 0
+        self.late = 0
+        self.invalid = 0
+
+    def start(self):
+        """
+        Start the writer thread.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._thread = Thread(
+            target=self._write_forever,
+            name='coral-store',
+            daemon=True,
+        )
+        self._thread.start()
+
+    def close(self):
+        """
+        Write the samples waiting in the queue and stop the writer thread.
+
+        The queue is only waited on while the writer thread is alive, so
+        closing never blocks if the thread died.
+        """
+        if self._thread is None:
+            return
+
+        while self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=0.1)
+                break
+            except Full:
+                pass
+
+        self._thread.join()
+        self._thread = None
+
+    def append(self, source, timestamp, data, pushed):
+        """
+        Enqueue the data of a push to be written.
+
+        :param str source: Identifier of the source of the data.
+        :param float timestamp: Time of the push in seconds since the epoch.
+        :param dict data: Data pushed, as expected by
+         :meth:`coral_dashboard.ui.manager.UIManager.push`.
+        :param list pushed: Identifiers of the widgets pushed. Only the data
+         of these widgets is written.
+        """
+        self.append_batch(
+            source, ({'timestamp': timestamp, 'data': data}, ), pushed,
+        )
+
+    def append_batch(self, source, frames, pushed):
+        """
+        Enqueue several timestamped frames of data to be written.
+
+        :param str source: Identifier of the source of the data.
+        :param list frames: List of frames dictionaries with a ``timestamp``
+         and the ``data``.
+        :param list pushed: Identifiers of the widgets pushed. Only the data
+         of these widgets is written.
+        """
+        try:
+            self._queue.put_nowait((source, frames, pushed))
+        except Full:
+            self.dropped += 1
+
+    def identifiers(self, source):
+        """
+        Identifiers of the widgets stored for a source.
+
+        :param str source: Identifier of the source.
+
+        :return: Sorted list of widgets identifiers.
+        :rtype: list
+        """
+        path = self.path / source
+        if not path.is_dir():
+            return []
+        return sorted(child.name for child in path.iterdir() if child.is_dir())
+
+    def segments(self, source, identifier):
+        """
+        Segments of a series, from the oldest to the newest.
+
+        :return: List of paths to the segment files.
+        :rtype: list
+        """
+        path = self.path / source / identifier
+        if not path.is_dir():
+            return []
+        return sorted(path.glob('*' + SUFFIX))
+
+    def read(self, source, identifier, start=None, end=None):
+        """
+        Read the samples of a series in a time range.
+
+        Segments are read one at a time, so large ranges can be processed
+        without loading them in memory.
+
+        :param str source: Identifier of the source.
+        :param str identifier: Identifier of the widget.
+        :param float start: Minimum timestamp of the samples, inclusive.
+        :param float end: Maximum timestamp of the samples, exclusive.
+
+        :return: Generator of arrays with the timestamps and values of the
+         samples interleaved, one for each segment in the range.
+        """
+        for segment in self.segments(source, identifier):
+            bounds = read_bounds(segment)
+            if bounds is None:
+                continue
+
+            first, last = bounds
+            if start is not None and last < start:
+                continue
+            if end is not None and first >= end:
+                break
+
+            samples = read_segment(segment, start=start, end=end)
+            if samples:
+                yield samples
+
+    def tail(self, source, identifier, count):
+        """
+        Read the newest samples of a series.
+
+        :param str source: Identifier of the source.
+        :param str identifier: Identifier of the widget.
+        :param int count: Maximum number of samples to read.
+
+        :return: Array with the timestamps and values of the samples
+         interleaved, from the oldest to the newest.
+        :rtype: :py:class:`array.array`
+        """
+        samples = array('d')
+
+        for segment in reversed(self.segments(source, identifier)):
+            missing = count - len(samples) // 2
+            if missing <= 0:
+                break
+            samples = read_segment(segment, last=missing) + samples
+
+        return samples
+
+    def _write_forever(self):
+        """
+        Write the enqueued samples until closed. Runs in the writer thread.
+        """
+        running = True
+
+        while running:
+            batch = [self._queue.get()]
+
+            # Write all the samples waiting at once
+            try:
+                while True:
+                    batch.append(self._queue.get_nowait())
+            except Empty:
+                pass
+
+            if None in batch:
+                running = False
+                batch = [item for item in batch if item is not None]
+
+            # The thread must survive any error, or all the pushes that
+            # follow would be silently lost
+            try:
+                self._write(batch)
+            except Exception:
+                log.exception('Unable to write samples to the store')
+
+        for series in self._series.values():
+            series.close()
+        self._series.clear()
+
+    def _write(self, batch):
+        """
+        Write a batch of enqueued pushes.
+        """
+        dirty = OrderedDict()
+
+        for source, frames, pushed in batch:
+            try:
+                self._add(dirty, source, frames, pushed)
+            except Exception:
+                log.exception(
+                    'Unable to store a push from source {}'.format(source)
+                )
+
+        for series in dirty.values():
+            series.write()
+
+    def _add(self, dirty, source, frames, pushed):
+        """
+        Add the samples of an enqueued push to their series.
+
+        :param OrderedDict dirty: Series with samples added, by key.
+        """
+        pushed = set(pushed)
+
+        for frame in sorted(frames, key=itemgetter('timestamp')):
+            timestamp = frame['timestamp']
+
+            for identifier, sample in frame['data'].items():
+                if identifier not in pushed:
+                    continue
+
+                value = self._value(sample)
+                if value is None:
+                    self.invalid += 1
+                    continue
+
+                key = (source, identifier)
+                series = self._series.get(key)
+                if series is None:
+                    series = self._series[key] = _Series(
+                        self.path / source / identifier,
+                        self._segment_size,
+                        self._retention,
+                    )
+
+                if not series.add(timestamp, value):
+                    self.late += 1
+                    continue
+
+                dirty[key] = series
+                self.written += 1
+
+    def _value(self, sample):
+        """
+        Value shown by the widgets for a sample.
+
+        :return: The completion of the sample, or None if it doesn't have a
+         finite one.
+        :rtype: float
+        """
+        value = sample.get('overview')
+        try:
+            if value is None:
+                value = (
+                    float(sample['value']) / float(sample['total'])
+                ) * 100.0
+            else:
+                value = float(value)
+        except (TypeError, ValueError, ZeroDivisionError, KeyError):
+            return None
+
+        return value if isfinite(value) else None
+
+
+__all__ = [
+    'Store',
+    'read_segment',
+    'read_bounds',
+]
@@ -21,86 +21,220 @@ Module implementing the main bar widget.
 
 from logging import getLogger as get_logger
 
-from math import ceil
+from math import ceil, isnan
 
-from urwid import (
-    Text,
-    Pile,
-    AttrMap,
-    Columns,
-    WidgetWrap,
-    ProgressBar,
-)
+from urwid import Widget, TextCanvas
 
 
 log = get_logger(__name__)
 
 
-class OptionalTextProgressBar(ProgressBar):
+class Bar(Widget):
+    """
+    Flow widget showing a value as a horizontal bar of several rows, under a
+    heading with its title on the left and its label on the right.
 
-    def __init__(self, *args, has_text=True, **kwargs):
-        self._has_text = has_text
-        super().__init__(*args, **kwargs)
+    The whole bar is drawn as a single canvas. The completion is shown with
+    eighths of a cell, and its rounded percentage in the middle row. The
+    rows are only rasterized again when the rounded completion, the label or
+    the width changed, otherwise the canvas is built from the rows of the
+    previous render.
 
-    def get_text(self):
-        if self._has_text:
-            return super().get_text()
-        return ''
+    :param str identifier: Identifier of the bar, prefix of the attributes.
+    :param str title: Title of the bar.
+    :param str unit: Unit of the values.
+    :param str symbol: Symbol of the completion in the label.
+    :param int rows: Number of rows of the bar, without the heading.
+    """
 
+    _sizing = frozenset(['flow'])
+    _selectable = False
+
+    EIGHTHS = ' ▏▎▍▌▋▊▉'
 
-class Bar(WidgetWrap):
     def __init__(self, identifier, title, unit, symbol='%', rows=3):
+        super().__init__()
 
         self._identifier = identifier
         self._title = title
         self._unit = unit
+        self._heading = '{} ({})'.format(title, unit)
+        self._set_symbol(symbol)
+        self._rows = rows
+
+        self._attributes = {
+            name: '{} {}'.format(identifier, name) for name in [
+                'title', 'label', 'normal', 'complete', 'smooth',
+            ]
+        }
+
+        # Label and completion shown, to skip the pushes that don't change
+        # them
+        self._label = ''
+        self._completion = None
+
+        # Key and rasterized rows of the last render
+        self._key = None
+        self._raster = None
+
+    def _set_symbol(self, symbol):
+        """
+        Precompute the formats of the label for the given symbol.
+        """
         self._symbol = symbol
+        self._format = '{{:.1f}}{}'.format(symbol)
+        self._format_total = '{{:.1f}}{} [{{}}/{{}}]'.format(symbol)
 
-        self.title = Text(
-            '{} ({})'.format(title, unit),
-            align='left'
-        )
-        self.label = Text('', align='right')
-
-        middle = ceil(rows / 2) - 1
-        self.bars = [
-            OptionalTextProgressBar(
-                '{} normal'.format(identifier),
-                '{} complete'.format(identifier),
-                satt='{} smooth'.format(identifier),
-                has_text=(middle == r),
-            ) for r in range(rows)
-        ]
+    def rows(self, size, focus=False):
+        return self._rows + 1
 
-        super().__init__(
-            Pile([
-                ('pack', Columns([
-                    AttrMap(self.title, '{} title'.format(identifier)),
-                    AttrMap(self.label, '{} label'.format(identifier)),
-                ], dividechars=1)),
-            ] + [
-                ('pack', bar)
-                for bar in self.bars
-            ])
-        )
+    def reconfigure(self, title, unit, symbol='%', rows=3):
+        """
+        Change the options of the bar in place.
+
+        :return: True, bars can always be reconfigured.
+        :rtype: bool
+        """
+        if (title, unit, rows) != (self._title, self._unit, self._rows):
+            self._title = title
+            self._unit = unit
+            self._heading = '{} ({})'.format(title, unit)
+            self._rows = rows
+            self._invalidate()
+
+        self._set_symbol(symbol)
+        return True
 
     def push(self, overview=None, value=None, total=None):
+        """
+        Push a new value to the bar.
 
-        label = '{{:.1f}}{}'.format(self._symbol)
+        Changing the bar invalidates its cached canvas and the ones of its
+        containers, so pushes that don't change the label nor the completion
+        drawn at the width of the last render are skipped.
 
+        :return: True if the bar changed.
+        :rtype: bool
+        """
         if overview is None:
             if value is None or total is None:
                 raise RuntimeError(
                     'value and total must be passed when pushing data without '
                     'the overview'
                 )
-            overview = (float(value) / float(total)) * 100.0
-            label = '{} [{}/{}]'.format(label, value, total)
-
-        self.label.set_text(label.format(overview))
-
-        for bar in self.bars:
-            bar.set_completion(overview)
+            # A zero total has no completion, it's shown empty
+            overview = (float(value) / float(total)) * 100.0 if total else 0.0
+            label = self._format_total.format(overview, value, total)
+        else:
+            label = self._format.format(overview)
+
+        if label == self._label and overview == self._completion:
+            return False
+
+        changed = label != self._label
+        self._label = label
+        self._completion = overview
+
+        # The cells and the percentage drawn are the ones of the last render
+        key = self._key
+        if not changed and key is not None and \
+                self._quantize(key[0]) == key[2:5]:
+            return False
+
+        self._invalidate()
+        return True
+
+    def _quantize(self, maxcol):
+        """
+        Completion as drawn at the given width.
+
+        :return: The number of full cells, the eighths of the partial cell and
+         the rounded percentage.
+        :rtype: tuple
+        """
+        # A completion that isn't a number is drawn empty
+        completion = self._completion or 0.0
+        if isnan(completion):
+            completion = 0.0
+        completion = min(max(completion, 0.0), 100.0)
+
+        cells = completion * maxcol / 100.0
+        full = int(cells)
+        part = int((cells - full) * 8) if full < maxcol else 0
+        return full, part, '{} %'.format(int(completion))
+
+    def _header(self, maxcol):
+        """
+        Rasterize the heading, the title clipped to leave room to the label.
+        """
+        label = self._label[:maxcol]
+        width = maxcol - len(label)
+        heading = self._heading[:max(width - 1, 0)].ljust(width)
+
+        text = '{}{}'.format(heading, label).encode('utf-8')
+        attributes = [
+            (attribute, length) for attribute, length in (
+                (self._attributes['title'], len(heading.encode('utf-8'))),
+                (self._attributes['label'], len(label.encode('utf-8'))),
+            ) if length
+        ]
+        return text, attributes, [(None, len(text))]
+
+    def _line(self, line, full, part):
+        """
+        Rasterize a row of the bar, with a line of text over it.
+        """
+        # The partial cell is only drawn over a blank
+        middle = ''
+        if part and line[full] == ' ':
+            middle = self.EIGHTHS[part]
+            rest = line[full + 1:]
+        else:
+            rest = line[full:]
+
+        text = '{}{}{}'.format(line[:full], middle, rest).encode('utf-8')
+        attributes = [
+            (attribute, length) for attribute, length in (
+                (self._attributes['complete'], full),
+                (self._attributes['smooth'], len(middle.encode('utf-8'))),
+                (self._attributes['normal'], len(rest)),
+            ) if length
+        ]
+        return text, attributes, [(None, len(text))]
+
+    def render(self, size, focus=False):
+        (maxcol,) = size
+
+        full, part, percent = self._quantize(maxcol)
+        key = (maxcol, self._rows, full, part, percent, self._heading,
+               self._label)
+
+        if key != self._key:
+            blank = self._line(' ' * maxcol, full, part)
+
+            # Centered as urwid's text widget does
+            percent = percent[:maxcol]
+            labeled = self._line(
+                percent.rjust((maxcol + len(percent) + 1) // 2).ljust(maxcol),
+                full, part,
+            )
+
+            middle = ceil(self._rows / 2) - 1
+            self._raster = [self._header(maxcol)] + [
+                labeled if row == middle else blank
+                for row in range(self._rows)
+            ]
+            self._key = key
+
+        # Canvases can't be shared between renders, but their rows can
+        raster = self._raster
+        return TextCanvas(
+            [text for text, _, _ in raster],
+            [list(attributes) for _, attributes, _ in raster],
+            [list(charsets) for _, _, charsets in raster],
+            maxcol=maxcol,
+            check_width=False,
+        )
 
 
 __all__ = [
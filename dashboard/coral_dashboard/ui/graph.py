@@ -19,96 +19,320 @@
 Module implementing the main data visualization widget.
 """
 
+from time import time
+from math import isnan
+from itertools import groupby
 from logging import getLogger as get_logger
+from collections import OrderedDict
 
 from urwid import (
     Text,
     Pile,
+    Widget,
     Columns,
     AttrMap,
-    BarGraph,
+    TextCanvas,
     WidgetWrap,
 )
 
+from .history import RingBuffer, Rollup
+
 
 log = get_logger(__name__)
 
 
-class ScalableBarGraph(BarGraph):
+class Raster(Widget):
+    """
+    Base class of the box widgets rasterizing the newest samples of a
+    history buffer, aligned to the left.
+
+    Sample values are quantized into heights, in levels of a row, and each
+    height is drawn with a precomputed column of cells, so the rasterization
+    never loops over the cells in Python. Subclasses implement the encoding
+    of the columns and of the rows of cells.
+
+    :param str identifier: Identifier of the graph, prefix of the attributes.
+    :param RingBuffer series: History buffer to show.
+    :param float top: Value of a full height sample.
+    """
+
+    _sizing = frozenset(['box'])
+    _selectable = False
+
+    # Number of samples per column of cells and of levels per row
+    SAMPLES = 1
+    LEVELS = 8
+
+    # Attributes of the cells, by class, suffixes of the identifier
+    ATTRIBUTES = {}
 
-    def __init__(self, *args, align='left', **kwargs):
-        assert align in ['left', 'right']
-        self._align = align
-        super().__init__(*args, **kwargs)
+    # Columns of each height, by subclass and number of rows, shared by all
+    # the graphs
+    _columns = {}
 
-    def calculate_bar_widths(self, size, bardata):
+    def __init__(self, identifier, series, top):
+        super().__init__()
+
+        self._attributes = {
+            klass: '{} {}'.format(identifier, name)
+            for klass, name in self.ATTRIBUTES.items()
+        }
+
+        self.series = series
+        self.top = top
+
+    def set_data(self, series, top):
         """
-        Fixes a bug in urwid 2.0.1 causing a::
+        Show another history buffer, or change the value of a full sample.
+        """
+        self.series = series
+        self.top = top
+        self._invalidate()
 
-            File ".../urwid/graphics.py", line 397, in calculate_bar_widths
-                len(bardata), maxcol / self.bar_width)
-            TypeError: can't multiply sequence by non-int of type 'float'
+    def refresh(self):
         """
-        (maxcol, maxrow) = size
+        Signal that the history buffer was modified in place.
+        """
+        self._invalidate()
 
-        if self.bar_width is not None:
-            return [self.bar_width] * min(
-                len(bardata), maxcol // self.bar_width
-            )
+    @classmethod
+    def columns(cls, rows):
+        """
+        Columns of all the heights for the given number of rows.
 
-        return super().calculate_bar_widths(size, bardata)
+        :return: The columns built by :meth:`_build_columns`.
+        :rtype: tuple
+        """
+        key = (cls, rows)
+        columns = Raster._columns.get(key)
+        if columns is None:
+            columns = Raster._columns[key] = cls._build_columns(rows)
+        return columns
+
+    @classmethod
+    def _build_columns(cls, rows):
+        """
+        Build the columns of all the heights for the given number of rows.
+        """
+        raise NotImplementedError()
 
-    def _get_data(self, size):
+    @staticmethod
+    def quantize(samples, scale, limit):
         """
-        This function is called by render to retrieve the data for the graph.
+        Heights of the samples, rounded to the given scale and clipped
+        between zero and the given limit.
+
+        Not a number samples are given an empty height, and infinite samples
+        are clipped as any other, so a sample that can't be drawn never
+        breaks the render of the graph.
 
-        This implementation will truncate the bardata list returned if not all
-        bars will fit within maxcol.
+        :param samples: Values of the samples, a sequence of floats.
+        :param float scale: Height of a unit value.
+        :param int limit: Maximum height.
 
-        This is basically a copy-paste of the original widget, but uses the
-        "align" parameter to decide what part of the data array to return.
+        :return: The heights of the samples.
+        :rtype: list
+        """
+        try:
+            heights = [int(value * scale + 0.5) for value in samples]
+        except (ValueError, OverflowError):
+            heights = [
+                0 if isnan(height) else int(min(max(height, 0.0), limit))
+                for height in (value * scale + 0.5 for value in samples)
+            ]
+
+        # Clip the heights only if needed, as it's rarely the case
+        if heights and (min(heights) < 0 or max(heights) > limit):
+            heights = [
+                min(max(height, 0), limit) for height in heights
+            ]
+        return heights
+
+    def _rasterize(self, maxcol, maxrow, heights):
         """
+        Rasterize the heights of the newest samples shown.
+
+        :return: The text, attributes and character sets of the rows.
+        :rtype: tuple
+        """
+        raise NotImplementedError()
+
+    def render(self, size, focus=False):
         (maxcol, maxrow) = size
-        bardata, top, hlines = self.data
-        widths = self.calculate_bar_widths((maxcol, maxrow), bardata)
 
-        if len(bardata) > len(widths):
-            if self._align == 'right':
-                return bardata[:len(widths)], top, hlines
-            return bardata[-len(widths):], top, hlines
-        return bardata, top, hlines
+        series = self.series
+        count = min(maxcol * self.SAMPLES, len(series))
+        limit = maxrow * self.LEVELS
+        scale = limit / self.top if self.top > 0 else 0.0
+
+        text, attributes, charsets = self._rasterize(
+            maxcol, maxrow, self.quantize(series.tail(count), scale, limit),
+        )
+
+        return TextCanvas(
+            text, attributes, charsets, maxcol=maxcol, check_width=False,
+        )
+
+
+class BarRaster(Raster):
+    """
+    Raster of a bar graph, one sample per column.
+
+    Heights are quantized to eighths of a row, the topmost cell of each bar
+    showing the partial block of the remainder. Consecutive samples alternate
+    between the ``bar1`` and ``bar2`` attributes, counting from the first
+    sample pushed, so the graph doesn't flicker as it scrolls.
+
+    Each column is a precomputed string with one code per row, so a frame is
+    rasterized by transposing the columns into rows and translating the codes
+    of each row into its text and attributes with :py:meth:`str.translate`.
+    Rows are cached by their codes, so rows that didn't change, like the
+    empty rows above the bars, aren't rasterized again.
+    """
+
+    # Codes of the cells: background, then partial blocks from 1/8 to 7/8 and
+    # full block of the bar1 samples, then of the bar2 samples
+    BACKGROUND = '0'
+    BAR1 = '12345678'
+    BAR2 = 'abcdefgh'
+
+    TEXT = str.maketrans(
+        BACKGROUND + BAR1 + BAR2,
+        ' ' + '\u2581\u2582\u2583\u2584\u2585\u2586\u2587 ' * 2,
+    )
+    CLASSES = str.maketrans(
+        BACKGROUND + BAR1 + BAR2,
+        '0' + 's' * 7 + 'b' + 'S' * 7 + 'B',
+    )
+    ATTRIBUTES = {
+        '0': 'background',
+        'b': 'bar1',
+        's': 'bar1 smooth',
+        'B': 'bar2',
+        'S': 'bar2 smooth',
+    }
+
+    # Length in bytes of the cells of each class, as the canvas attributes
+    # are run length encoded in bytes of the encoded text
+    BYTES = {
+        '0': 1, 'b': 1, 'B': 1,
+        's': len('\u2581'.encode('utf-8')),
+        'S': len('\u2581'.encode('utf-8')),
+    }
+
+    # Maximum number of rows cached
+    ROWS_CACHE = 256
+
+    def __init__(self, identifier, series, top):
+        super().__init__(identifier, series, top)
+        self._rows = {}
+
+    @classmethod
+    def _build_columns(cls, rows):
+        """
+        Columns of the bar1 samples and of the bar2 samples, by height in
+        eighths of a row.
+        """
+        return tuple(
+            [
+                '{}{}{}'.format(
+                    cls.BACKGROUND * (rows - (height + 7) // 8),
+                    codes[height % 8 - 1] if height % 8 else '',
+                    codes[7] * (height // 8),
+                ) for height in range(rows * 8 + 1)
+            ] for codes in (cls.BAR1, cls.BAR2)
+        )
+
+    def _row(self, codes):
+        """
+        Text, attributes and character sets of a row, by its codes.
+        """
+        row = self._rows.get(codes)
+        if row is not None:
+            return row
+
+        if len(self._rows) >= self.ROWS_CACHE:
+            self._rows.clear()
+
+        attributes = self._attributes
+        widths = self.BYTES
+        text = codes.translate(self.TEXT).encode('utf-8')
+        row = self._rows[codes] = (
+            text,
+            [
+                (attributes[klass], len(list(run)) * widths[klass])
+                for klass, run in groupby(codes.translate(self.CLASSES))
+            ],
+            [(None, len(text))],
+        )
+        return row
+
+    def _rasterize(self, maxcol, maxrow, heights):
+        count = len(heights)
+
+        # Samples alternate between bar1 and bar2 by the parity of their
+        # number, the first column is odd if the first sample shown is
+        bar1, bar2 = self.columns(maxrow)
+        if (self.series.count - count) & 1:
+            first, second = bar1, bar2
+        else:
+            first, second = bar2, bar1
+
+        columns = [bar1[0]] * maxcol
+        columns[0:count:2] = map(first.__getitem__, heights[0::2])
+        columns[1:count:2] = map(second.__getitem__, heights[1::2])
+
+        rows = [self._row(''.join(codes)) for codes in zip(*columns)]
+
+        return (
+            [row[0] for row in rows],
+            [row[1] for row in rows],
+            [row[2] for row in rows],
+        )
 
 
 class Graph(WidgetWrap):
     MAX_ENTRIES = 200
 
-    def __init__(self, identifier, title, unit, symbol='%', maxvalue=100.0):
+    # Widget rasterizing the history, built with the identifier of the
+    # graph, the history shown and the value of a full height sample
+    RASTER = BarRaster
+
+    # Zoom levels and the duration in seconds of the periods of their
+    # rolled-up history, the raw level shows the samples as pushed
+    ZOOMS = OrderedDict([
+        ('raw', None),
+        ('1m', 60.0),
+        ('1h', 3600.0),
+    ])
+
+    def __init__(
+        self, identifier, title, unit, symbol='%', maxvalue=100.0,
+        zoom='raw',
+    ):
+        assert zoom in self.ZOOMS
 
         self._identifier = identifier
         self._title = title
         self._unit = unit
         self._symbol = symbol
         self._maxvalue = maxvalue
+        self._zoom = zoom
 
-        self._data = [(0, 0)] * self.MAX_ENTRIES
-        self._data_count = 0
+        self._history = RingBuffer(self.MAX_ENTRIES)
+        self._rollups = OrderedDict(
+            (level, Rollup(period, self.MAX_ENTRIES))
+            for level, period in self.ZOOMS.items()
+            if period is not None
+        )
 
-        self.title = Text('{} ({})'.format(title, unit), align='left')
-        self.label = Text('0.0{} [?/?]'.format(symbol), align='right')
+        # Completion, and value and total if pushed, shown in the label
+        self._shown = (0.0, ('?', '?'))
 
-        self.graph = ScalableBarGraph(
-            [
-                '{} background'.format(identifier),
-                '{} bar1'.format(identifier),
-                '{} bar2'.format(identifier),
-            ],
-            satt={
-                (1, 0): '{} bar1 smooth'.format(identifier),
-                (2, 0): '{} bar2 smooth'.format(identifier),
-            },
-            align='left',
-        )
-        self.graph.set_bar_width(1)
+        self.title = Text(self._title_text(), align='left')
+        self.label = Text(self._label_text(), align='right')
+
+        self.graph = self.RASTER(identifier, self._series(), self._maxvalue)
 
         super().__init__(
             Pile([
@@ -120,31 +344,155 @@ class Graph(WidgetWrap):
             ])
         )
 
-    def push(self, overview=None, value=None, total=None):
+    @property
+    def zoom(self):
+        """
+        Zoom level of the graph.
+        """
+        return self._zoom
 
-        # Determine and change label
-        label = '{{:.1f}}{}'.format(self._symbol)
+    def set_zoom(self, zoom):
+        """
+        Show the history of the given zoom level.
+
+        :param str zoom: Zoom level, one of :attr:`ZOOMS`.
+        """
+        assert zoom in self.ZOOMS
+
+        if zoom == self._zoom:
+            return
+
+        self._zoom = zoom
+        self.title.set_text(self._title_text())
+        self.graph.set_data(self._series(), self._maxvalue)
+
+    def _series(self):
+        """
+        History shown at the current zoom level.
+        """
+        if self._zoom in self._rollups:
+            return self._rollups[self._zoom].average
+        return self._history
+
+    def _title_text(self):
+        text = '{} ({})'.format(self._title, self._unit)
+        if self._zoom in self._rollups:
+            text = '{} [{}]'.format(text, self._zoom)
+        return text
+
+    def reconfigure(
+        self, title, unit, symbol='%', maxvalue=100.0, zoom=None,
+    ):
+        """
+        Change the options of the graph in place, keeping its history.
+
+        :param str zoom: Zoom level, or None to keep the current one, which
+         may have been changed with :meth:`set_zoom`.
+
+        :return: True, graphs can always be reconfigured.
+        :rtype: bool
+        """
+        if (title, unit) != (self._title, self._unit):
+            self._title = title
+            self._unit = unit
+            self.title.set_text(self._title_text())
+
+        if maxvalue != self._maxvalue:
+            self._maxvalue = maxvalue
+            self.graph.set_data(self._series(), maxvalue)
+
+        if symbol != self._symbol:
+            self._symbol = symbol
+            self._set_label(self._label_text())
 
+        if zoom is not None:
+            self.set_zoom(zoom)
+        return True
+
+    @property
+    def count(self):
+        """
+        Number of samples pushed to the graph.
+        """
+        return self._history.count
+
+    def rehydrate(self, samples):
+        """
+        Fill the history of the graph with stored samples.
+
+        :param samples: Timestamps and values of the samples interleaved, from
+         the oldest to the newest.
+        :type samples: :py:class:`array.array`
+        """
+        timestamps = samples[0::2]
+        values = samples[1::2]
+        if not values:
+            return
+
+        for value in values[-self.MAX_ENTRIES:]:
+            self._history.append(value)
+
+        for rollup in self._rollups.values():
+            append = rollup.append
+            for timestamp, value in zip(timestamps, values):
+                append(value, timestamp)
+
+        self._shown = (values[-1], None)
+        self._set_label(self._label_text())
+        self.graph.refresh()
+
+    def _label_text(self):
+        """
+        Text of the label, for the last sample shown and the symbol.
+        """
+        overview, totals = self._shown
+        text = '{:.1f}{}'.format(overview, self._symbol)
+        if totals is None:
+            return text
+        return '{} [{}/{}]'.format(text, *totals)
+
+    def _set_label(self, text):
+        """
+        Set the text of the label, only if it changed, as setting it
+        invalidates the cached canvas of the label and its containers.
+        """
+        if text != self.label.text:
+            self.label.set_text(text)
+
+    def push(self, overview=None, value=None, total=None, timestamp=None):
+        """
+        Push a new sample to the graph.
+
+        :return: True, as the history of the graph always moves.
+        :rtype: bool
+        """
+
+        # Determine and change label
         if overview is None:
             if value is None or total is None:
                 raise RuntimeError(
                     'value and total must be passed when pushing data without '
                     'the overview'
                 )
-            overview = (float(value) / float(total)) * 100.0
-            label = '{} [{}/{}]'.format(label, value, total)
+            # A zero total has no completion, it's shown empty
+            overview = (float(value) / float(total)) * 100.0 if total else 0.0
+            self._shown = (overview, (value, total))
+        else:
+            self._shown = (overview, None)
 
-        self.label.set_text(label.format(overview))
+        self._set_label(self._label_text())
 
-        # Append new entry to data buffer
-        entry = (overview, 0) if self._data_count & 1 else (0, overview)
-        self._data.append(entry)
+        # Append new entry to history and roll it up in the zoom levels, the
+        # graph views the history of the current level in place
+        self._history.append(overview)
 
-        # Trim the buffer to MAX_ENTRIES and update data
-        del self._data[0]
-        self._data_count += 1
+        if timestamp is None:
+            timestamp = time()
+        for rollup in self._rollups.values():
+            rollup.append(overview, timestamp)
 
-        self.graph.set_data(self._data, self._maxvalue)
+        self.graph.refresh()
+        return True
 
 
 __all__ = [
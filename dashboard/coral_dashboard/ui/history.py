@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+
+"""
+Module implementing the history buffers used by the data visualization
+widgets.
+"""
+
+from array import array
+from logging import getLogger as get_logger
+
+
+log = get_logger(__name__)
+
+
+class RingBuffer:
+    """
+    Fixed capacity ring buffer of numbers backed by a preallocated array.
+
+    Appending is O(1) and doesn't allocate. The buffer always holds
+    ``capacity`` entries, initially filled with zeros, ordered from the oldest
+    to the newest.
+
+    :param int capacity: Maximum number of entries to hold.
+    :param str typecode: Type code of the backing :py:class:`array.array`.
+    """
+
+    def __init__(self, capacity, typecode='d'):
+        assert capacity > 0
+
+        self._capacity = capacity
+        self._data = array(typecode, [0]) * capacity
+
+        # Position where the next entry will be written, which is also the
+        # position of the oldest entry
+        self._head = 0
+
+        # Total number of entries appended since creation
+        self._count = 0
+
+    @property
+    def capacity(self):
+        """
+        Maximum number of entries in the buffer.
+        """
+        return self._capacity
+
+    @property
+    def count(self):
+        """
+        Total number of entries appended since the buffer was created.
+        """
+        return self._count
+
+    def __len__(self):
+        return self._capacity
+
+    def __getitem__(self, index):
+        """
+        Get an entry, where 0 is the oldest and -1 is the newest.
+        """
+        if index < 0:
+            index += self._capacity
+        if not 0 <= index < self._capacity:
+            raise IndexError('RingBuffer index out of range')
+
+        index += self._head
+        if index >= self._capacity:
+            index -= self._capacity
+        return self._data[index]
+
+    def __iter__(self):
+        data = self._data
+        head = self._head
+        yield from data[head:]
+        yield from data[:head]
+
+    def tail(self, count):
+        """
+        Get a copy of the newest entries, from the oldest to the newest.
+
+        Copying is done with array slicing, without iterating the entries.
+
+        :param int count: Number of entries, at most the capacity.
+
+        :return: The newest ``count`` entries.
+        :rtype: :py:class:`array.array`
+        """
+        assert 0 <= count <= self._capacity
+
+        data = self._data
+        head = self._head
+        start = head - count
+
+        if start >= 0:
+            return data[start:head]
+        return data[start:] + data[:head]
+
+    def append(self, value):
+        """
+        Append a new entry, overwriting the oldest one.
+
+        :param value: Entry to append.
+        """
+        head = self._head
+        self._data[head] = value
+
+        head += 1
+        self._head = 0 if head == self._capacity else head
+        self._count += 1
+
+    def replace(self, value):
+        """
+        Replace the newest entry.
+
+        :param value: Entry to write in place of the newest one.
+        """
+        self._data[self._head - 1] = value
+
+
+class Rollup:
+    """
+    Rolled-up history of a series of samples: the minimum, maximum and
+    average of the samples in consecutive periods of time.
+
+    Each period is a single entry of the ``minimum``, ``maximum`` and
+    ``average`` ring buffers. The entry of the current period is updated in
+    place with each sample, so appending is O(1) and the newest entry is
+    always up to date. Periods without samples are skipped.
+
+    :param float period: Duration of each period in seconds.
+    :param int capacity: Maximum number of periods to hold.
+    """
+
+    def __init__(self, period, capacity):
+        assert period > 0
+
+        self.period = period
+        self.minimum = RingBuffer(capacity)
+        self.maximum = RingBuffer(capacity)
+        self.average = RingBuffer(capacity)
+
+        # Aggregates of the current period
+        self._current = None
+        self._sum = 0.0
+        self._samples = 0
+        self._min = 0.0
+        self._max = 0.0
+
+    def append(self, value, timestamp):
+        """
+        Add a sample.
+
+        Samples older than the current period are accounted in the current
+        period.
+
+        :param float value: Value of the sample.
+        :param float timestamp: Time of the sample in seconds since the epoch.
+        """
+        current = timestamp // self.period
+
+        if self._current is None or current > self._current:
+            self._current = current
+            self._sum = value
+            self._samples = 1
+            self._min = value
+            self._max = value
+
+            self.minimum.append(value)
+            self.maximum.append(value)
+            self.average.append(value)
+            return
+
+        self._sum += value
+        self._samples += 1
+
+        if value < self._min:
+            self._min = value
+            self.minimum.replace(value)
+        elif value > self._max:
+            self._max = value
+            self.maximum.replace(value)
+
+        self.average.replace(self._sum / self._samples)
+
+
+__all__ = [
+    'Rollup',
+    'RingBuffer',
+]
@@ -19,6 +19,8 @@
 UI manager and builder.
 """
 
+from math import ceil, sqrt
+from operator import itemgetter
 from collections import OrderedDict
 from logging import getLogger as get_logger
 
@@ -33,6 +35,7 @@ from urwid import (
 
 from .bar import Bar
 from .graph import Graph
+from .sparkline import Sparkline
 from .. import __version__
 
 
@@ -94,13 +97,58 @@ class MessageShower(PopUpLauncher):
         }
 
 
+class Source:
+    """
+    Namespace of the widgets of an agent pushing to the dashboard.
+
+    :param str name: Identifier of the source.
+    """
+
+    STATUS_WAITING = 'WAITING'
+
+    def __init__(self, name):
+        self.name = name
+        self.tree = OrderedDict()
+        self.status = self.STATUS_WAITING
+
+        # Descriptors the source was built with and the row of each one
+        self.descriptors = []
+        self.rows = []
+
+        self.body = WidgetPlaceholder(Filler(
+            Text('Waiting for configuration ...', align='center'),
+        ))
+        self.box = LineBox(self.body, title=self._title())
+
+    def _title(self):
+        return '{} [{}]'.format(self.name, self.status)
+
+    def set_status(self, status):
+        """
+        Set the heartbeat status shown in the title of the source.
+
+        :param str status: Heartbeat status.
+
+        :return: True if the status changed.
+        :rtype: bool
+        """
+        if status == self.status:
+            return False
+
+        self.status = status
+        self.box.set_title(self._title())
+        return True
+
+
 class UIManager:
 
     SUPPORTED_WIDGETS = {
         'graph': Graph,
         'bar': Bar,
+        'sparkline': Sparkline,
     }
 
+    DEFAULT_SOURCE = 'default'
     DEFAULT_TITLE = 'Coral Dashboard - {version}'
     DEFAULT_MESSAGE_WIDTH = 0.5
     DEFAULT_MESSAGE_HEIGHT = 0.5
@@ -115,10 +163,8 @@ class UIManager:
                 ),
             ),
         ]))
-        self._wrapper = LineBox(
-            self._body,
-            title=self.DEFAULT_TITLE.format(version=__version__),
-        )
+        self._title = self.DEFAULT_TITLE.format(version=__version__)
+        self._wrapper = LineBox(self._body, title=self._title)
 
         self.palette = ()
         self.topmost = MessageShower(
@@ -126,20 +172,134 @@ class UIManager:
             width=self.DEFAULT_MESSAGE_WIDTH,
             height=self.DEFAULT_MESSAGE_HEIGHT,
         )
-        self.tree = OrderedDict()
 
-    def build(self, widgets, title):
+        # Sources in order of appearance, and index of all their widgets by
+        # (source, identifier)
+        self.sources = OrderedDict()
+        self.widgets = {}
+
+        # Zoom level of the graphs set with :meth:`cycle_zoom`
+        self.zoom = None
+
+        # Number of pushed values for unknown widgets
+        self.unknown = 0
+
+        # Last value pushed to each widget, by (source, identifier)
+        self.values = {}
+
+        # Widgets changed by the pushes since the last draw, by (source,
+        # identifier), or None for the title. Widgets that didn't change keep
+        # their cached canvases, so only the damaged ones are rendered again.
+        self.damaged = set()
+
+    def source(self, name):
+        """
+        Get a source by name, creating it if it doesn't exist.
+
+        :param str name: Identifier of the source.
+
+        :return: The source.
+        :rtype: :class:`Source`
+        """
+        source = self.sources.get(name)
+
+        if source is None:
+            source = self.sources[name] = Source(name)
+            self._layout()
+
+        return source
+
+    def _layout(self):
+        """
+        Layout the sources in a grid.
+
+        A dashboard with only the default source shows its widgets without
+        the source box, as there is nothing to tell apart.
+        """
+        sources = list(self.sources.values())
+
+        if len(sources) == 1 and sources[0].name == self.DEFAULT_SOURCE:
+            self._body.original_widget = sources[0].body
+            return
+
+        width = ceil(sqrt(len(sources)))
+        self._body.original_widget = Pile([
+            Columns(
+                [source.box for source in sources[index:index + width]],
+                dividechars=1,
+            )
+            for index in range(0, len(sources), width)
+        ])
+
+    def set_status(self, name, status):
+        """
+        Set the heartbeat status of a source.
+
+        :param str name: Identifier of the source.
+        :param str status: Heartbeat status.
+
+        :return: True if the status changed, False if it didn't or the source
+         isn't configured.
+        :rtype: bool
+        """
+        namespace = self.sources.get(name)
+        if namespace is None:
+            return False
+        return namespace.set_status(status)
+
+    def build(self, widgets, title, source=DEFAULT_SOURCE):
+        """
+        Build the widgets of a source, or update them if already built.
+
+        The descriptors are compared with the ones the source was built with.
+        Rows with the same descriptor are kept as they are, widgets with the
+        same identifier and type are kept, with their history, and
+        reconfigured in place, and the layout of the source is only replaced
+        if any row changed.
+
+        :param list widgets: Widgets descriptors.
+        :param str title: Title of the dashboard.
+        :param str source: Identifier of the source of the widgets.
+
+        :return: A dictionary with the ``tree`` of widgets identifiers.
+        :rtype: dict
+        """
+        namespace = self.source(source)
+        previous = namespace.tree
 
         rows = []
         tree = OrderedDict()
+        changed = len(widgets) != len(namespace.rows)
 
         def _instance_and_register(widget, identifier, **kwargs):
             widgetclass = self.SUPPORTED_WIDGETS[widget]
-            instance = widgetclass(identifier, **kwargs)
+            instance = previous.get(identifier)
+
+            # Reuse the widget, and its history, if only its options changed
+            if type(instance) is not widgetclass or \
+                    not instance.reconfigure(**kwargs):
+
+                # New graphs start at the zoom level set with cycle_zoom,
+                # unless their descriptor sets one
+                if issubclass(widgetclass, Graph) and self.zoom is not None:
+                    kwargs.setdefault('zoom', self.zoom)
+
+                instance = widgetclass(identifier, **kwargs)
+
             tree[identifier] = instance
             return instance
 
-        for descriptor in widgets:
+        for index, descriptor in enumerate(widgets):
+
+            # Descriptor unchanged, keep its row and widgets
+            if index < len(namespace.descriptors) and \
+                    namespace.descriptors[index] == descriptor:
+                for identifier in self._identifiers(descriptor):
+                    tree[identifier] = previous[identifier]
+                rows.append(namespace.rows[index])
+                continue
+
+            changed = True
 
             # Descriptor for an instance of a Graph or a Bar
             if type(descriptor) is dict:
@@ -185,41 +345,230 @@ class UIManager:
             rows.append(widget)
 
         # Set new screen
-        if title is None:
-            title = self.DEFAULT_TITLE
+        self._set_title(title)
+
+        if changed:
+            namespace.body.original_widget = Pile(rows)
 
-        self._wrapper.set_title(title.format(version=__version__))
-        self._body.original_widget = Pile(rows)
+        for identifier, instance in previous.items():
+            if tree.get(identifier) is not instance:
+                self.values.pop((source, identifier), None)
+            if identifier not in tree:
+                del self.widgets[(source, identifier)]
 
-        self.tree.clear()
-        self.tree.update(tree)
+        for identifier, instance in tree.items():
+            self.widgets[(source, identifier)] = instance
+
+        namespace.tree = tree
+        namespace.descriptors = list(widgets)
+        namespace.rows = rows
 
         return {
             'tree': list(tree)
         }
 
-    def push(self, data, title):
-
+    @staticmethod
+    def _identifiers(descriptor):
+        """
+        Identifiers of the widgets of a descriptor.
+        """
+        if type(descriptor) is dict:
+            return [descriptor['identifier']]
+        if type(descriptor) is list:
+            return [column['identifier'] for column in descriptor]
+        return []
+
+    @staticmethod
+    def _check(key, value):
+        """
+        Check that a value can be pushed to a widget, so a push is checked
+        entirely before any widget changes.
+
+        :raise RuntimeError: If the value has neither the overview nor the
+         value and total.
+        """
+        if value.get('overview') is None and (
+            value.get('value') is None or value.get('total') is None
+        ):
+            raise RuntimeError(
+                'value and total of {} must be passed when pushing data '
+                'without the overview'.format(key)
+            )
+
+    def push(
+        self, data, title, source=DEFAULT_SOURCE, delta=False, timestamp=None,
+    ):
+        """
+        Push data to the widgets of a source.
+
+        Values equal to the last one pushed to a widget without history, like
+        a bar, don't reach the widget. Graphs always get the value, as it
+        advances their history.
+
+        All the values are checked before pushing any, so a push that fails
+        doesn't change any widget.
+
+        :param dict data: Values of the widgets, by identifier.
+        :param str title: Title of the dashboard.
+        :param str source: Identifier of the source of the data.
+        :param bool delta: If the data only has the values that changed. The
+         graphs of the source missing from the data are advanced with their
+         last value.
+        :param float timestamp: Time of the data in seconds since the epoch,
+         now if not given.
+
+        :return: The list of widgets identifiers pushed.
+        :rtype: list
+
+        :raise RuntimeError: If a value can't be pushed to its widget.
+        """
         pushed = []
+        widgets = self.widgets
+        values = self.values
+
+        for key, value in data.items():
+            if (source, key) in widgets:
+                self._check(key, value)
 
         for key, value in data.items():
-            if key not in self.tree:
+            widget = widgets.get((source, key))
+
+            if widget is None:
                 log.warning(
-                    'Unknown UI field {} got value {}'.format(key, value)
+                    'Unknown UI field %s of source %s got value %s',
+                    key, source, value,
                 )
+                self.unknown += 1
                 continue
 
-            self.tree[key].push(**value)
             pushed.append(key)
 
-        if title is None:
-            title = self.DEFAULT_TITLE
+            if isinstance(widget, Graph):
+                values[(source, key)] = value
+                widget.push(timestamp=timestamp, **value)
+                self.damaged.add((source, key))
+                continue
 
-        self._wrapper.set_title(title.format(version=__version__))
+            if values.get((source, key)) == value:
+                continue
+
+            values[(source, key)] = value
+            if widget.push(**value):
+                self.damaged.add((source, key))
+
+        if delta and source in self.sources:
+            for key, widget in self.sources[source].tree.items():
+                if key in data or not isinstance(widget, Graph):
+                    continue
+
+                value = values.get((source, key))
+                if value is None:
+                    continue
+
+                widget.push(timestamp=timestamp, **value)
+                self.damaged.add((source, key))
+                pushed.append(key)
+
+        self._set_title(title)
 
         return pushed
 
+    def push_batch(self, frames, title, source=DEFAULT_SOURCE):
+        """
+        Push several timestamped frames of data at once.
+
+        Frames are applied in timestamp order. Graphs get every sample in
+        their history while the other widgets only get the latest value. As
+        with :meth:`push`, all the frames are checked before applying any.
+
+        :param list frames: List of frames dictionaries with a ``timestamp``
+         and the ``data`` as expected by :meth:`push`.
+        :param str title: Title of the dashboard.
+        :param str source: Identifier of the source of the frames.
+
+        :return: The list of widgets identifiers pushed.
+        :rtype: list
+
+        :raise RuntimeError: If a value can't be pushed to its widget.
+        """
+        pushed = OrderedDict()
+        latest = {}
+        unknown = set()
+        widgets = self.widgets
+
+        for frame in frames:
+            for key, value in frame['data'].items():
+                if (source, key) in widgets:
+                    self._check(key, value)
+
+        for frame in sorted(frames, key=itemgetter('timestamp')):
+            timestamp = frame['timestamp']
+
+            for key, value in frame['data'].items():
+                widget = widgets.get((source, key))
+
+                if widget is None:
+                    unknown.add(key)
+                    self.unknown += 1
+                    continue
+
+                if isinstance(widget, Graph):
+                    widget.push(timestamp=timestamp, **value)
+                    self.damaged.add((source, key))
+
+                latest[key] = (widget, value)
+                pushed[key] = True
+
+        for key in sorted(unknown):
+            log.warning('Unknown UI field {} of source {} in batch'.format(
+                key, source,
+            ))
+
+        for key, (widget, value) in latest.items():
+            if self.values.get((source, key)) == value:
+                continue
+
+            self.values[(source, key)] = value
+            if not isinstance(widget, Graph) and widget.push(**value):
+                self.damaged.add((source, key))
+
+        self._set_title(title)
+
+        return list(pushed)
+
+    def cycle_zoom(self):
+        """
+        Switch all the graphs to the next zoom level.
+
+        :return: The new zoom level.
+        :rtype: str
+        """
+        levels = list(Graph.ZOOMS)
+
+        if self.zoom is None:
+            self.zoom = levels[1]
+        else:
+            self.zoom = levels[(levels.index(self.zoom) + 1) % len(levels)]
+
+        for widget in self.widgets.values():
+            if isinstance(widget, Graph):
+                widget.set_zoom(self.zoom)
+
+        return self.zoom
+
+    def _set_title(self, title):
+        if title is None:
+            title = self.DEFAULT_TITLE
+
+        # Setting the title invalidates the whole frame, skip it if unchanged
+        title = title.format(version=__version__)
+        if title != self._title:
+            self._title = title
+            self._wrapper.set_title(title)
+            self.damaged.add(None)
+
 
 __all__ = [
+    'Source',
     'UIManager',
 ]
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""
+Module implementing the screens the UI can be drawn to.
+"""
+
+from logging import getLogger as get_logger
+
+from urwid import BaseScreen
+
+
+log = get_logger(__name__)
+
+
+class HeadlessScreen(BaseScreen):
+    """
+    In-memory screen of a fixed size, to run the dashboard without a
+    terminal.
+
+    The screen has no input, and keeps the last canvas drawn so its contents
+    can be inspected.
+
+    :param tuple size: Number of columns and rows of the screen.
+    """
+
+    DEFAULT_SIZE = (80, 48)
+
+    def __init__(self, size=DEFAULT_SIZE):
+        super().__init__()
+        self._size = tuple(size)
+
+        self.canvas = None
+        self.frames = 0
+
+    def get_cols_rows(self):
+        return self._size
+
+    def draw_screen(self, size, canvas):
+        self.canvas = canvas
+        self.frames += 1
+
+    def hook_event_loop(self, event_loop, callback):
+        """
+        There is no input to watch in the event loop.
+        """
+
+    def unhook_event_loop(self, event_loop):
+        pass
+
+    def get_input_descriptors(self):
+        return []
+
+    def contents(self):
+        """
+        Text of the last canvas drawn.
+
+        :return: List with the text of each row of the screen.
+        :rtype: list
+        """
+        if self.canvas is None:
+            return []
+        return [row.decode('utf-8') for row in self.canvas.text]
+
+
+__all__ = [
+    'HeadlessScreen',
+]
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018 KuraLabs S.R.L
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Module implementing the high density sparkline graph widget.
+"""
+
+from logging import getLogger as get_logger
+
+from .graph import Graph, Raster
+
+
+log = get_logger(__name__)
+
+
+class BrailleRaster(Raster):
+    """
+    Raster of braille patterns.
+
+    Each cell holds two samples, side by side, of four dots of height each,
+    so a graph shows twice the samples of its width at four times the
+    resolution of its height.
+
+    Each sample is a precomputed column of bytes, one per row, with the bits
+    of its dots in the left or the right half of the cells. Columns are
+    transposed into rows with zip, and the halves of each row are merged at
+    once by OR-ing them as big integers. The bytes of each row are then
+    translated into braille patterns with :py:meth:`str.translate`.
+    """
+
+    SAMPLES = 2
+    LEVELS = 4
+
+    ATTRIBUTES = {'s': 'bar1 smooth'}
+
+    # Bits of the braille dots filled from the bottom of a cell, by number of
+    # dots, for the left and the right samples of the cell
+    LEFT = (0x00, 0x40, 0x44, 0x46, 0x47)
+    RIGHT = (0x00, 0x80, 0xA0, 0xB0, 0xB8)
+
+    # Braille pattern of each combination of dots, empty cells are blank
+    BRAILLE = dict(
+        [(0, ' ')] + [(bits, chr(0x2800 + bits)) for bits in range(1, 256)]
+    )
+
+    @classmethod
+    def _build_columns(cls, rows):
+        """
+        Columns of the left samples and of the right samples, by height in
+        dots.
+        """
+        return tuple(
+            [
+                bytes(
+                    bits[min(max(height - (rows - 1 - row) * 4, 0), 4)]
+                    for row in range(rows)
+                ) for height in range(rows * 4 + 1)
+            ] for bits in (cls.LEFT, cls.RIGHT)
+        )
+
+    def _rasterize(self, maxcol, maxrow, heights):
+        heights.extend([0] * (maxcol * 2 - len(heights)))
+
+        left, right = self.columns(maxrow)
+        lefts = zip(*map(left.__getitem__, heights[0::2]))
+        rights = zip(*map(right.__getitem__, heights[1::2]))
+
+        braille = self.BRAILLE
+        text = [
+            (
+                int.from_bytes(bytes(lrow), 'big') |
+                int.from_bytes(bytes(rrow), 'big')
+            ).to_bytes(maxcol, 'big').decode('latin-1').translate(
+                braille
+            ).encode('utf-8')
+            for lrow, rrow in zip(lefts, rights)
+        ]
+
+        attribute = self._attributes['s']
+        return (
+            text,
+            [[(attribute, len(row))] for row in text],
+            [[(None, len(row))] for row in text],
+        )
+
+
+class Sparkline(Graph):
+    """
+    Graph showing its history with braille patterns, two samples per column
+    and four levels per row.
+
+    It behaves as a :class:`coral_dashboard.ui.graph.Graph` in all other
+    aspects, and uses its ``bar1 smooth`` attribute for the dots.
+    """
+
+    MAX_ENTRIES = 400
+
+    RASTER = BrailleRaster
+
+
+__all__ = [
+    'Sparkline',
+]
@@ -6,9 +6,14 @@ from contextlib import closing
 from subprocess import Popen, PIPE
 from logging import getLogger as get_logger
 from socket import socket, AF_INET, SOCK_STREAM
+from asyncio import new_event_loop, set_event_loop
 
 from pytest import fixture
 from pprintpp import pformat
+from aiohttp.test_utils import TestServer, TestClient
+
+from coral_dashboard.dashboard import Dashboard as WebDashboard
+from coral_dashboard.ui.screen import HeadlessScreen
 
 
 log = get_logger(__name__)
@@ -189,3 +194,117 @@ def dashboard():
     # Wait until terminal is closed
     dashboard.wait_done()
     dashboard.show_logs()
+
+
+def _run(coroutine):
+    loop = new_event_loop()
+    set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine())
+    finally:
+        set_event_loop(None)
+        loop.close()
+
+
+@fixture
+def run():
+    """
+    Run a coroutine function to completion in a new event loop.
+    """
+    return _run
+
+
+class HeadlessDashboard:
+    """
+    Asynchronous context manager serving a dashboard without a terminal to a
+    test client.
+
+    :param kwargs: Arguments of the dashboard, its screen is headless by
+     default.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('screen', HeadlessScreen())
+        self.dashboard = WebDashboard(0, **kwargs)
+        self.client = TestClient(TestServer(self.dashboard.webapp))
+
+    async def __aenter__(self):
+        await self.client.start_server()
+        return self.dashboard, self.client
+
+    async def __aexit__(self, *exc_info):
+        self.dashboard.heartbeat.cancel()
+        self.dashboard.render.cancel()
+        await self.client.close()
+
+
+@fixture
+def headless():
+    """
+    Serve a headless dashboard to a test client, in a coroutine.
+    """
+    return HeadlessDashboard
+
+
+def _overview(value):
+    return {'overview': value, 'value': None, 'total': None}
+
+
+@fixture
+def overview():
+    """
+    Value of a widget given by its overview.
+    """
+    return _overview
+
+
+class ManualTimer:
+    """
+    Timer of a :class:`ManualLoop`.
+    """
+
+    def __init__(self, loop, when, callback, args):
+        self.loop = loop
+        self.when = when
+        self.callback = callback
+        self.args = args
+
+    def cancel(self):
+        if self in self.loop.timers:
+            self.loop.timers.remove(self)
+
+
+class ManualLoop:
+    """
+    Event loop with a manually advanced clock.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.timers = []
+
+    def time(self):
+        return self.now
+
+    def call_at(self, when, callback, *args):
+        timer = ManualTimer(self, when, callback, args)
+        self.timers.append(timer)
+        return timer
+
+    def advance(self, seconds):
+        self.now += seconds
+        while True:
+            due = [timer for timer in self.timers if timer.when <= self.now]
+            if not due:
+                break
+            for timer in due:
+                self.timers.remove(timer)
+                timer.callback(*timer.args)
+
+
+@fixture
+def manual_loop():
+    """
+    Event loop with a manually advanced clock.
+    """
+    return ManualLoop()
@@ -0,0 +1,125 @@
+from logging import getLogger as get_logger
+
+from urwid import ProgressBar
+
+from coral_dashboard.ui.bar import Bar
+
+
+log = get_logger(__name__)
+
+
+class BlankProgressBar(ProgressBar):
+    def get_text(self):
+        return ''
+
+
+def _segments(canvas):
+    return [
+        [(attribute, text) for attribute, _, text in row]
+        for row in canvas.content()
+    ]
+
+
+def test_bar():
+
+    bar = Bar('m', 'Memory', 'GB')
+    assert bar.rows((16, )) == 4
+
+    # A partial eighth cell is drawn over the blank rows, but not under the
+    # percentage
+    assert bar.push(overview=40.0)
+    canvas = bar.render((16, ))
+    assert canvas.text == [
+        b'Memory (GB 40.0%',
+        '      ▍         '.encode('utf-8'),
+        b'      40 %      ',
+        '      ▍         '.encode('utf-8'),
+    ]
+    assert canvas._attr == [
+        [('m title', 11), ('m label', 5)],
+        [('m complete', 6), ('m smooth', 3), ('m normal', 9)],
+        [('m complete', 6), ('m normal', 10)],
+        [('m complete', 6), ('m smooth', 3), ('m normal', 9)],
+    ]
+
+    assert not bar.push(overview=40.0)
+
+    # Completions drawn the same as the last render don't change the bar
+    assert not bar.push(overview=40.01)
+    assert bar._completion == 40.01
+    assert bar.push(overview=40.2)
+    canvas = bar.render((16, ))
+    assert canvas.text[0] == b'Memory (GB 40.2%'
+    assert not bar.push(overview=40.24)
+
+    assert bar.push(overview=0.0)
+    canvas = bar.render((16, ))
+    assert canvas.text[1:3] == [b' ' * 16, b'       0 %      ']
+    assert canvas._attr[0] == [('m title', 12), ('m label', 4)]
+    assert canvas._attr[1:] == [[('m normal', 16)]] * 3
+
+    assert bar.push(overview=100.0)
+    canvas = bar.render((16, ))
+    assert canvas.text == [
+        b'Memory (G 100.0%', b' ' * 16, b'      100 %     ', b' ' * 16,
+    ]
+    assert canvas._attr[1:] == [[('m complete', 16)]] * 3
+
+    # Completions are clamped, and the title clipped to fit the label
+    assert bar.push(value=5, total=4)
+    canvas = bar.render((16, ))
+    assert canvas.text[:3] == [
+        b'Mem 125.0% [5/4]', b' ' * 16, b'      100 %     ',
+    ]
+    assert canvas._attr[0] == [('m title', 4), ('m label', 12)]
+    assert canvas._attr[1:] == [[('m complete', 16)]] * 3
+
+    assert bar.push(overview=-5.0)
+    canvas = bar.render((16, ))
+    assert canvas.text[2] == b'       0 %      '
+    assert canvas._attr[1:] == [[('m normal', 16)]] * 3
+
+    canvas = bar.render((10, ))
+    assert canvas.text[0] == b'Memo -5.0%'
+    canvas = bar.render((4, ))
+    assert canvas.text[0] == b'-5.0'
+    assert canvas._attr[0] == [('m label', 4)]
+
+    # A zero total is drawn empty
+    assert bar.push(value=5, total=0)
+    canvas = bar.render((16, ))
+    assert canvas.text[:3] == [
+        b'Memor 0.0% [5/0]', b' ' * 16, b'       0 %      ',
+    ]
+
+    # Not a number is drawn empty, infinities are clamped
+    assert bar.push(overview=float('nan'))
+    canvas = bar.render((16, ))
+    assert canvas.text[:3] == [
+        b'Memory (GB) nan%', b' ' * 16, b'       0 %      ',
+    ]
+    assert bar.push(overview=float('inf'))
+    canvas = bar.render((16, ))
+    assert canvas.text[2] == b'      100 %     '
+    assert canvas._attr[1:] == [[('m complete', 16)]] * 3
+
+
+def test_bar_progress_bar():
+
+    # Rows are drawn as urwid's progress bars
+    bar = Bar('m', 'Memory', 'GB', rows=2)
+    for completion in [0.0, 0.5, 12.5, 33.3, 40.0, 66.7, 99.9, 100.0]:
+        bar.push(overview=completion)
+
+        for maxcol in range(4, 21):
+            rows = _segments(bar.render((maxcol, )))
+            labeled = ProgressBar(
+                'm normal', 'm complete', completion, 100, 'm smooth',
+            )
+            blank = BlankProgressBar(
+                'm normal', 'm complete', completion, 100, 'm smooth',
+            )
+            assert rows[1:] == (
+                _segments(labeled.render((maxcol, ))) +
+                _segments(blank.render((maxcol, )))
+            ), (completion, maxcol)
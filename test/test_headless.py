@@ -0,0 +1,73 @@
+from logging import getLogger as get_logger
+from asyncio import sleep
+
+from coral_agent.palette import parse_palette
+from coral_agent.coral import CORAL_PALETTE, CORAL_WIDGETS
+from coral_dashboard.ui.screen import HeadlessScreen
+
+
+log = get_logger(__name__)
+
+
+def test_headless(run, headless):
+
+    screen = HeadlessScreen((100, 60))
+
+    async def scenario():
+        async with headless(fps=50, screen=screen) as (dashboard, client):
+            response = await client.post('/api/config', json={
+                'palette': parse_palette(CORAL_PALETTE),
+                'widgets': CORAL_WIDGETS,
+                'title': 'Headless',
+            })
+            assert response.status == 200
+
+            response = await client.post('/api/push', json={
+                'data': {
+                    'memory': {'overview': None, 'value': 2, 'total': 4},
+                },
+            })
+            assert response.status == 200
+            assert (await response.json())['pushed'] == ['memory']
+
+            await sleep(0.1)
+
+    run(scenario)
+
+    contents = screen.contents()
+    log.info('Screen:\n{}'.format('\n'.join(contents)))
+
+    assert screen.frames
+    assert len(contents) == 60
+    assert 'Coral Dashboard' in contents[0]
+    assert any('50.0% [2/4]' in row for row in contents)
+
+
+def test_unconfigured_source(run, headless):
+
+    async def scenario():
+        async with headless() as (dashboard, client):
+            # Pushes from unconfigured sources don't create them
+            for source in ['host1', 'bogus-123']:
+                response = await client.post('/api/push', json={
+                    'source': source,
+                    'data': {
+                        'memory': {'overview': None, 'value': 2, 'total': 4},
+                    },
+                })
+                assert response.status == 200
+                assert (await response.json())['pushed'] == []
+
+            assert list(dashboard.ui.sources) == []
+
+            # Sources configured later show they are alive
+            response = await client.post('/api/config', json={
+                'source': 'host1',
+                'palette': parse_palette(CORAL_PALETTE),
+                'widgets': CORAL_WIDGETS,
+            })
+            assert response.status == 200
+            assert list(dashboard.ui.sources) == ['host1']
+            assert dashboard.ui.sources['host1'].status == 'OK'
+
+    run(scenario)
@@ -0,0 +1,44 @@
+from logging import getLogger as get_logger
+
+from coral_dashboard.heartbeat import Heartbeat
+
+
+log = get_logger(__name__)
+
+
+def test_heartbeat(manual_loop):
+
+    loop = manual_loop
+    events = []
+    heartbeat = Heartbeat(
+        10,
+        lambda source: events.append(('alive', source)),
+        lambda source: events.append(('lost', source)),
+        loop=loop,
+    )
+
+    heartbeat.beat('host1')
+    heartbeat.beat('host2')
+    assert events == [('alive', 'host1'), ('alive', 'host2')]
+
+    # Beats don't arm more timers
+    for second in range(15):
+        loop.advance(1)
+        heartbeat.beat('host1')
+        heartbeat.beat('host1')
+    assert len(loop.timers) == 1
+    assert events[2:] == [('lost', 'host2')]
+    assert list(heartbeat.lost) == ['host2']
+    assert heartbeat.elapsed('host2') == 15
+
+    # Lost sources don't wake up the loop
+    loop.advance(10)
+    assert events[3:] == [('lost', 'host1')]
+    assert not loop.timers
+
+    heartbeat.beat('host2')
+    assert events[4:] == [('alive', 'host2')]
+    assert list(heartbeat.lost) == ['host1']
+
+    heartbeat.cancel()
+    assert not loop.timers
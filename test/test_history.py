@@ -0,0 +1,85 @@
+from logging import getLogger as get_logger
+
+from coral_dashboard.ui.graph import BarRaster
+from coral_dashboard.ui.history import RingBuffer, Rollup
+
+
+log = get_logger(__name__)
+
+
+def test_ring_buffer():
+
+    history = RingBuffer(4)
+    assert list(history) == [0, 0, 0, 0]
+
+    for value in range(1, 7):
+        history.append(value)
+
+    assert history.count == 6
+    assert list(history) == [3, 4, 5, 6]
+    assert history[0] == 3
+    assert history[-1] == 6
+
+
+def test_ring_buffer_tail():
+
+    history = RingBuffer(4)
+    for value in range(1, 6):
+        history.append(value)
+
+    assert list(history.tail(0)) == []
+    assert list(history.tail(2)) == [4, 5]
+    assert list(history.tail(4)) == [2, 3, 4, 5]
+
+    # Tails are copies
+    tail = history.tail(3)
+    history.append(6)
+    assert list(tail) == [3, 4, 5]
+    assert list(history.tail(3)) == [4, 5, 6]
+
+
+def test_bar_raster():
+
+    history = RingBuffer(4)
+    for value in [100, 50, 25, 120, -10]:
+        history.append(value)
+
+    raster = BarRaster('g', history, 100.0)
+    canvas = raster.render((6, 2))
+
+    # Samples alternate between bar1 and bar2 from the first one pushed, are
+    # clipped to the graph and the columns left are background
+    assert canvas.text == [b'      ', ' \u2584    '.encode('utf-8')]
+    assert canvas._attr == [
+        [('g background', 2), ('g bar1', 1), ('g background', 3)],
+        [
+            ('g bar1', 1), ('g bar2 smooth', 3), ('g bar1', 1),
+            ('g background', 3),
+        ],
+    ]
+
+    # Samples keep their bar as they scroll
+    history.append(0)
+    raster.refresh()
+    canvas = raster.render((6, 2))
+    assert canvas._attr[0] == [
+        ('g background', 1), ('g bar1', 1), ('g background', 4),
+    ]
+
+
+def test_rollup():
+
+    rollup = Rollup(60, 3)
+
+    for timestamp, value in [(0, 4), (30, 2), (59, 6), (60, 1), (300, 5)]:
+        rollup.append(value, timestamp)
+
+    assert list(rollup.minimum) == [2, 1, 5]
+    assert list(rollup.maximum) == [6, 1, 5]
+    assert list(rollup.average) == [4, 1, 5]
+
+    # Late samples are accounted in the current period
+    rollup.append(3, 200)
+    assert rollup.average[-1] == 4
+    assert rollup.minimum[-1] == 3
+    assert rollup.maximum.count == 3
@@ -0,0 +1,65 @@
+from logging import getLogger as get_logger
+
+from pytest import raises
+
+from coral_agent.coral import CORAL_WIDGETS
+from coral_agent.args import InvalidArgument, parse_args as parse_agent_args
+from coral_agent.loadgen import (
+    find_widgets, build_data, percentile, parse_args,
+)
+
+
+log = get_logger(__name__)
+
+
+def test_build_data():
+    descriptors = find_widgets(CORAL_WIDGETS + [[{
+        'widget': 'graph',
+        'identifier': 'custom',
+        'title': 'Custom',
+        'unit': 'ms',
+        'maxvalue': 5.0,
+    }]])
+    assert [descriptor['identifier'] for descriptor in descriptors] == [
+        'temp_coolant', 'temp_gpu', 'temp_cpu', 'pump', 'load_gpu',
+        'load_cpu', 'memory', 'network', 'disk_os', 'disk_apps', 'custom',
+    ]
+
+    data = build_data(descriptors)
+    assert set(data) == {
+        descriptor['identifier'] for descriptor in descriptors
+    }
+    assert 0.0 <= data['custom']['overview'] <= 5.0
+    assert data['pump']['overview'] is None
+    assert 0 <= data['pump']['value'] <= data['pump']['total']
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile([], 50) is None
+    assert percentile(values, 0) == 1
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([7.0], 95) == 7.0
+
+
+def test_parse_args():
+
+    args = parse_args(['--agents', '4', '--dashboard', 'http://host:5000'])
+    assert (args.agents, args.dashboard) == (4, 'http://host:5000')
+
+    # Both tools validate their arguments the same way
+    with raises(InvalidArgument) as error:
+        parse_args(['--duration', '0'])
+    assert str(error.value) == 'Invalid --duration 0.0, must be greater than 0'
+
+    with raises(InvalidArgument) as error:
+        parse_agent_args(['--spool-size', '-1'])
+    assert str(error.value) == (
+        'Invalid --spool-size -1, must be greater than 0'
+    )
+
+    with raises(InvalidArgument) as error:
+        parse_agent_args(['--pump-max', '0'])
+    assert str(error.value) == 'Invalid --pump-max 0, must be greater than 0'
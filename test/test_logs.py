@@ -0,0 +1,66 @@
+import logging
+from logging import getLogger as get_logger
+
+from coral_dashboard.logs import LazyFormat, BoundedQueueHandler
+
+
+log = get_logger(__name__)
+
+
+def _record(msg, *args):
+    return logging.makeLogRecord({
+        'name': 'test', 'levelno': logging.INFO, 'levelname': 'INFO',
+        'msg': msg, 'args': args,
+    })
+
+
+def _drain(handler):
+    records = []
+    while not handler.queue.empty():
+        records.append(handler.queue.get_nowait())
+    return records
+
+
+def test_dropped():
+
+    handler = BoundedQueueHandler(2)
+    for number in range(5):
+        handler.handle(_record('Record %d', number))
+    assert handler.dropped == 3
+
+    records = _drain(handler)
+    assert [record.getMessage() for record in records] == [
+        'Record 0', 'Record 1',
+    ]
+
+    # The number of dropped records is reported once there is room
+    handler.handle(_record('Record %d', 5))
+    records = _drain(handler)
+    assert [record.getMessage() for record in records] == [
+        'Dropped 3 log records, logging queue full', 'Record 5',
+    ]
+    assert records[0].levelno == logging.WARNING
+
+    handler.handle(_record('Record %d', 6))
+    assert [record.getMessage() for record in _drain(handler)] == [
+        'Record 6',
+    ]
+    assert handler.dropped == 3
+
+
+def test_prepare():
+
+    handler = BoundedQueueHandler(10)
+    payload = {'message': 'Hello'}
+
+    handler.handle(_record('Immutable %s %d', 'text', 1))
+    handler.handle(_record('Request %s', payload))
+    handler.handle(_record('Request %s', LazyFormat(repr, payload)))
+    payload.pop('message')
+
+    # Records with mutable arguments are formatted when enqueued
+    immutable, mutable, lazy = _drain(handler)
+    assert immutable.args == ('text', 1)
+    assert mutable.args is None
+    assert mutable.msg == "Request {'message': 'Hello'}"
+    assert lazy.getMessage() == "Request {'message': 'Hello'}"
@@ -0,0 +1,221 @@
+from logging import getLogger as get_logger
+
+from pytest import raises
+
+from coral_dashboard.ui.manager import UIManager
+
+
+log = get_logger(__name__)
+
+
+WIDGETS = [
+    'Title',
+    {
+        'widget': 'graph',
+        'identifier': 'temp',
+        'title': 'Temperature',
+        'unit': 'C',
+        'symbol': 'C',
+    },
+    {
+        'widget': 'bar',
+        'identifier': 'memory',
+        'title': 'Memory',
+        'unit': 'GB',
+    },
+]
+
+
+def test_sources(overview):
+
+    ui = UIManager()
+    assert ui.build(WIDGETS, None)['tree'] == ['temp', 'memory']
+    assert ui.build(WIDGETS, None, 'host1')['tree'] == ['temp', 'memory']
+
+    assert list(ui.sources) == ['default', 'host1']
+    assert len(ui.widgets) == 4
+    assert ui.widgets['default', 'temp'] is not ui.widgets['host1', 'temp']
+
+    # Pushes only reach the widgets of their source
+    assert ui.push({'temp': overview(40)}, None, 'host1') == ['temp']
+    assert ui.widgets['host1', 'temp']._history[-1] == 40
+    assert ui.widgets['default', 'temp']._history[-1] == 0
+
+    assert ui.push({'temp': overview(40)}, None, 'host2') == []
+    assert ui.unknown == 1
+    assert list(ui.sources) == ['default', 'host1']
+
+    # Rebuilding a source replaces only its own widgets
+    ui.build(WIDGETS[:2], None, 'host1')
+    assert sorted(ui.widgets) == [
+        ('default', 'memory'), ('default', 'temp'), ('host1', 'temp'),
+    ]
+
+    assert ui.set_status('host1', 'OK')
+    assert not ui.set_status('host1', 'OK')
+    assert not ui.set_status('host2', 'OK')
+    assert 'host2' not in ui.sources
+    assert ui.sources['host1'].box.title_widget.text == ' host1 [OK] '
+
+
+def test_incremental_build(overview):
+
+    ui = UIManager()
+    ui.build(WIDGETS, None)
+    source = ui.sources['default']
+    layout = source.body.original_widget
+    temp = ui.widgets['default', 'temp']
+    memory = ui.widgets['default', 'memory']
+
+    ui.push({'temp': overview(40)}, None)
+
+    # Same configuration, nothing is built again
+    ui.build([dict(widget) if type(widget) is dict else widget
+              for widget in WIDGETS], None)
+    assert source.body.original_widget is layout
+    assert ui.widgets['default', 'temp'] is temp
+    assert temp._history[-1] == 40
+
+    # Options changed, widgets are reconfigured in place
+    changed = [
+        'Title',
+        dict(WIDGETS[1], title='Coolant'),
+        dict(WIDGETS[2], rows=1),
+    ]
+    assert ui.build(changed, None)['tree'] == ['temp', 'memory']
+    assert source.body.original_widget is not layout
+    assert ui.widgets['default', 'temp'] is temp
+    assert temp.title.text == 'Coolant (C)'
+    assert temp.label.text == '40.0C'
+    assert temp._history[-1] == 40
+    assert ui.widgets['default', 'memory'] is memory
+
+    # The label shows the new symbol right away
+    ui.build(['Title', dict(changed[1], symbol='F'), changed[2]], None)
+    assert temp.label.text == '40.0F'
+    assert memory.rows((10,)) == 2
+
+    # Type changed, widget is built again
+    ui.build(['Title', dict(WIDGETS[1], widget='bar')], None)
+    assert ui.widgets['default', 'temp'] is not temp
+    assert ('default', 'memory') not in ui.widgets
+
+
+def test_zoom(overview):
+
+    ui = UIManager()
+    ui.build(WIDGETS, None)
+    temp = ui.widgets['default', 'temp']
+
+    ui.push_batch([
+        {'timestamp': 120 + second, 'data': {'temp': overview(second)}}
+        for second in range(10)
+    ], None)
+
+    assert ui.cycle_zoom() == '1m'
+    assert temp.title.text == 'Temperature (C) [1m]'
+    assert temp.graph.series[-1] == 4.5
+
+    assert ui.cycle_zoom() == '1h'
+    assert ui.cycle_zoom() == 'raw'
+    assert temp.title.text == 'Temperature (C)'
+    assert temp.graph.series[-1] == 9
+
+    # Reconfiguring a graph keeps its zoom level, unless set explicitly
+    assert ui.cycle_zoom() == '1m'
+    widgets = [dict(WIDGETS[1], title='Temp'), WIDGETS[2]]
+    ui.build(widgets, None)
+    assert ui.widgets['default', 'temp'] is temp
+    assert temp.zoom == '1m'
+    assert temp.title.text == 'Temp (C) [1m]'
+
+    ui.build([dict(widgets[0], zoom='1h'), WIDGETS[2]], None)
+    assert temp.zoom == '1h'
+
+    # New graphs start at the zoom level of the dashboard
+    ui.build(WIDGETS, None, 'host1')
+    assert ui.widgets['host1', 'temp'].zoom == '1m'
+    ui.build([dict(WIDGETS[1], zoom='raw')], None, 'host2')
+    assert ui.widgets['host2', 'temp'].zoom == 'raw'
+
+
+def test_damage(overview):
+
+    ui = UIManager()
+    ui.build(WIDGETS, 'Title')
+    ui.damaged.clear()
+
+    data = {'temp': overview(40.0), 'memory': overview(50.0)}
+    ui.push(data, 'Title')
+    assert ui.damaged == {('default', 'temp'), ('default', 'memory')}
+    ui.damaged.clear()
+
+    # Graphs always move, bars and the title only change with their value
+    ui.push(data, 'Title')
+    assert ui.damaged == {('default', 'temp')}
+    ui.damaged.clear()
+
+    ui.push({'memory': overview(50.0)}, 'Other')
+    assert ui.damaged == {None}
+    ui.damaged.clear()
+
+    ui.push_batch([
+        {'timestamp': 1.0, 'data': {'memory': overview(50.0)}},
+        {'timestamp': 2.0, 'data': {'memory': overview(60.0)}},
+    ], 'Other')
+    assert ui.damaged == {('default', 'memory')}
+
+
+def test_delta(overview):
+
+    ui = UIManager()
+    ui.build(WIDGETS, None)
+    temp = ui.widgets['default', 'temp']
+
+    assert ui.push(
+        {'temp': overview(40.0), 'memory': overview(50.0)}, None, delta=True,
+    ) == ['temp', 'memory']
+    ui.damaged.clear()
+
+    # Graphs missing from a delta push advance with their last value
+    assert ui.push({'memory': overview(60.0)}, None, delta=True) == [
+        'memory', 'temp',
+    ]
+    assert ui.damaged == {('default', 'temp'), ('default', 'memory')}
+    assert list(temp._history.tail(3)) == [0.0, 40.0, 40.0]
+    ui.damaged.clear()
+
+    # Unchanged bars are suppressed, but still reported as pushed
+    assert ui.push({'memory': overview(60.0)}, None) == ['memory']
+    assert not ui.damaged
+    assert list(temp._history.tail(3)) == [0.0, 40.0, 40.0]
+
+    # Rebuilt widgets forget their last value
+    ui.build(WIDGETS[:2], None)
+    assert ('default', 'memory') not in ui.values
+    assert ui.values[('default', 'temp')] == overview(40.0)
+
+
+def test_atomic_push(overview):
+
+    ui = UIManager()
+    ui.build(WIDGETS, None)
+    temp = ui.widgets['default', 'temp']
+    ui.push({'temp': overview(40.0), 'memory': overview(50.0)}, None)
+    ui.damaged.clear()
+
+    # A value without the overview nor the total fails the whole push
+    invalid = {'overview': None, 'value': 5, 'total': None}
+    with raises(RuntimeError):
+        ui.push({'temp': overview(60.0), 'memory': invalid}, None)
+
+    with raises(RuntimeError):
+        ui.push_batch([
+            {'timestamp': 1.0, 'data': {'temp': overview(60.0)}},
+            {'timestamp': 2.0, 'data': {'temp': invalid}},
+        ], None)
+
+    assert not ui.damaged
+    assert temp.count == 1
+    assert list(temp._history.tail(1)) == [40.0]
+    assert ui.values[('default', 'memory')] == overview(50.0)
@@ -0,0 +1,106 @@
+from logging import getLogger as get_logger
+
+from msgpack import packb
+
+
+log = get_logger(__name__)
+
+
+WIDGETS = [{
+    'widget': 'bar', 'identifier': 'memory', 'title': 'Memory', 'unit': 'GB',
+}]
+
+PUSH = {
+    'data': {'memory': {'overview': None, 'value': 1, 'total': 4}},
+}
+
+
+def test_media_type(run, headless):
+
+    async def scenario():
+        async with headless() as (dashboard, client):
+
+            async def post(body, content_type, endpoint='/api/push'):
+                response = await client.post(
+                    endpoint, data=body,
+                    headers={'Content-Type': content_type},
+                )
+                # Responses are always JSON
+                assert response.content_type == 'application/json'
+                return response.status, await response.json()
+
+            assert await post(
+                packb({'palette': [], 'widgets': WIDGETS}),
+                'application/msgpack', '/api/config',
+            ) == (200, {'tree': ['memory']})
+
+            # MessagePack requests are decoded, with both media types
+            for content_type in ['application/msgpack',
+                                 'application/x-msgpack']:
+                assert await post(packb(PUSH), content_type) == (
+                    200, {'pushed': ['memory']},
+                )
+
+            assert await post(
+                packb({'title': 'Title', 'data': PUSH['data']}),
+                'application/msgpack',
+            ) == (200, {'pushed': ['memory']})
+            assert dashboard.ui._title == 'Title'
+
+            # MessagePack binaries aren't strings
+            assert await post(
+                packb({'title': b'Title', 'data': PUSH['data']}),
+                'application/msgpack',
+            ) == (400, {'error': 'Bad Request'})
+
+            # Numbers that aren't finite are rejected
+            for number in [float('nan'), float('inf'), float('-inf')]:
+                sample = {'overview': number, 'value': None, 'total': None}
+                assert await post(
+                    packb({'data': {'memory': sample}}),
+                    'application/msgpack',
+                ) == (400, {'error': 'Bad Request'})
+                assert await post(
+                    packb({'frames': [
+                        {'timestamp': 1.0, 'data': {'memory': sample}},
+                    ]}),
+                    'application/msgpack', '/api/push/batch',
+                ) == (400, {'error': 'Bad Request'})
+                assert await post(
+                    packb({'timestamp': number, 'data': PUSH['data']}),
+                    'application/msgpack',
+                ) == (400, {'error': 'Bad Request'})
+            assert dashboard.ui.values[('default', 'memory')] == (
+                PUSH['data']['memory']
+            )
+
+            # Values the widgets can't show are rejected before any change
+            assert await post(
+                packb({'data': {'memory': {
+                    'overview': None, 'value': 1, 'total': None,
+                }}}),
+                'application/msgpack',
+            ) == (400, {'error': 'Bad Request'})
+            assert dashboard.ui.values[('default', 'memory')] == (
+                PUSH['data']['memory']
+            )
+
+            # Invalid payloads
+            assert await post(b'\xc1', 'application/msgpack') == (
+                400, {'error': 'Bad Request'},
+            )
+            assert await post(packb([1, 2]), 'application/msgpack') == (
+                400, {'error': 'Bad Request'},
+            )
+            assert await post('[1, 2]', 'application/json') == (
+                400, {'error': 'Bad Request'},
+            )
+            assert await post('{"data": ', 'application/json') == (
+                400, {'error': 'Bad Request'},
+            )
+
+            # Unsupported media types
+            status, response = await post(packb(PUSH), 'text/plain')
+            assert status == 415
+
+    run(scenario)
@@ -0,0 +1,81 @@
+from logging import getLogger as get_logger
+
+from coral_dashboard.metrics import (
+    Counter, Gauge, Callback, Histogram, Registry,
+)
+
+
+log = get_logger(__name__)
+
+
+def test_registry():
+
+    registry = Registry()
+    requests = registry.register(Counter(
+        'requests_total', 'Requests', ['endpoint', 'status'],
+    ))
+    frames = registry.register(Counter('frames_total', 'Frames'))
+    queue = registry.register(Gauge('queue', 'Queue size'))
+    registry.register(Callback('sources', 'Sources', 'gauge', lambda: 2))
+
+    requests.labels('push', 200).inc()
+    requests.labels('push', 200).inc(2)
+    requests.labels('say "hi"\\', 400).inc()
+    frames.inc()
+    queue.set(5)
+    queue.set(3)
+
+    assert registry.render() == '\n'.join([
+        '# HELP requests_total Requests',
+        '# TYPE requests_total counter',
+        'requests_total{endpoint="push",status="200"} 3.0',
+        'requests_total{endpoint="say \\"hi\\"\\\\",status="400"} 1.0',
+        '# HELP frames_total Frames',
+        '# TYPE frames_total counter',
+        'frames_total 1.0',
+        '# HELP queue Queue size',
+        '# TYPE queue gauge',
+        'queue 3',
+        '# HELP sources Sources',
+        '# TYPE sources gauge',
+        'sources 2.0',
+        '',
+    ])
+
+    # Labeled children are reused
+    assert requests.labels('push', 200) is requests.labels('push', 200)
+
+
+def test_histogram():
+
+    histogram = Histogram('latency', 'Latency', buckets=(0.1, 0.5, 1.0))
+
+    # Values equal to a bound fall in its bucket, as buckets are inclusive
+    for value in [0.0, 0.1, 0.1000001, 0.5, 1.0, 2.0]:
+        histogram.observe(value)
+
+    lines = histogram.render()
+    assert lines[:2] == [
+        '# HELP latency Latency',
+        '# TYPE latency histogram',
+    ]
+    assert lines[2:6] == [
+        'latency_bucket{le="0.1"} 2',
+        'latency_bucket{le="0.5"} 4',
+        'latency_bucket{le="1.0"} 5',
+        'latency_bucket{le="+Inf"} 6',
+    ]
+    assert lines[6].startswith('latency_sum ')
+    assert float(lines[6].split()[1]) == sum(
+        [0.0, 0.1, 0.1000001, 0.5, 1.0, 2.0]
+    )
+    assert lines[7] == 'latency_count 6'
+
+    labeled = Histogram('stage', 'Stage', ['name'], buckets=(1.0, ))
+    labeled.labels('parse').observe(1.0)
+    assert labeled.render()[2:] == [
+        'stage_bucket{name="parse",le="1.0"} 1',
+        'stage_bucket{name="parse",le="+Inf"} 1',
+        'stage_sum{name="parse"} 1.0',
+        'stage_count{name="parse"} 1',
+    ]
@@ -0,0 +1,60 @@
+from logging import getLogger as get_logger
+from array import array
+
+from pytest import raises
+
+from coral_dashboard.query import aggregator, downsample
+
+
+log = get_logger(__name__)
+
+
+def _chunks(*chunks):
+    return [
+        array('d', [item for sample in chunk for item in sample])
+        for chunk in chunks
+    ]
+
+
+def test_aggregator():
+
+    values = array('d', [5, 1, 4, 2, 3])
+
+    assert aggregator('min')(values) == 1
+    assert aggregator('max')(values) == 5
+    assert aggregator('avg')(values) == 3
+    assert aggregator('p50')(values) == 3
+    assert aggregator('p100')(values) == 5
+    assert aggregator('p0')(values) == 1
+
+    for name in ['p101', 'median', '']:
+        with raises(ValueError):
+            aggregator(name)
+
+
+def test_downsample():
+
+    # Periods spanning several chunks, and periods without samples
+    chunks = _chunks(
+        [(0, 1), (1, 3), (2, 5)],
+        [(3, 7), (7, 2)],
+        [(8, 4), (9.5, 6)],
+    )
+
+    samples = []
+    for chunk in downsample(chunks, 0, 10, 5, aggregator('max')):
+        samples.extend(zip(chunk[0::2], chunk[1::2]))
+    assert samples == [(0, 3), (2, 7), (6, 2), (8, 6)]
+
+    samples = []
+    for chunk in downsample(chunks, 0, 10, 1, aggregator('avg')):
+        samples.extend(zip(chunk[0::2], chunk[1::2]))
+    assert samples == [(0, 4)]
+
+    # Periods continued in the next chunk aggregate all their values
+    for name, expected in [('min', 1), ('avg', 4), ('p50', 4), ('p100', 7)]:
+        assert list(downsample(chunks, 0, 10, 1, aggregator(name))) == [
+            array('d', [0, expected]),
+        ]
+
+    assert list(downsample([], 0, 10, 5, aggregator('avg'))) == []
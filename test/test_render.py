@@ -0,0 +1,54 @@
+from logging import getLogger as get_logger
+
+from coral_dashboard.render import RenderScheduler
+
+
+log = get_logger(__name__)
+
+
+def test_render(manual_loop):
+
+    loop = manual_loop
+    draws = []
+    render = RenderScheduler(lambda: draws.append(loop.now), 4, loop=loop)
+
+    # The first draw is scheduled right away, and the updates of a frame
+    # coalesce into a single draw
+    for _ in range(5):
+        render.schedule()
+    assert render.pending
+    assert len(loop.timers) == 1
+
+    loop.advance(0.0)
+    assert draws == [0.0]
+    assert not render.pending
+
+    # The next draw waits for the next frame
+    loop.advance(0.125)
+    render.schedule()
+    render.schedule()
+    loop.advance(0.0625)
+    assert draws == [0.0]
+    loop.advance(0.0625)
+    assert draws == [0.0, 0.25]
+    assert render.lag == 0.0
+
+    # Late draws record their lag
+    loop.advance(1.0)
+    render.schedule()
+    loop.advance(0.5)
+    assert draws[2:] == [1.75]
+    assert render.lag == 0.5
+
+    # Cancelled draws don't happen, and can be scheduled again
+    render.schedule()
+    render.cancel()
+    assert not render.pending
+    assert not loop.timers
+    loop.advance(1.0)
+    assert len(draws) == 3
+
+    render.cancel()
+    render.schedule()
+    loop.advance(0.0)
+    assert len(draws) == 4
@@ -0,0 +1,88 @@
+from logging import getLogger as get_logger
+
+from coral_agent.sampler import (
+    CPULoad, Memory, Network, Temperature, Disk, Sampler,
+)
+
+
+log = get_logger(__name__)
+
+
+def test_cpu_load(tmp_path):
+    stat = tmp_path / 'stat'
+    stat.write_text('cpu  100 0 100 700 100 0 0 0 0 0\ncpu0 1 2 3 4\n')
+
+    probe = CPULoad('load_cpu', str(stat))
+    assert probe.sample(0.0) is None
+
+    # 100 more busy jiffies out of 400, file is re-read from the same fd
+    stat.write_text('cpu  150 0 150 950 150 0 0 0 0 0\ncpu0 1 2 3 4\n')
+    assert probe.sample(1.0)['overview'] == 25.0
+    probe.close()
+
+
+def test_memory(tmp_path):
+    meminfo = tmp_path / 'meminfo'
+    meminfo.write_text(
+        'MemTotal:        4194304 kB\n'
+        'MemFree:         1048576 kB\n'
+        'MemAvailable:    2097152 kB\n'
+        'Buffers:           12345 kB\n'
+    )
+
+    probe = Memory('memory', str(meminfo))
+    assert probe.sample(0.0) == {
+        'overview': None,
+        'value': 2048,
+        'total': 4096,
+    }
+    probe.close()
+
+
+def test_network(tmp_path):
+    template = (
+        'Inter-|   Receive |  Transmit\n'
+        ' face |bytes    packets errs drop fifo frame compressed multicast|'
+        'bytes    packets errs drop fifo colls carrier compressed\n'
+        '    lo: {lo} 0 0 0 0 0 0 0 {lo} 0 0 0 0 0 0 0\n'
+        '  eth0: {rx} 0 0 0 0 0 0 0 {tx} 0 0 0 0 0 0 0\n'
+    )
+    dev = tmp_path / 'dev'
+    dev.write_text(template.format(lo=0, rx=0, tx=0))
+
+    probe = Network('network', str(dev), speed=1000)
+    assert probe.sample(0.0) is None
+
+    # 100 Mbps during 2 seconds, loopback is ignored
+    dev.write_text(template.format(lo=10**9, rx=20000000, tx=5000000))
+    assert probe.sample(2.0)['value'] == 100
+    probe.close()
+
+
+def test_temperature(tmp_path):
+    temp = tmp_path / 'temp1_input'
+    temp.write_text('45500\n')
+
+    probe = Temperature('temp_cpu', str(temp))
+    assert probe.sample(0.0)['overview'] == 45.5
+    probe.close()
+
+
+def test_disk(tmp_path):
+    probe = Disk('disk_os', str(tmp_path))
+    sample = probe.sample(0.0)
+    assert 0 <= sample['value'] <= sample['total']
+    assert sample['total'] > 0
+    probe.close()
+
+
+def test_sampler_zero_total(tmp_path):
+    fan = tmp_path / 'fan1_input'
+    fan.write_text('1200\n')
+
+    # Samples without a total are skipped
+    sampler = Sampler(pump=str(fan), pump_max=0, disk_os=str(tmp_path))
+    data = sampler.sample()
+    assert 'pump' not in data
+    assert 'disk_os' in data
+    sampler.close()
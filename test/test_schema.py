@@ -0,0 +1,133 @@
+from logging import getLogger as get_logger
+
+from pytest import mark
+
+from coral_dashboard.schema import SCHEMAS, ProtocolValidator, validate_schema
+
+
+log = get_logger(__name__)
+
+
+def _sample(**kwargs):
+    sample = {
+        'overview': None,
+        'value': 512,
+        'total': 4096,
+    }
+    sample.update(kwargs)
+    return sample
+
+
+DOCUMENTS = [
+    # Push
+    ('push', {'data': {'memory': _sample()}}),
+    ('push', {'title': 'Title', 'data': {'memory': _sample()}}),
+    ('push', {'title': '', 'data': {'memory': _sample()}}),
+    ('push', {'title': None, 'data': {'temp_cpu': _sample(overview=40)}}),
+    ('push', {'data': {'temp_cpu': _sample(overview=40.5, value=None)}}),
+    ('push', {'data': {'memory': _sample(value=True)}}),
+    ('push', {'data': {'memory': _sample(value=1.5)}}),
+    ('push', {'data': {'memory': _sample(overview='1.5')}}),
+    ('push', {'data': {'Memory': _sample()}}),
+    ('push', {'data': {'1memory': _sample()}}),
+    ('push', {'data': {'': _sample()}}),
+    ('push', {'data': {'memory': {'overview': None, 'value': None}}}),
+    ('push', {'data': {'memory': _sample(unknown=1)}}),
+    ('push', {'data': {'memory': {}}}),
+    ('push', {'data': {'memory': None}}),
+    ('push', {'data': {'memory': []}}),
+    ('push', {'data': {}}),
+    ('push', {'data': None}),
+    ('push', {'data': []}),
+    ('push', {'title': 1, 'data': {'memory': _sample()}}),
+    ('push', {'unknown': 1, 'data': {'memory': _sample()}}),
+    ('push', {}),
+    ('push', {'source': 'rack1-host.lan', 'data': {'memory': _sample()}}),
+    ('push', {'source': '', 'data': {'memory': _sample()}}),
+    ('push', {'source': None, 'data': {'memory': _sample()}}),
+    ('push', {'source': '-host', 'data': {'memory': _sample()}}),
+    ('push', {'delta': True, 'data': {'memory': _sample()}}),
+    ('push', {'delta': None, 'data': {'memory': _sample()}}),
+    ('push', {'delta': 1, 'data': {'memory': _sample()}}),
+    ('push', {'timestamp': 1.5, 'data': {'memory': _sample()}}),
+    ('push', {'timestamp': None, 'data': {'memory': _sample()}}),
+    ('push', {'timestamp': True, 'data': {'memory': _sample()}}),
+    ('push', {'timestamp': float('inf'), 'data': {'memory': _sample()}}),
+    ('push', {'data': {'temp_cpu': _sample(overview=float('nan'))}}),
+    ('push', {'data': {'temp_cpu': _sample(overview=float('inf'))}}),
+    ('push', {'data': {'temp_cpu': _sample(overview=float('-inf'))}}),
+
+    # Push batch
+    ('push_batch', {'frames': [
+        {'timestamp': 1.5, 'data': {'memory': _sample()}},
+        {'timestamp': 1, 'data': {'pump': _sample()}},
+    ]}),
+    ('push_batch', {'frames': [{'timestamp': True, 'data': {}}]}),
+    ('push_batch', {'frames': [{'data': {'memory': _sample()}}]}),
+    ('push_batch', {'frames': []}),
+    ('push_batch', {'frames': [{'timestamp': float('nan'), 'data': {}}]}),
+    ('push_batch', {'frames': [
+        {'timestamp': 1, 'data': {'pump': _sample(overview=float('nan'))}},
+    ]}),
+    ('push_batch', {'source': 'host1', 'frames': [
+        {'timestamp': 1, 'data': {'pump': _sample()}},
+    ]}),
+
+    # Config
+    ('config', {'palette': [['a', 'b', 'c']], 'widgets': ['Title']}),
+    ('config', {'palette': [], 'widgets': [None, {}], 'title': 'T'}),
+    ('config', {'palette': [['a', 1, 'c']], 'widgets': ['Title']}),
+    ('config', {'palette': [[]], 'widgets': ['Title']}),
+    ('config', {'palette': 'a', 'widgets': ['Title']}),
+    ('config', {'palette': [], 'widgets': []}),
+    ('config', {'widgets': ['Title']}),
+    ('config', {'source': 'host1', 'palette': [], 'widgets': ['Title']}),
+    ('config', {'source': 1, 'palette': [], 'widgets': ['Title']}),
+
+    # Message
+    ('message', {'message': 'Hello', 'title': 'T', 'width': 0.5}),
+    ('message', {'message': '', 'title': None}),
+    ('message', {'message': 'Hello', 'height': 1}),
+    ('message', {'message': 'Hello', 'height': float('inf')}),
+    ('message', {'message': 'Hello', 'type': 'WARNING'}),
+    ('message', {'message': 'Hello', 'type': 'INFO'}),
+    ('message', {'message': None}),
+    ('message', {'title': 'T'}),
+]
+
+
+@mark.parametrize('schema_id, document', DOCUMENTS)
+def test_compiled_schema(schema_id, document):
+    """
+    Check that the compiled validators behaves exactly like Cerberus.
+    """
+    validator = ProtocolValidator(SCHEMAS[schema_id])
+    expected = validator.validated(document)
+
+    validated, errors = validate_schema(schema_id, document)
+
+    log.info('Validated {} with errors {}'.format(validated, errors))
+    assert validated == expected
+    assert errors == validator.errors
+
+    # Validated documents must be copies
+    if validated is not None:
+        assert validated is not document
+
+
+@mark.parametrize('schema_id, document', [
+    ('push', {'data': {'type': []}}),
+    ('push_batch', {'frames': {'type': []}}),
+    ('config', {'palette': {'type': []}, 'widgets': ['Title']}),
+    ('config', {'palette': [{'type': []}], 'widgets': ['Title']}),
+])
+def test_malformed_schema(schema_id, document):
+    """
+    Check that documents breaking Cerberus normalization are rejected with
+    errors.
+    """
+    validated, errors = validate_schema(schema_id, document)
+
+    log.info('Validated {} with errors {}'.format(validated, errors))
+    assert validated is None
+    assert errors
@@ -0,0 +1,65 @@
+from logging import getLogger as get_logger
+
+from coral_dashboard.ui.history import RingBuffer
+from coral_dashboard.ui.manager import UIManager
+from coral_dashboard.ui.sparkline import BrailleRaster, Sparkline
+
+
+log = get_logger(__name__)
+
+
+def test_braille_raster():
+
+    history = RingBuffer(8)
+    for value in [100, 50, 25, 0, 120, -10]:
+        history.append(value)
+
+    raster = BrailleRaster('s', history, 100.0)
+    canvas = raster.render((4, 2))
+
+    # Two samples per cell, four dots per row, clipped to the graph
+    full, half, left = chr(0x28FF), chr(0x2844), chr(0x2847)
+    assert [row.decode('utf-8') for row in canvas.text] == [
+        ' {} {}'.format(left, left),
+        ' {}{}{}'.format(full, half, left),
+    ]
+    assert canvas._attr == [
+        [('s bar1 smooth', len(row))] for row in canvas.text
+    ]
+
+
+def test_braille_raster_non_finite():
+
+    history = RingBuffer(8)
+    for value in [float('nan'), float('inf'), float('-inf'), 100]:
+        history.append(value)
+
+    # Not a number is empty, infinities are clipped
+    raster = BrailleRaster('s', history, 100.0)
+    canvas = raster.render((2, 1))
+    right = chr(0x28B8)
+    assert [row.decode('utf-8') for row in canvas.text] == [
+        '{}{}'.format(right, right),
+    ]
+
+
+def test_sparkline_widget():
+
+    ui = UIManager()
+    ui.build([{
+        'widget': 'sparkline',
+        'identifier': 'temp',
+        'title': 'Temperature',
+        'unit': 'C',
+    }], None)
+
+    sparkline = ui.widgets['default', 'temp']
+    assert isinstance(sparkline, Sparkline)
+
+    ui.push_batch([
+        {'timestamp': second, 'data': {'temp': {
+            'overview': second, 'value': None, 'total': None,
+        }}} for second in range(10)
+    ], None)
+    assert sparkline.count == 10
+    assert list(sparkline.graph.series.tail(2)) == [8, 9]
@@ -0,0 +1,80 @@
+from logging import getLogger as get_logger
+
+from coral_agent.spool import Spool
+
+
+log = get_logger(__name__)
+
+
+def _sample(number):
+    return {'timestamp': float(number), 'title': None, 'data': {}}
+
+
+def test_spool(tmpdir):
+
+    path = str(tmpdir.join('agent.spool'))
+    spool = Spool(path, slots=4, slot_size=64)
+
+    # Full spools overwrite the oldest samples
+    for number in range(6):
+        assert spool.append(_sample(number))
+    assert len(spool) == 4
+    assert spool.peek(2) == [_sample(2), _sample(3)]
+    assert spool.peek(10) == [_sample(number) for number in range(2, 6)]
+
+    assert not spool.append({'data': 'x' * 64})
+    assert len(spool) == 4
+
+    spool.consume(3)
+    assert spool.peek(10) == [_sample(5)]
+    spool.consume(10)
+    assert not len(spool)
+    assert spool.peek(10) == []
+
+    # The samples survive restarts
+    spool.append(_sample(6))
+    spool.append(_sample(7))
+    spool.close()
+
+    spool = Spool(path, slots=4, slot_size=64)
+    assert spool.peek(10) == [_sample(6), _sample(7)]
+    spool.close()
+
+    # Spools of a different format are discarded
+    spool = Spool(path, slots=8, slot_size=64)
+    assert not len(spool)
+    spool.close()
+
+
+def test_spool_corrupt(tmpdir):
+
+    path = str(tmpdir.join('agent.spool'))
+    spool = Spool(path, slots=8, slot_size=64)
+    for number in range(5):
+        spool.append(_sample(number))
+
+    # Tear the slots of the samples 1, 3 and 4
+    for number, garbage in [(1, b'{"time'), (3, b'\xff\xfe'), (4, b'[1]')]:
+        offset = spool._offset(number)
+        spool.LENGTH.pack_into(spool._map, offset, len(garbage))
+        start = offset + spool.LENGTH.size
+        spool._map[start:start + len(garbage)] = garbage
+
+    # Batches stop before a corrupt sample, and corrupt samples at the head
+    # are discarded
+    assert spool.peek(10) == [_sample(0)]
+    spool.consume(1)
+    assert spool.peek(10) == [_sample(2)]
+    assert len(spool) == 3
+    spool.consume(1)
+    assert spool.peek(10) == []
+    assert not len(spool)
+    spool.close()
+
+    # Slots with an invalid length are discarded too
+    spool = Spool(path, slots=8, slot_size=64)
+    spool.append(_sample(5))
+    spool.LENGTH.pack_into(spool._map, spool._offset(5), 1000)
+    spool.append(_sample(6))
+    assert spool.peek(10) == [_sample(6)]
+    spool.close()
@@ -0,0 +1,187 @@
+from time import time
+from json import loads
+from threading import Thread
+from logging import getLogger as get_logger
+
+from coral_dashboard.store import Store, RECORD
+
+
+log = get_logger(__name__)
+
+
+def test_store(tmpdir, overview):
+
+    store = Store(str(tmpdir), segment_size=4, retention=10)
+    store.start()
+
+    for second in range(10):
+        store.append('host1', float(second), {
+            'temp': overview(second * 10.0),
+            'memory': {'overview': None, 'value': 1, 'total': 4},
+            'unknown': overview(0.0),
+        }, ['temp', 'memory'])
+
+    store.append_batch('host1', [
+        {'timestamp': 11.0, 'data': {'temp': overview(110.0)}},
+        {'timestamp': 10.0, 'data': {'temp': overview(100.0)}},
+        {'timestamp': 5.0, 'data': {'temp': overview(50.0)}},
+    ], ['temp'])
+    store.close()
+
+    assert store.written == 22
+    assert store.late == 1
+    assert len(store.segments('host1', 'temp')) == 3
+    assert not store.segments('host1', 'unknown')
+
+    samples = store.tail('host1', 'memory', 3)
+    assert list(samples) == [7.0, 25.0, 8.0, 25.0, 9.0, 25.0]
+
+    samples = store.tail('host1', 'temp', 5)
+    assert list(samples[0::2]) == [7.0, 8.0, 9.0, 10.0, 11.0]
+
+    chunks = list(store.read('host1', 'temp', start=3.0, end=9.0))
+    assert [list(chunk[0::2]) for chunk in chunks] == [
+        [3.0], [4.0, 5.0, 6.0, 7.0], [8.0],
+    ]
+    assert list(store.read('host2', 'temp')) == []
+
+    # Reopening continues the last segment, dropping torn records
+    last = store.segments('host1', 'temp')[-1]
+    with open(str(last), 'ab') as fd:
+        fd.write(RECORD.pack(12.0, 120.0)[:10])
+
+    store = Store(str(tmpdir), segment_size=4, retention=10)
+    store.start()
+    store.append_batch('host1', [
+        {'timestamp': 12.0, 'data': {'temp': overview(120.0)}},
+        {'timestamp': 25.0, 'data': {'temp': overview(250.0)}},
+    ], ['temp'])
+    store.close()
+
+    # Segments older than the retention expired when a segment was started
+    segments = store.segments('host1', 'temp')
+    assert [segment.name for segment in segments] == ['0000000004.seg']
+    samples = store.tail('host1', 'temp', 10)
+    assert list(samples) == [12.0, 120.0, 25.0, 250.0]
+
+
+def test_store_invalid(tmpdir, overview):
+
+    store = Store(str(tmpdir))
+    store.start()
+
+    # Samples without a finite value are skipped, and the writer survives
+    # pushes it can't handle
+    store.append('host1', 1.0, {
+        'temp': overview(float('nan')),
+        'memory': {'overview': None, 'value': None, 'total': 5},
+        'pump': {'overview': None, 'value': 1, 'total': 0},
+    }, ['temp', 'memory', 'pump'])
+    store.append('host1', 2.0, None, ['temp'])
+    store.append('host1', 3.0, {'temp': overview(30.0)}, ['temp'])
+    store.close()
+
+    assert store.invalid == 3
+    assert store.written == 1
+    assert list(store.tail('host1', 'temp', 10)) == [3.0, 30.0]
+    assert not store.segments('host1', 'memory')
+
+    # Closing doesn't wait on a full queue if the writer thread died
+    store = Store(str(tmpdir), size=1)
+    store.start()
+    store.close()
+    store._thread = Thread(target=lambda: None)
+    store._thread.start()
+    store._thread.join()
+    store.append('host1', 4.0, {'temp': overview(40.0)}, ['temp'])
+    store.close()
+
+
+def test_store_clock(tmpdir, run, headless, overview):
+
+    store = Store(str(tmpdir))
+    store.start()
+    start = time()
+
+    async def scenario():
+        async with headless(store=store) as (dashboard, client):
+
+            async def post(endpoint, payload):
+                response = await client.post(endpoint, json=payload)
+                assert response.status == 200
+
+            await post('/api/config', {
+                'palette': [],
+                'widgets': [{
+                    'widget': 'graph', 'identifier': 'temp',
+                    'title': 'Temperature', 'unit': 'C',
+                }],
+            })
+
+            # A replayed frame ahead of the dashboard's clock is clamped
+            await post('/api/push/batch', {'frames': [
+                {'timestamp': start - 10.0, 'data': {'temp': overview(1.0)}},
+                {'timestamp': start + 120.0, 'data': {'temp': overview(2.0)}},
+            ]})
+
+            # Live pushes, stamped when received or by the agent
+            await post('/api/push', {'data': {'temp': overview(3.0)}})
+            await post('/api/push', {
+                'timestamp': start + 60.0, 'data': {'temp': overview(4.0)},
+            })
+            await post('/api/push', {'data': {'temp': overview(5.0)}})
+
+            # Frames older than the newest sample are still late
+            await post('/api/push/batch', {'frames': [
+                {'timestamp': start - 5.0, 'data': {'temp': overview(6.0)}},
+            ]})
+            await post('/api/push', {'data': {'temp': overview(7.0)}})
+
+    run(scenario)
+    store.close()
+
+    assert store.late == 1
+    samples = store.tail('default', 'temp', 10)
+    assert list(samples[1::2]) == [1.0, 2.0, 3.0, 4.0, 5.0, 7.0]
+
+    timestamps = list(samples[0::2])
+    assert timestamps == sorted(timestamps)
+    assert timestamps[0] == start - 10.0
+    assert start <= timestamps[1] <= time()
+
+
+def test_store_history(tmpdir, run, headless):
+
+    # Non finite values aren't stored anymore, but older stores may have them
+    series = tmpdir.join('default', 'temp').ensure(dir=True)
+    series.join('0000000001.seg').write_binary(b''.join(
+        RECORD.pack(100.0 + second, value) for second, value in enumerate(
+            [1.0, float('nan'), float('inf'), 4.0]
+        )
+    ))
+    store = Store(str(tmpdir))
+
+    async def scenario():
+        async with headless(store=store) as (dashboard, client):
+            response = await client.get('/api/history', params={
+                'start': '0', 'end': '200',
+            })
+            assert response.status == 200
+
+            # Non finite values are null, as JSON has no NaN or infinity
+            history = loads(await response.text())
+            assert history['series'] == {'temp': [
+                [100.0, 1.0], [101.0, None], [102.0, None], [103.0, 4.0],
+            ]}
+
+            response = await client.get('/api/history', params={
+                'identifier': 'temp', 'start': '0', 'end': '200',
+                'format': 'csv',
+            })
+            assert (await response.text()).splitlines() == [
+                'identifier,timestamp,value',
+                'temp,100.0,1.0', 'temp,101.0,nan', 'temp,102.0,inf',
+                'temp,103.0,4.0',
+            ]
+
+    run(scenario)
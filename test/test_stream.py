@@ -0,0 +1,99 @@
+from logging import getLogger as get_logger
+
+from msgpack import packb
+from aiohttp import WSMsgType
+
+from coral_dashboard import __version__
+
+
+log = get_logger(__name__)
+
+
+WIDGETS = [{
+    'widget': 'bar', 'identifier': 'memory', 'title': 'Memory', 'unit': 'GB',
+}]
+
+
+def _push(value):
+    return {
+        'type': 'push',
+        'data': {'memory': {'overview': None, 'value': value, 'total': 4}},
+    }
+
+
+def test_stream(run, headless):
+
+    async def scenario():
+        async with headless() as (dashboard, client):
+            dashboard.STREAM_ACK_FRAMES = 4
+            ws = await client.ws_connect('/api/stream')
+            assert await ws.receive_json() == {
+                'type': 'hello', 'version': __version__,
+            }
+
+            await ws.send_json({
+                'type': 'config', 'palette': [], 'widgets': WIDGETS,
+            })
+            await ws.send_json(_push(1))
+            await ws.send_bytes(packb(_push(2), use_bin_type=True))
+
+            # Frames are acknowledged in batches
+            await ws.send_json(_push(3))
+            assert await ws.receive_json() == {'type': 'ack', 'seq': 4}
+            assert dashboard.ui.values['default', 'memory']['value'] == 3
+
+            # Or once frames stop arriving
+            await ws.send_json(_push(4))
+            assert await ws.receive_json() == {'type': 'ack', 'seq': 5}
+
+            await ws.close()
+
+    run(scenario)
+
+
+def test_stream_errors(run, headless):
+
+    async def scenario():
+        async with headless() as (dashboard, client):
+            ws = await client.ws_connect('/api/stream')
+            await ws.receive_json()
+
+            await ws.send_str('{"type": ')
+            await ws.send_bytes(b'\xc1')
+            await ws.send_json(['push'])
+            await ws.send_json({'type': 'unknown'})
+            await ws.send_json({'type': 'push', 'data': {}})
+            await ws.send_json({'type': 'push_batch', 'frames': {'type': []}})
+
+            errors = [await ws.receive_json() for _ in range(6)]
+            assert [(error['type'], error['seq']) for error in errors] == [
+                ('error', seq) for seq in range(1, 7)
+            ]
+            assert [error['error'] for error in errors[:4]] == [
+                'Invalid frame encoding',
+                'Invalid frame encoding',
+                'Invalid frame, expected an object',
+                'Invalid frame type unknown',
+            ]
+            assert errors[4]['error'].startswith('Invalid push frame')
+            assert errors[5]['error'].startswith('Invalid push_batch frame')
+
+            # Invalid frames are acknowledged, and don't close the stream
+            assert await ws.receive_json() == {'type': 'ack', 'seq': 6}
+            await ws.send_json(_push(1))
+            assert await ws.receive_json() == {'type': 'ack', 'seq': 7}
+
+            # Over HTTP, malformed documents are bad requests too
+            for endpoint, payload in [
+                ('/api/push/batch', {'frames': {'type': []}}),
+                ('/api/config', {'palette': {'type': []}, 'widgets': []}),
+                ('/api/config', {'palette': [], 'widgets': {'type': []}}),
+            ]:
+                response = await client.post(endpoint, json=payload)
+                assert response.status == 400
+
+            await ws.close()
+            message = await ws.receive()
+            assert message.type == WSMsgType.CLOSED
+
+    run(scenario)
@@ -0,0 +1,384 @@
+from logging import getLogger as get_logger
+from asyncio import sleep
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from coral_agent.spool import Spool
+from coral_agent.transport import Transport
+
+
+log = get_logger(__name__)
+
+
+CONFIG = {'widgets': ['temp', 'memory']}
+
+
+class StubDashboard:
+    """
+    Dashboard that records the requests it gets.
+
+    Its tree is the list of widgets of the config request, and it forgets it
+    when ``restart`` is called.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.tree = []
+        self.failures = 0
+
+        self.app = web.Application()
+        self.app.router.add_post('/api/{endpoint:.+}', self.handle)
+        self.server = TestServer(self.app)
+
+    @property
+    def url(self):
+        return str(self.server.make_url(''))
+
+    def endpoints(self):
+        return [endpoint for endpoint, _ in self.requests]
+
+    def restart(self):
+        self.tree = []
+
+    async def handle(self, request):
+        endpoint = request.match_info['endpoint']
+        payload = await request.json()
+        self.requests.append((endpoint, payload))
+
+        if self.failures:
+            self.failures -= 1
+            return web.Response(status=503, text='Unavailable')
+
+        if endpoint == 'config':
+            self.tree = payload['widgets']
+            return web.json_response({'tree': self.tree})
+
+        frames = payload.get('frames', [payload])
+        return web.json_response({'pushed': sorted(set(
+            key for frame in frames for key in frame['data']
+            if key in self.tree
+        ))})
+
+
+async def _until(condition, timeout=2.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await sleep(0.01)
+    raise AssertionError('Timeout waiting for condition')
+
+
+def test_replay(tmpdir, run, overview):
+
+    stub = StubDashboard()
+    spool = Spool(str(tmpdir.join('agent.spool')), slots=8, slot_size=128)
+
+    for second in range(4):
+        spool.append({
+            'timestamp': float(second),
+            'title': 'Title',
+            'data': {'temp': overview(second)},
+        })
+
+    # Tear the slot of the second sample, as a crash would
+    offset = spool._offset(1)
+    spool._map[offset + spool.LENGTH.size] = ord('[')
+
+    async def scenario():
+        await stub.server.start_server()
+        transport = Transport(
+            stub.url, CONFIG, spool=spool, replay_batch=10,
+        )
+        try:
+            await transport.start()
+            await _until(lambda: transport._replayer is None)
+
+            assert not len(spool)
+            assert transport.sent == 3
+            assert stub.endpoints() == ['config', 'push/batch', 'push/batch']
+            frames = [
+                frame['timestamp']
+                for _, payload in stub.requests[1:]
+                for frame in payload['frames']
+            ]
+            assert frames == [0.0, 2.0, 3.0]
+
+            # Live samples are pushed again once the spool is empty
+            transport.submit({'temp': overview(4)})
+            await _until(lambda: transport.sent == 4)
+            assert stub.endpoints()[-1] == 'push'
+
+        finally:
+            await transport.close()
+            await stub.server.close()
+
+    run(scenario)
+    spool.close()
+
+
+def test_replay_failure(tmpdir, run, overview):
+
+    stub = StubDashboard()
+    spool = Spool(str(tmpdir.join('agent.spool')), slots=8, slot_size=128)
+
+    # A sample without data can't be replayed
+    spool.append({'timestamp': 0.0, 'title': None})
+
+    async def scenario():
+        await stub.server.start_server()
+        transport = Transport(stub.url, CONFIG, spool=spool)
+        try:
+            await transport.start()
+            await _until(lambda: transport._replayer is None)
+
+            # Live samples are still pushed
+            transport.submit({'temp': overview(1)})
+            await _until(lambda: transport.sent == 1)
+            assert stub.endpoints() == ['config', 'push']
+
+        finally:
+            await transport.close()
+            await stub.server.close()
+
+    run(scenario)
+    spool.close()
+
+
+def test_backoff():
+
+    transport = Transport('http://localhost', CONFIG, backoff=0.5)
+
+    for attempt, delay in enumerate([0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 30.0]):
+        for _ in range(20):
+            assert delay / 2 <= transport._delay(attempt) <= delay
+    assert transport._delay(100) <= 30.0
+
+
+def test_queue_policies(overview):
+
+    # Nothing is sent until the transport is started
+    transport = Transport('http://localhost', CONFIG, size=2)
+    for second in range(4):
+        transport.submit({'temp': overview(second)}, timestamp=second)
+
+    assert transport.dropped == 2
+    assert [
+        sample['timestamp'] for sample in transport._queue
+    ] == [2, 3]
+
+    transport = Transport(
+        'http://localhost', CONFIG, size=2, policy='coalesce',
+    )
+    transport.submit({'temp': overview(0)}, timestamp=0)
+    transport.submit({'temp': overview(1)}, timestamp=1)
+    transport.submit({'memory': overview(2)}, title='Title', timestamp=2)
+    transport.submit({'temp': overview(3)}, title='Other', timestamp=3)
+
+    assert transport.coalesced == 2
+    assert not transport.dropped
+    assert list(transport._queue) == [
+        {'timestamp': 0, 'title': None, 'data': {'temp': overview(0)}},
+        {
+            'timestamp': 3,
+            'title': 'Other',
+            'data': {'temp': overview(3), 'memory': overview(2)},
+        },
+    ]
+
+
+def test_retry(run, overview):
+
+    stub = StubDashboard()
+    stub.failures = 2
+
+    async def scenario():
+        await stub.server.start_server()
+        transport = Transport(stub.url, CONFIG, backoff=0.01)
+        try:
+            await transport.start()
+            transport.submit({'temp': overview(1)})
+            await _until(lambda: transport.sent == 1)
+
+            # The config request failed twice before getting through
+            assert transport.failures == 2
+            assert stub.endpoints() == ['config', 'config', 'config', 'push']
+
+        finally:
+            await transport.close()
+            await stub.server.close()
+
+    run(scenario)
+
+
+def test_retry_limit(tmpdir, run, overview):
+
+    stub = StubDashboard()
+
+    async def scenario():
+        await stub.server.start_server()
+        transport = Transport(stub.url, CONFIG, backoff=0.01, retries=2)
+        try:
+            await transport.start()
+            transport.submit({'temp': overview(1)})
+            await _until(lambda: transport.sent == 1)
+
+            # A sample the dashboard keeps failing is dropped after retries,
+            # and doesn't block the samples that follow
+            stub.failures = 3
+            transport.submit({'temp': overview(2)})
+            await _until(lambda: transport.dropped == 1)
+            transport.submit({'temp': overview(3)})
+            await _until(lambda: transport.sent == 2)
+
+            assert transport.failures == 3
+            assert stub.endpoints() == ['config'] + ['push'] * 5
+            assert [
+                payload['data']['temp']['overview']
+                for _, payload in stub.requests[1:]
+            ] == [1, 2, 2, 2, 3]
+
+        finally:
+            await transport.close()
+            await stub.server.close()
+
+    run(scenario)
+
+    # A batch of spooled samples is dropped the same way
+    stub = StubDashboard()
+    stub.failures = 3
+    spool = Spool(str(tmpdir.join('agent.spool')), slots=8, slot_size=128)
+    for second in range(2):
+        spool.append({
+            'timestamp': float(second),
+            'title': None,
+            'data': {'temp': overview(second)},
+        })
+
+    async def replay():
+        await stub.server.start_server()
+        transport = Transport(
+            stub.url, CONFIG, backoff=0.01, retries=2, spool=spool,
+        )
+        try:
+            await transport.start()
+            await _until(lambda: transport._replayer is None)
+
+            assert not len(spool)
+            assert (transport.sent, transport.dropped) == (0, 2)
+
+        finally:
+            await transport.close()
+            await stub.server.close()
+
+    run(replay)
+    spool.close()
+
+
+def test_reconfigure(run, overview):
+
+    stub = StubDashboard()
+
+    async def scenario():
+        await stub.server.start_server()
+        transport = Transport(stub.url, CONFIG)
+        try:
+            await transport.start()
+            transport.submit({'temp': overview(1), 'unknown': overview(1)})
+            await _until(lambda: transport.sent == 1)
+            assert stub.endpoints() == ['config', 'push']
+
+            # The dashboard restarted and doesn't know the widgets anymore
+            stub.restart()
+            transport.submit({'temp': overview(2)})
+            await _until(lambda: transport.sent == 2)
+            assert stub.endpoints()[2:] == ['push', 'config', 'push']
+            assert stub.requests[-1][1]['data'] == {'temp': overview(2)}
+            assert stub.tree == CONFIG['widgets']
+
+        finally:
+            await transport.close()
+            await stub.server.close()
+
+    run(scenario)
+
+
+def test_delta(tmpdir, run, overview):
+
+    stub = StubDashboard()
+    memory = {'overview': None, 'value': 1, 'total': 4}
+
+    async def scenario():
+        await stub.server.start_server()
+        transport = Transport(stub.url, CONFIG, delta=True)
+        transport.DELTA_KEYFRAME = 2
+
+        async def push(temp):
+            sent = transport.sent
+            transport.submit({'temp': overview(temp), 'memory': memory})
+            await _until(lambda: transport.sent == sent + 1)
+            payload = stub.requests[-1][1]
+            return payload.get('delta', False), sorted(payload['data'])
+
+        try:
+            await transport.start()
+
+            # The first push is full, then only the changed values are sent
+            assert await push(1) == (False, ['memory', 'temp'])
+            assert await push(2) == (True, ['temp'])
+
+            # A push without changes still sends a value
+            assert await push(2) == (True, ['temp'])
+
+            # Every DELTA_KEYFRAME deltas all the values are sent
+            assert await push(3) == (False, ['memory', 'temp'])
+            assert await push(4) == (True, ['temp'])
+
+            # After reconfiguring the push is sent in full, and the values
+            # known by the dashboard and the keyframe count start over
+            stub.restart()
+            assert await push(5) == (False, ['memory', 'temp'])
+            assert stub.endpoints()[-3:] == ['push', 'config', 'push']
+            assert transport._values == {'temp': overview(5)}
+            assert await push(5) == (True, ['memory'])
+            assert await push(5) == (True, ['temp'])
+            assert await push(5) == (False, ['memory', 'temp'])
+
+        finally:
+            await transport.close()
+            await stub.server.close()
+
+    run(scenario)
+
+
+def test_delta_replay(tmpdir, run, overview):
+
+    stub = StubDashboard()
+    spool = Spool(str(tmpdir.join('agent.spool')), slots=8, slot_size=128)
+    spool.append({
+        'timestamp': 0.0, 'title': None, 'data': {'temp': overview(0)},
+    })
+
+    async def scenario():
+        await stub.server.start_server()
+        transport = Transport(stub.url, CONFIG, spool=spool, delta=True)
+        transport._values = {'temp': overview(1), 'memory': overview(1)}
+
+        try:
+            await transport.start()
+            await _until(lambda: transport._replayer is None)
+            assert transport._values == {}
+
+            # The replay changed the values known by the dashboard
+            transport.submit({'temp': overview(1), 'memory': overview(1)})
+            await _until(lambda: transport.sent == 2)
+            assert stub.endpoints() == ['config', 'push/batch', 'push']
+            assert 'delta' not in stub.requests[-1][1]
+            assert sorted(stub.requests[-1][1]['data']) == ['memory', 'temp']
+
+        finally:
+            await transport.close()
+            await stub.server.close()
+
+    run(scenario)
+    spool.close()